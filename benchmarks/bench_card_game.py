@@ -0,0 +1,39 @@
+"""Đo chi phí tạo BlackjackGame và bộ nhớ cho mỗi game đang active.
+
+    python -m benchmarks.bench_card_game --games 2000
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from games.blackjack import BlackjackGame
+
+
+def bench_construction(games: int):
+    start = time.perf_counter()
+    for i in range(games):
+        BlackjackGame(100, i)
+    elapsed = time.perf_counter() - start
+    print("construct   %6d games in %.3fs -> %8.1f us/game" % (games, elapsed, elapsed / games * 1e6))
+
+
+def bench_memory(games: int):
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    active = [BlackjackGame(100, i) for i in range(games)]
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print("memory      %6d games -> %8.0f bytes/game" % (len(active), (after - before) / games))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--games", type=int, default=2000)
+    args = parser.parse_args()
+
+    bench_construction(args.games)
+    bench_memory(args.games)
@@ -0,0 +1,95 @@
+"""Đo độ trễ event loop khi có nhiều lệnh cược cùng lúc.
+
+So sánh gọi DatabaseManager đồng bộ trực tiếp trên event loop (như trước)
+với AsyncDatabaseManager chạy truy vấn trên executor riêng.
+
+    python -m benchmarks.bench_event_loop_lag --bets 300
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import config
+
+
+class LagProbe:
+    """Task nền đo độ trễ giữa các lần tick so với lịch dự kiến"""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.samples = []
+        self._running = False
+
+    async def run(self):
+        self._running = True
+        loop = asyncio.get_running_loop()
+        while self._running:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - start - self.interval))
+
+    def stop(self):
+        self._running = False
+
+    def report(self) -> str:
+        if not self.samples:
+            return "không có mẫu"
+        ordered = sorted(self.samples)
+        p99 = ordered[int(len(ordered) * 0.99) - 1] if len(ordered) > 1 else ordered[0]
+        return "max=%.1fms p99=%.1fms mean=%.2fms" % (
+            ordered[-1] * 1000, p99 * 1000, sum(ordered) / len(ordered) * 1000
+        )
+
+
+async def place_bet_sync(db, user_id: int, guild_id: int):
+    # Cách cũ: gọi thẳng hàm đồng bộ trên event loop
+    db.get_or_create_user_balance(user_id, guild_id)
+    db.settle(user_id, guild_id, -10, "game", "Benchmark bet: 10", min_balance=None)
+
+
+async def place_bet_async(db, user_id: int, guild_id: int):
+    await db.get_or_create_user_balance(user_id, guild_id)
+    await db.settle(user_id, guild_id, -10, "game", "Benchmark bet: 10", min_balance=None)
+
+
+async def run_scenario(name: str, db, place_bet, bets: int):
+    probe = LagProbe()
+    probe_task = asyncio.create_task(probe.run())
+    await asyncio.sleep(0.05)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(place_bet(db, 1000 + i % 50, 1) for i in range(bets)))
+    elapsed = time.perf_counter() - start
+
+    probe.stop()
+    await probe_task
+    print("%-6s %4d bets in %.2fs | loop lag %s" % (name, bets, elapsed, probe.report()))
+
+
+async def main(bets: int):
+    # Import sau khi đã trỏ DATABASE_URL sang file tạm
+    from database.database_manager import DatabaseManager
+    from database.async_database_manager import AsyncDatabaseManager
+
+    sync_db = DatabaseManager()
+    await run_scenario("sync", sync_db, place_bet_sync, bets)
+    sync_db.engine.dispose()
+
+    async_db = AsyncDatabaseManager()
+    await run_scenario("async", async_db, place_bet_async, bets)
+    await async_db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bets", type=int, default=300)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config.DATABASE_URL = "sqlite:///" + os.path.join(tmp, "bench.db")
+        asyncio.run(main(args.bets))
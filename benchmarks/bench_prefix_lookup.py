@@ -0,0 +1,68 @@
+"""Đo throughput xử lý message của get_prefix khi bật/tắt cache cấu hình guild.
+
+    python -m benchmarks.bench_prefix_lookup --messages 20000 --guilds 200
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import config
+
+
+async def prefix_uncached_sync(db, guild_id: int) -> str:
+    # Cách cũ: mỗi message một session + SELECT ngay trên event loop
+    guild_config = db.sync.get_guild_config(guild_id)
+    return guild_config.prefix if guild_config else config.DEFAULT_PREFIX
+
+
+async def prefix_uncached_async(db, guild_id: int) -> str:
+    guild_config = await db.refresh_guild_config(guild_id)
+    return guild_config.prefix if guild_config else config.DEFAULT_PREFIX
+
+
+async def prefix_cached(db, guild_id: int) -> str:
+    return db.get_prefix(guild_id)
+
+
+async def run(name: str, db, resolve, guild_ids):
+    start = time.perf_counter()
+    for guild_id in guild_ids:
+        await resolve(db, guild_id)
+    elapsed = time.perf_counter() - start
+    print("%-14s %8d msgs in %.3fs -> %10.0f msg/s" % (name, len(guild_ids), elapsed, len(guild_ids) / elapsed))
+
+
+async def main(messages: int, guilds: int):
+    from database.async_database_manager import AsyncDatabaseManager
+
+    config.JOURNAL_ENABLED = False
+    db = AsyncDatabaseManager()
+    # Một nửa số guild đã đăng ký, nửa còn lại dùng prefix mặc định
+    for guild_id in range(guilds // 2):
+        db.sync.create_guild_config(guild_id, prefix="?")
+    await db.start()
+
+    rng = random.Random(42)
+    guild_ids = [rng.randrange(guilds) for _ in range(messages)]
+
+    await run("cache off/sync", db, prefix_uncached_sync, guild_ids)
+    await run("cache off", db, prefix_uncached_async, guild_ids)
+    await run("cache on", db, prefix_cached, guild_ids)
+    await db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--guilds", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config.DATABASE_URL = "sqlite:///" + os.path.join(tmp, "bench.db")
+        asyncio.run(main(args.messages, args.guilds))
@@ -0,0 +1,100 @@
+"""Đo chi phí dựng embed cho mỗi lần cập nhật game (render cũ vs cogs.render).
+
+    python -m benchmarks.bench_render --updates 20000
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import discord
+
+from cogs import render
+from games.bau_cua import BauCuaAnimal, BauCuaGame
+from games.blackjack import BlackjackGame
+from games.xoc_dia import XocDiaBetType, XocDiaGame
+
+
+# Cách dựng cũ: get_game_state() rồi tạo lại dict text kết quả và chuỗi emoji mỗi lần
+def legacy_blackjack(game: BlackjackGame) -> discord.Embed:
+    state = game.get_game_state()
+    embed = discord.Embed(title="🎰 Blackjack", color=discord.Color.blue())
+    embed.add_field(name="Bài của bạn", value=f"{' '.join(state['player_hand'])} (Điểm: {state['player_value']})", inline=False)
+    if state['game_over']:
+        embed.add_field(name="Bài của Dealer", value=f"{' '.join(state['dealer_hand'])} (Điểm: {state['dealer_value']})", inline=False)
+        result_text = {
+            "BUST": "💥 Bạn đã quá 21!",
+            "DEALER_BUST": "🎉 Dealer quá 21! Bạn thắng!",
+            "WIN": "🎉 Bạn thắng!",
+            "LOSE": "😞 Bạn thua!",
+            "PUSH": "🤝 Hòa!",
+            "BLACKJACK": "🎯 Blackjack! Tuyệt vời!"
+        }.get(state['result'], state['result'])
+        embed.add_field(name="Kết quả", value=result_text, inline=False)
+        embed.add_field(name="💰 Thưởng", value=f"{state['payout']:,}", inline=True)
+    else:
+        embed.add_field(name="Bài của Dealer", value=f"{state['dealer_hand'][0]} ? ? (Điểm: {state['dealer_value']}+)", inline=False)
+    embed.add_field(name="💰 Cược", value=f"{state['bet']:,}", inline=True)
+    return embed
+
+
+def legacy_bau_cua(game: BauCuaGame) -> discord.Embed:
+    state = game.get_game_state()
+    embed = discord.Embed(title="🎲 Bầu Cua", color=discord.Color.green())
+    embed.add_field(name="🎯 Kết quả", value=" ".join([emoji for _, emoji in state['dice_results']]), inline=False)
+    embed.add_field(name="💰 Cược của bạn", value="\n".join([f"{animal}: {amount:,}" for animal, amount in state['bets'].items()]), inline=True)
+    result_text = f"Tổng cược: {state['total_bet']:,}\n"
+    result_text += f"Thưởng: {state['payout']:,}\n"
+    result_text += f"Lợi nhuận: {state['profit']:,}"
+    embed.add_field(name="📊 Kết quả", value=result_text, inline=True)
+    return embed
+
+
+def legacy_xoc_dia(game: XocDiaGame) -> discord.Embed:
+    state = game.get_game_state()
+    embed = discord.Embed(title="🎪 Xóc Đĩa", color=discord.Color.orange())
+    embed.add_field(name="🎯 Kết quả", value=" ".join(state['coin_results']), inline=False)
+    embed.add_field(name="🔴 Số mặt đỏ", value=state['red_count'], inline=True)
+    result_text = f"Cược: {state['total_bet']:,}\n"
+    result_text += f"Thưởng: {state['payout']:,}\n"
+    result_text += f"Lợi nhuận: {state['profit']:,}"
+    embed.add_field(name="📊 Kết quả", value=result_text, inline=True)
+    return embed
+
+
+def measure(label: str, func, games, updates: int):
+    n = len(games)
+    start = time.perf_counter()
+    for i in range(updates):
+        func(games[i % n])
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    for i in range(min(updates, 2000)):
+        func(games[i % n])
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print("%-22s %8.2f us/update   peak %7.0f bytes" % (label, elapsed / updates * 1e6, peak))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--updates", type=int, default=20000)
+    args = parser.parse_args()
+
+    blackjack = [BlackjackGame(100, i) for i in range(500)]
+    for game in blackjack[::2]:
+        game.player_stand()
+    bau_cua = [BauCuaGame({BauCuaAnimal.BAU: 100, BauCuaAnimal.CA: 100}, i) for i in range(500)]
+    xoc_dia = [XocDiaGame({XocDiaBetType.EVEN: 100}, i) for i in range(500)]
+
+    for name, legacy, cached, games in (
+        ("blackjack", legacy_blackjack, render.blackjack_embed, blackjack),
+        ("bau_cua", legacy_bau_cua, render.bau_cua_embed, bau_cua),
+        ("xoc_dia", legacy_xoc_dia, render.xoc_dia_embed, xoc_dia),
+    ):
+        measure(name + " legacy", legacy, games, args.updates)
+        measure(name + " render", cached, games, args.updates)
@@ -0,0 +1,88 @@
+"""Đo số commit/giây của DatabaseManager.settle với từng profile engine.
+
+Mỗi settle là một transaction (cập nhật số dư + ghi lịch sử + player_stats).
+--threads > 1 chạy nhiều writer cùng lúc trên cùng database (như bot cộng
+job gộp ledger/đối soát) và đếm số lần lỗi lock.
+
+    python -m benchmarks.bench_settle_commits --settles 2000 --threads 4
+    python -m benchmarks.bench_settle_commits --database-url postgresql://... --profiles default
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.exc import OperationalError
+
+from config import config
+from database.engine import ENGINE_PROFILES
+
+
+def writer(db, result, worker: int, settles: int, users: int):
+    from database.player_stats import RoundResult
+
+    for i in range(settles):
+        user_id = 1000 + (worker * settles + i) % users
+        bet, payout = 10, (20 if i % 2 else 0)
+        try:
+            db.settle(
+                user_id, 1, payout - bet, "game", f"Bench bet: {bet}, win: {payout}",
+                min_balance=None, result=RoundResult("bau_cua", bet, payout),
+                game_type="bau_cua", bet=bet, payout=payout
+            )
+            result["commits"] += 1
+        except OperationalError:
+            result["locked"] += 1
+
+
+def run_profile(profile: str, database_url: str, settles: int, threads: int, users: int):
+    # Import sau khi đã trỏ DATABASE_URL sang file tạm
+    from database.database_manager import DatabaseManager
+
+    db = DatabaseManager(database_url, profile)
+    # Mở sẵn tài khoản để chỉ đo đường settle
+    with contextlib.redirect_stdout(io.StringIO()):
+        for user_id in range(1000, 1000 + users):
+            db.get_or_create_user_balance(user_id, 1)
+
+    results = [{"commits": 0, "locked": 0} for _ in range(threads)]
+    workers = [
+        threading.Thread(target=writer, args=(db, results[n], n, settles // threads, users))
+        for n in range(threads)
+    ]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    commits = sum(r["commits"] for r in results)
+    locked = sum(r["locked"] for r in results)
+    with db.engine.connect() as conn:
+        mode = conn.exec_driver_sql("PRAGMA journal_mode").scalar() if db.engine.dialect.name == "sqlite" else "-"
+    print("%-8s %6d commits in %6.2fs | %8.0f commits/s | locked %d | journal %s"
+          % (profile, commits, elapsed, commits / elapsed, locked, mode))
+    db.engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--settles", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--profiles", nargs="+", choices=ENGINE_PROFILES, default=list(ENGINE_PROFILES))
+    parser.add_argument("--database-url", help="Database có sẵn (mặc định: SQLite tạm cho mỗi profile)")
+    args = parser.parse_args()
+
+    for profile in args.profiles:
+        with tempfile.TemporaryDirectory() as tmp:
+            database_url = args.database_url or "sqlite:///" + os.path.join(tmp, "bench.db")
+            config.DATABASE_URL = database_url
+            run_profile(profile, database_url, args.settles, args.threads, args.users)
@@ -1,8 +1,11 @@
 import discord
 from discord.ext import commands
+import time
 from typing import Optional
 
 from config import config
+from games.rtp import rtp_table
+from database.reconciliation import REPAIR_MODES, describe
 
 class AdminCog(commands.Cog):
     def __init__(self, bot):
@@ -25,11 +28,13 @@ class AdminCog(commands.Cog):
                 await ctx.send("❌ Số tiền phải lớn hơn 0!")
                 return
             
-            self.db.update_balance(member.id, ctx.guild.id, amount)
-            self.db.add_transaction(
+            new_balance = await self.db.settle(
                 member.id, ctx.guild.id, amount, "admin",
                 f"Admin {ctx.author.display_name} add money"
             )
+            if new_balance is None:
+                await ctx.send("❌ Không thể thêm tiền, vui lòng thử lại!")
+                return
             
             embed = discord.Embed(
                 title="✅ Thêm tiền thành công",
@@ -53,14 +58,18 @@ class AdminCog(commands.Cog):
                 await ctx.send("❌ Số tiền phải lớn hơn 0!")
                 return
             
-            current_balance = self.db.get_user_balance(member.id, ctx.guild.id).balance
-            remove_amount = min(amount, current_balance)
-            
-            self.db.update_balance(member.id, ctx.guild.id, -remove_amount)
-            self.db.add_transaction(
-                member.id, ctx.guild.id, -remove_amount, "admin",
-                f"Admin {ctx.author.display_name} remove money"
-            )
+            # Giữ lock để số dư không đổi giữa lúc đọc và lúc trừ
+            async with self.db.user_lock(member.id, ctx.guild.id):
+                current_balance = await self.db.get_balance(member.id, ctx.guild.id)
+                remove_amount = min(amount, current_balance)
+                
+                new_balance = await self.db.settle(
+                    member.id, ctx.guild.id, -remove_amount, "admin",
+                    f"Admin {ctx.author.display_name} remove money"
+                )
+            if new_balance is None:
+                await ctx.send("❌ Không thể xóa tiền: số dư đã thay đổi, vui lòng thử lại!")
+                return
             
             embed = discord.Embed(
                 title="✅ Xóa tiền thành công",
@@ -84,14 +93,18 @@ class AdminCog(commands.Cog):
                 await ctx.send("❌ Số dư không thể âm!")
                 return
             
-            current_balance = self.db.get_user_balance(member.id, ctx.guild.id)
-            difference = amount - current_balance.balance
-            
-            self.db.update_balance(member.id, ctx.guild.id, difference)
-            self.db.add_transaction(
-                member.id, ctx.guild.id, difference, "admin",
-                f"Admin {ctx.author.display_name} set balance to {amount}"
-            )
+            # Giữ lock để số dư không đổi giữa lúc đọc và lúc ghi
+            async with self.db.user_lock(member.id, ctx.guild.id):
+                current_balance = await self.db.get_balance(member.id, ctx.guild.id)
+                difference = amount - current_balance
+                
+                new_balance = await self.db.settle(
+                    member.id, ctx.guild.id, difference, "admin",
+                    f"Admin {ctx.author.display_name} set balance to {amount}"
+                )
+            if new_balance is None:
+                await ctx.send("❌ Không thể set số dư: số dư đã thay đổi, vui lòng thử lại!")
+                return
             
             embed = discord.Embed(
                 title="✅ Set số dư thành công",
@@ -111,7 +124,8 @@ class AdminCog(commands.Cog):
             return
         
         try:
-            guild_config = self.db.get_guild_config(ctx.guild.id)
+            # Đọc lại từ database để cache prefix luôn khớp với cấu hình hiện tại
+            guild_config = await self.db.refresh_guild_config(ctx.guild.id)
             if not guild_config:
                 await ctx.send("❌ Server chưa được đăng ký! Sử dụng `!register`")
                 return
@@ -130,5 +144,140 @@ class AdminCog(commands.Cog):
         except Exception as e:
             await ctx.send("❌ Đã xảy ra lỗi khi xem cấu hình!")
 
+    @commands.command(name="cachestats")
+    async def cache_stats(self, ctx):
+        """Xem thống kê cache số dư và ván đang chơi (Admin only)"""
+        if not self.is_admin(ctx.author.id):
+            await ctx.send("❌ Bạn không có quyền sử dụng command này!")
+            return
+        
+        stats = self.db.balance_cache.stats()
+        embed = discord.Embed(
+            title="📈 Cache số dư",
+            color=discord.Color.purple()
+        )
+        embed.add_field(name="Kích thước", value=f"{stats['size']:,} / {stats['max_size']:,}", inline=True)
+        embed.add_field(name="Hit", value=f"{stats['hits']:,}", inline=True)
+        embed.add_field(name="Miss", value=f"{stats['misses']:,}", inline=True)
+        embed.add_field(name="Eviction", value=f"{stats['evictions']:,}", inline=True)
+        embed.add_field(name="Hit rate", value=f"{stats['hit_rate']:.1%}", inline=True)
+        
+        games = self.bot.active_games.stats()
+        embed.add_field(
+            name="🎰 Ván đang chơi",
+            value=(f"{games['size']:,} / {games['max_size']:,} ván, heap {games['heap']:,}\n"
+                   f"Hết hạn: {games['expired']:,} (vượt giới hạn: {games['evicted']:,}) | "
+                   f"Khôi phục: {games['rehydrated']:,} | Snapshot: {games['snapshots_written']:,}"),
+            inline=False
+        )
+        
+        edits = self.bot.edits.stats()
+        embed.add_field(
+            name="✏️ Sửa message",
+            value=(f"Đang chờ: {edits['depth']:,} ({edits['channels']:,} channel) | Đã gửi: {edits['sent']:,}\n"
+                   f"Bỏ qua (đã gộp): {edits['dropped']:,} | 429: {edits['rate_limited']:,} | Lỗi: {edits['failed']:,}"),
+            inline=False
+        )
+        
+        await ctx.send(embed=embed)
+
+    @commands.command(name="rtp")
+    async def show_rtp(self, ctx, luck_factor: float = 1.0):
+        """Xem RTP/house edge chính xác theo luck factor (Admin only)"""
+        if not self.is_admin(ctx.author.id):
+            await ctx.send("❌ Bạn không có quyền sử dụng command này!")
+            return
+        
+        if luck_factor <= 0:
+            await ctx.send("❌ Luck factor phải lớn hơn 0!")
+            return
+        
+        table = rtp_table(luck_factor)
+        embed = discord.Embed(
+            title=f"🎯 RTP với luck factor {luck_factor:g}",
+            color=discord.Color.purple()
+        )
+        for game, title in (("bau_cua", "🎲 Bầu Cua (chia đều cửa)"), ("xoc_dia", "🎪 Xóc Đĩa")):
+            lines = [
+                f"`{bet_type:<12}` RTP {rtp:7.2%} | Edge {1 - rtp:+7.2%}"
+                for bet_type, rtp in table[game].items()
+            ]
+            embed.add_field(name=title, value="\n".join(lines), inline=False)
+        
+        await ctx.send(embed=embed)
+
+    @commands.command(name="exporthistory")
+    async def export_history(self, ctx, member: discord.Member = None):
+        """Xuất lịch sử giao dịch của server (hoặc một người) ra file CSV (Admin only)"""
+        if not self.is_admin(ctx.author.id):
+            await ctx.send("❌ Bạn không có quyền sử dụng command này!")
+            return
+        
+        try:
+            fp, count, size = await self.db.export_transactions(ctx.guild.id, member.id if member else None)
+            with fp:
+                if size > ctx.guild.filesize_limit:
+                    await ctx.send(f"❌ File CSV ({size / 1024 / 1024:.1f} MB, {count:,} dòng) vượt giới hạn upload của server!")
+                    return
+                filename = f"history_{ctx.guild.id}" + (f"_{member.id}" if member else "") + ".csv"
+                await ctx.send(f"📄 {count:,} giao dịch", file=discord.File(fp, filename=filename))
+        except Exception as e:
+            print(f"❌ Error exporting history: {e}")
+            await ctx.send("❌ Đã xảy ra lỗi khi xuất lịch sử!")
+
+    @commands.command(name="reconcile")
+    async def reconcile_balances(self, ctx, scope: str = "incremental", repair_mode: Optional[str] = None):
+        """Đối soát số dư với lịch sử giao dịch - !reconcile [incremental|full] [ledger|balance] (Admin only)"""
+        if not self.is_admin(ctx.author.id):
+            await ctx.send("❌ Bạn không có quyền sử dụng command này!")
+            return
+        
+        if scope not in ("incremental", "full") or repair_mode not in (None, *REPAIR_MODES):
+            await ctx.send("❌ Cách dùng: `!reconcile [incremental|full] [ledger|balance]`")
+            return
+        
+        try:
+            start = time.perf_counter()
+            report = await self.db.reconcile(scope == "incremental", repair_mode)
+            elapsed = time.perf_counter() - start
+            
+            embed = discord.Embed(
+                title="⚖️ Đối soát số dư",
+                color=discord.Color.green() if not report.drifts else discord.Color.red()
+            )
+            embed.add_field(name="Đã kiểm tra", value=f"{report.checked:,} user trong {elapsed:.2f}s", inline=True)
+            embed.add_field(name="Lệch", value=f"{len(report.drifts):,}", inline=True)
+            if repair_mode:
+                embed.add_field(name=f"Đã sửa ({repair_mode})", value=f"{report.repaired:,}", inline=True)
+            if report.drifts:
+                embed.add_field(name="Chi tiết", value="```\n" + "\n".join(describe(report, 10)) + "\n```", inline=False)
+            await ctx.send(embed=embed)
+        except Exception as e:
+            print(f"❌ Error reconciling balances: {e}")
+            await ctx.send("❌ Đã xảy ra lỗi khi đối soát!")
+
+    @commands.command(name="verifyfair")
+    async def verify_fair(self, ctx):
+        """Kiểm tra lại mọi ván provably fair có server seed đã công bố (Admin only)"""
+        if not self.is_admin(ctx.author.id):
+            await ctx.send("❌ Bạn không có quyền sử dụng command này!")
+            return
+        
+        start = time.perf_counter()
+        report = await self.bot.fair_seeds.verify_history()
+        elapsed = time.perf_counter() - start
+        
+        embed = discord.Embed(
+            title="🔐 Kiểm tra provably fair",
+            color=discord.Color.green() if not report.mismatched else discord.Color.red()
+        )
+        embed.add_field(name="Đã kiểm tra", value=f"{report.checked:,} ván trong {elapsed:.2f}s", inline=True)
+        embed.add_field(name="Chưa công bố seed", value=f"{report.unrevealed:,}", inline=True)
+        mismatched = f"{len(report.mismatched):,}"
+        if report.mismatched:
+            mismatched += " (id: " + ", ".join(str(round_id) for round_id in report.mismatched[:20]) + ")"
+        embed.add_field(name="Không khớp", value=mismatched, inline=False)
+        await ctx.send(embed=embed)
+
 async def setup(bot):
     await bot.add_cog(AdminCog(bot))
\ No newline at end of file
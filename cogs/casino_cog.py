@@ -5,23 +5,24 @@ import asyncio
 from typing import Optional, Dict, Any
 import random
 
-from database.database_manager import DatabaseManager
 from games.blackjack import BlackjackGame
 from games.bau_cua import BauCuaGame, BauCuaAnimal
 from games.xoc_dia import XocDiaGame, XocDiaBetType
+from games.provably_fair import round_ref
+from games.rng import new_round_id
+from database.player_stats import RoundResult
 from config import config
+from cogs import render
+from cogs.history_view import HistoryView
 
 class CasinoCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.db = bot.db
     
-    def get_user_balance(self, user_id: int, guild_id: int) -> int:
+    async def get_user_balance(self, user_id: int, guild_id: int) -> int:
         """Lấy số dư của user"""
-        balance_obj = self.db.get_user_balance(user_id, guild_id)
-        if not balance_obj:
-            balance_obj = self.db.create_user_balance(user_id, guild_id)
-        return balance_obj.balance
+        return await self.db.get_balance(user_id, guild_id)
     
     def is_admin(self, user_id: int) -> bool:
         """Kiểm tra có phải admin không"""
@@ -32,12 +33,13 @@ class CasinoCog(commands.Cog):
     async def register_guild(self, ctx, prefix: str = "!", starting_balance: int = 1000):
         """Đăng ký server với casino bot"""
         try:
-            guild_config = self.db.get_guild_config(ctx.guild.id)
+            # Đọc lại từ database (không tin cache) trước khi đăng ký
+            guild_config = await self.db.refresh_guild_config(ctx.guild.id)
             if guild_config:
                 await ctx.send("❌ Server này đã được đăng ký!")
                 return
             
-            self.db.create_guild_config(ctx.guild.id, prefix, starting_balance)
+            await self.db.create_guild_config(ctx.guild.id, prefix, starting_balance)
             await ctx.send(f"✅ Đã đăng ký server thành công! Prefix: `{prefix}`, Số tiền khởi đầu: `{starting_balance}`")
         except Exception as e:
             await ctx.send("❌ Đã xảy ra lỗi khi đăng ký server!")
@@ -47,7 +49,7 @@ class CasinoCog(commands.Cog):
         """Kiểm tra số dư"""
         try:
             target = member or ctx.author
-            balance = self.get_user_balance(target.id, ctx.guild.id)
+            balance = await self.get_user_balance(target.id, ctx.guild.id)
             
             if self.is_admin(target.id):
                 balance_text = "♾️ Vô hạn (Admin)"
@@ -63,6 +65,40 @@ class CasinoCog(commands.Cog):
         except Exception as e:
             await ctx.send("❌ Đã xảy ra lỗi khi kiểm tra số dư!")
     
+    @commands.command(name="leaderboard", aliases=["lb", "top"])
+    async def show_leaderboard(self, ctx):
+        """Bảng xếp hạng số dư của server"""
+        try:
+            entries = await self.db.get_leaderboard(ctx.guild.id)
+            await ctx.send(embed=render.leaderboard_embed(ctx.guild.name, entries))
+        except Exception as e:
+            await ctx.send("❌ Đã xảy ra lỗi khi xem bảng xếp hạng!")
+    
+    @commands.command(name="history", aliases=["hist"])
+    async def show_history(self, ctx, member: discord.Member = None):
+        """Lịch sử giao dịch (xem của người khác: Admin only)"""
+        try:
+            target = member or ctx.author
+            if target != ctx.author and not self.is_admin(ctx.author.id):
+                await ctx.send("❌ Bạn chỉ xem được lịch sử của mình!")
+                return
+            
+            view = HistoryView(self.db, ctx.author.id, target.id, ctx.guild.id, target.display_name)
+            embed = await view.load()
+            view.message = await ctx.send(embed=embed, view=view)
+        except Exception as e:
+            await ctx.send("❌ Đã xảy ra lỗi khi xem lịch sử!")
+    
+    @commands.command(name="stats")
+    async def show_stats(self, ctx, member: discord.Member = None):
+        """Thống kê thắng/thua theo từng game"""
+        try:
+            target = member or ctx.author
+            stats = await self.db.get_player_stats(target.id, ctx.guild.id)
+            await ctx.send(embed=render.stats_embed(target.display_name, stats))
+        except Exception as e:
+            await ctx.send("❌ Đã xảy ra lỗi khi xem thống kê!")
+    
     @commands.command(name="blackjack", aliases=["bj"])
     async def play_blackjack(self, ctx, bet: int):
         """Chơi Blackjack"""
@@ -70,33 +106,31 @@ class CasinoCog(commands.Cog):
             user_id = ctx.author.id
             guild_id = ctx.guild.id
             
-            # Kiểm tra số dư
+            if bet <= 0:
+                await ctx.send("❌ Số tiền cược phải lớn hơn 0!")
+                return
+            
+            # Trừ tiền cược (kiểm tra số dư trong cùng câu UPDATE)
+            round_id = new_round_id()
             if not self.is_admin(user_id):
-                balance = self.get_user_balance(user_id, guild_id)
-                if balance < bet:
+                new_balance = await self.db.settle(
+                    user_id, guild_id, -bet, "game",
+                    f"Blackjack bet: {bet}",
+                    game_type="blackjack", round_id=round_id, bet=bet, payout=0
+                )
+                if new_balance is None:
                     await ctx.send("❌ Bạn không đủ tiền để đặt cược!")
                     return
-                
-                if bet <= 0:
-                    await ctx.send("❌ Số tiền cược phải lớn hơn 0!")
-                    return
             
             # Tạo game mới
             luck_factor = 1.0  # Có thể điều chỉnh dựa trên user stats
-            game = BlackjackGame(bet, user_id, luck_factor)
+            shoe = self.bot.shoes.get(guild_id, ctx.channel.id)
+            game = BlackjackGame(bet, user_id, luck_factor, shoe=shoe, round_id=round_id)
             
             # Lưu game active
             game_key = f"{user_id}_{guild_id}"
             self.bot.active_games[game_key] = game
             
-            # Trừ tiền cược
-            if not self.is_admin(user_id):
-                self.db.update_balance(user_id, guild_id, -bet)
-                self.db.add_transaction(
-                    user_id, guild_id, -bet, "game", 
-                    f"Blackjack bet: {bet}"
-                )
-            
             # Hiển thị game
             await self.display_blackjack_game(ctx, game)
             
@@ -107,68 +141,25 @@ class CasinoCog(commands.Cog):
     
     async def display_blackjack_game(self, ctx, game: BlackjackGame):
         """Hiển thị game Blackjack"""
-        state = game.get_game_state()
-        
-        embed = discord.Embed(title="🎰 Blackjack", color=discord.Color.blue())
-        embed.add_field(
-            name="Bài của bạn",
-            value=f"{' '.join(state['player_hand'])} (Điểm: {state['player_value']})",
-            inline=False
-        )
-        
-        if state['game_over']:
-            embed.add_field(
-                name="Bài của Dealer", 
-                value=f"{' '.join(state['dealer_hand'])} (Điểm: {state['dealer_value']})",
-                inline=False
-            )
-        else:
-            embed.add_field(
-                name="Bài của Dealer",
-                value=f"{state['dealer_hand'][0]} ? ? (Điểm: {state['dealer_value']}+)",
-                inline=False
-            )
-        
-        embed.add_field(name="💰 Cược", value=f"{state['bet']:,}", inline=True)
+        embed = render.blackjack_embed(game, controls=True)
         
-        if state['game_over']:
-            result_text = {
-                "BUST": "💥 Bạn đã quá 21!",
-                "DEALER_BUST": "🎉 Dealer quá 21! Bạn thắng!",
-                "WIN": "🎉 Bạn thắng!",
-                "LOSE": "😞 Bạn thua!",
-                "PUSH": "🤝 Hòa!",
-                "BLACKJACK": "🎯 Blackjack! Tuyệt vời!"
-            }.get(state['result'], state['result'])
-            
-            embed.add_field(name="Kết quả", value=result_text, inline=False)
-            embed.add_field(name="💰 Thưởng", value=f"{state['payout']:,}", inline=True)
-            
-            # Cộng tiền thắng
-            if not self.is_admin(game.user_id) and state['payout'] > 0:
-                self.db.update_balance(game.user_id, ctx.guild.id, state['payout'])
-                self.db.add_transaction(
-                    game.user_id, ctx.guild.id, state['payout'], "game",
-                    f"Blackjack win: {state['payout']}"
-                )
+        if game.game_over:
+            # Cộng tiền thắng (reaper có thể đã trả khi ván hết hạn)
+            if not game.settled and not self.is_admin(game.user_id):
+                result = RoundResult("blackjack", game.bet, game.payout)
+                if game.payout > 0:
+                    await self.db.settle(
+                        game.user_id, ctx.guild.id, game.payout, "game",
+                        f"Blackjack win: {game.payout}", result=result,
+                        game_type="blackjack", round_id=game.round_id, bet=0, payout=game.payout
+                    )
+                else:
+                    await self.db.record_results([(game.user_id, ctx.guild.id, result)])
+            game.settled = True
             
             # Xóa game khỏi active
             game_key = f"{game.user_id}_{ctx.guild.id}"
             self.bot.active_games.pop(game_key, None)
-            
-        else:
-            # Hiển thị nút điều khiển
-            controls = ["🔄 !hit", "✋ !stand", "💰 !double"] 
-            if state['can_double']:
-                controls.append("💰 !double")
-            if state['can_split']:
-                controls.append("➗ !split")
-                
-            embed.add_field(
-                name="Điều khiển", 
-                value=" | ".join(controls),
-                inline=False
-            )
         
         await ctx.send(embed=embed)
     
@@ -187,38 +178,74 @@ class CasinoCog(commands.Cog):
         """Double trong Blackjack"""
         await self.handle_blackjack_action(ctx, "double")
     
+    @commands.command(name="split")
+    async def blackjack_split(self, ctx):
+        """Split trong Blackjack"""
+        await self.handle_blackjack_action(ctx, "split")
+    
     async def handle_blackjack_action(self, ctx, action: str):
         """Xử lý action Blackjack"""
         try:
-            game_key = f"{ctx.author.id}_{ctx.guild.id}"
-            game = self.bot.active_games.get(game_key)
-            
-            if not game or not isinstance(game, BlackjackGame):
-                await ctx.send("❌ Bạn không có game Blackjack đang active!")
-                return
-            
-            # Xử lý action
-            if action == "hit":
-                success = game.player_hit()
-            elif action == "stand":
-                game.player_stand()
-                success = True
-            elif action == "double":
-                if not self.is_admin(ctx.author.id):
-                    balance = self.get_user_balance(ctx.author.id, ctx.guild.id)
-                    if balance < game.bet:
-                        await ctx.send("❌ Bạn không đủ tiền để double!")
+            # Lock theo user: các lệnh gửi liên tục được xử lý lần lượt
+            async with self.db.user_lock(ctx.author.id, ctx.guild.id):
+                game_key = f"{ctx.author.id}_{ctx.guild.id}"
+                # Nạp lại từ snapshot nếu bot vừa khởi động lại
+                game = await self.bot.active_games.load(
+                    ctx.author.id, ctx.guild.id, shoe=self.bot.shoes.get(ctx.guild.id, ctx.channel.id)
+                )
+                
+                if not game or not isinstance(game, BlackjackGame):
+                    await ctx.send("❌ Bạn không có game Blackjack đang active!")
+                    return
+                
+                # Xử lý action
+                if action == "hit":
+                    success = game.player_hit()
+                elif action == "stand":
+                    game.player_stand()
+                    success = True
+                elif action == "double":
+                    if not game.can_double():
+                        await ctx.send("❌ Action không hợp lệ!")
                         return
-                    self.db.update_balance(ctx.author.id, ctx.guild.id, -game.bet)
                 
-                success = game.player_double()
-            else:
-                success = False
-            
-            if success:
-                await self.display_blackjack_game(ctx, game)
-            else:
-                await ctx.send("❌ Action không hợp lệ!")
+                    if not self.is_admin(ctx.author.id):
+                        new_balance = await self.db.settle(
+                            ctx.author.id, ctx.guild.id, -game.current_bet, "game",
+                            f"Blackjack double: {game.current_bet}",
+                            game_type="blackjack", round_id=game.round_id, bet=game.current_bet, payout=0
+                        )
+                        if new_balance is None:
+                            await ctx.send("❌ Bạn không đủ tiền để double!")
+                            return
+                
+                    success = game.player_double()
+                elif action == "split":
+                    if not game.can_split():
+                        await ctx.send("❌ Action không hợp lệ!")
+                        return
+                    
+                    # Tay mới có cùng mức cược với tay đang split
+                    if not self.is_admin(ctx.author.id):
+                        new_balance = await self.db.settle(
+                            ctx.author.id, ctx.guild.id, -game.current_bet, "game",
+                            f"Blackjack split: {game.current_bet}",
+                            game_type="blackjack", round_id=game.round_id, bet=game.current_bet, payout=0
+                        )
+                        if new_balance is None:
+                            await ctx.send("❌ Bạn không đủ tiền để split!")
+                            return
+                    
+                    success = game.player_split()
+                else:
+                    success = False
+                
+                # Hit quá 21 trả về False nhưng ván đã kết thúc, vẫn cần hiển thị kết quả
+                if success or game.game_over:
+                    self.bot.active_games.touch(game_key)
+                    await self.display_blackjack_game(ctx, game)
+                else:
+                    await ctx.send("❌ Action không hợp lệ!")
                 
         except Exception as e:
             await ctx.send("❌ Đã xảy ra lỗi khi xử lý action!")
@@ -260,24 +287,25 @@ class CasinoCog(commands.Cog):
                 animal_bets[animal] = bet_per_animal
                 total_bet += bet_per_animal
             
-            # Kiểm tra số dư
-            if not self.is_admin(user_id):
-                balance = self.get_user_balance(user_id, guild_id)
-                if balance < total_bet:
-                    await ctx.send("❌ Bạn không đủ tiền để đặt cược!")
-                    return
-            
             # Tạo game
             luck_factor = 1.0
-            game = BauCuaGame(animal_bets, user_id, luck_factor)
+            pool = await self.bot.fair_seeds.next_pool(user_id, guild_id)
+            game = BauCuaGame(animal_bets, user_id, luck_factor, rng=pool)
             
-            # Trừ tiền cược
+            # Trừ cược và cộng thưởng trong một lần settle.
+            # balance + (payout - bet) >= payout  <=>  balance >= bet
             if not self.is_admin(user_id):
-                self.db.update_balance(user_id, guild_id, -total_bet)
-                self.db.add_transaction(
-                    user_id, guild_id, -total_bet, "game",
-                    f"Bau Cua bet: {total_bet}"
+                new_balance = await self.db.settle(
+                    user_id, guild_id, game.payout - total_bet, "game",
+                    f"Bau Cua bet: {total_bet}, win: {game.payout}, fair: {round_ref(pool)}",
+                    min_balance=game.payout, result=RoundResult("bau_cua", total_bet, game.payout),
+                    game_type="bau_cua", round_id=round_ref(pool), bet=total_bet, payout=game.payout
                 )
+                if new_balance is None:
+                    await ctx.send("❌ Bạn không đủ tiền để đặt cược!")
+                    return
+            
+            await self.bot.fair_seeds.record(user_id, guild_id, "bau_cua", pool, game)
             
             # Hiển thị kết quả
             await self.display_bau_cua_result(ctx, game)
@@ -287,34 +315,7 @@ class CasinoCog(commands.Cog):
     
     async def display_bau_cua_result(self, ctx, game: BauCuaGame):
         """Hiển thị kết quả Bầu Cua"""
-        state = game.get_game_state()
-        
-        embed = discord.Embed(title="🎲 Bầu Cua", color=discord.Color.green())
-        
-        # Hiển thị kết quả xúc xắc
-        dice_display = " ".join([emoji for _, emoji in state['dice_results']])
-        embed.add_field(name="🎯 Kết quả", value=dice_display, inline=False)
-        
-        # Hiển thị cược
-        bets_text = "\n".join([f"{animal}: {amount:,}" for animal, amount in state['bets'].items()])
-        embed.add_field(name="💰 Cược của bạn", value=bets_text, inline=True)
-        
-        # Hiển thị kết quả chi tiết
-        result_text = f"Tổng cược: {state['total_bet']:,}\n"
-        result_text += f"Thưởng: {state['payout']:,}\n"
-        result_text += f"Lợi nhuận: {state['profit']:,}"
-        
-        embed.add_field(name="📊 Kết quả", value=result_text, inline=True)
-        
-        # Cộng tiền thắng
-        if not self.is_admin(game.user_id) and state['payout'] > 0:
-            self.db.update_balance(game.user_id, ctx.guild.id, state['payout'])
-            self.db.add_transaction(
-                game.user_id, ctx.guild.id, state['payout'], "game",
-                f"Bau Cua win: {state['payout']}"
-            )
-        
-        await ctx.send(embed=embed)
+        await ctx.send(embed=render.bau_cua_embed(game))
     
     @commands.command(name="xocdia", aliases=["xd"])
     async def play_xoc_dia(self, ctx, bet: int, bet_type: str):
@@ -339,25 +340,29 @@ class CasinoCog(commands.Cog):
                 await ctx.send("❌ Loại cược không hợp lệ! Các loại: chan, le, 4do, 4trang, 3do, 3trang, 2do")
                 return
             
-            # Kiểm tra số dư
-            if not self.is_admin(user_id):
-                balance = self.get_user_balance(user_id, guild_id)
-                if balance < bet:
-                    await ctx.send("❌ Bạn không đủ tiền để đặt cược!")
-                    return
+            if bet <= 0:
+                await ctx.send("❌ Số tiền cược phải lớn hơn 0!")
+                return
             
             # Tạo game
             bets = {xd_bet_type: bet}
             luck_factor = 1.0
-            game = XocDiaGame(bets, user_id, luck_factor)
+            pool = await self.bot.fair_seeds.next_pool(user_id, guild_id)
+            game = XocDiaGame(bets, user_id, luck_factor, rng=pool)
             
-            # Trừ tiền cược
+            # Trừ cược và cộng thưởng trong một lần settle (xem Bầu Cua)
             if not self.is_admin(user_id):
-                self.db.update_balance(user_id, guild_id, -bet)
-                self.db.add_transaction(
-                    user_id, guild_id, -bet, "game",
-                    f"Xoc Dia bet: {bet} ({bet_type})"
+                new_balance = await self.db.settle(
+                    user_id, guild_id, game.payout - bet, "game",
+                    f"Xoc Dia bet: {bet} ({bet_type}), win: {game.payout}, fair: {round_ref(pool)}",
+                    min_balance=game.payout, result=RoundResult("xoc_dia", bet, game.payout),
+                    game_type="xoc_dia", round_id=round_ref(pool), bet=bet, payout=game.payout
                 )
+                if new_balance is None:
+                    await ctx.send("❌ Bạn không đủ tiền để đặt cược!")
+                    return
+            
+            await self.bot.fair_seeds.record(user_id, guild_id, "xoc_dia", pool, game)
             
             # Hiển thị kết quả
             await self.display_xoc_dia_result(ctx, game)
@@ -367,31 +372,7 @@ class CasinoCog(commands.Cog):
     
     async def display_xoc_dia_result(self, ctx, game: XocDiaGame):
         """Hiển thị kết quả Xóc Đĩa"""
-        state = game.get_game_state()
-        
-        embed = discord.Embed(title="🎪 Xóc Đĩa", color=discord.Color.orange())
-        
-        # Hiển thị kết quả đồng xu
-        coins_display = " ".join(state['coin_results'])
-        embed.add_field(name="🎯 Kết quả", value=coins_display, inline=False)
-        embed.add_field(name="🔴 Số mặt đỏ", value=state['red_count'], inline=True)
-        
-        # Hiển thị kết quả
-        result_text = f"Cược: {state['total_bet']:,}\n"
-        result_text += f"Thưởng: {state['payout']:,}\n"
-        result_text += f"Lợi nhuận: {state['profit']:,}"
-        
-        embed.add_field(name="📊 Kết quả", value=result_text, inline=True)
-        
-        # Cộng tiền thắng
-        if not self.is_admin(game.user_id) and state['payout'] > 0:
-            self.db.update_balance(game.user_id, ctx.guild.id, state['payout'])
-            self.db.add_transaction(
-                game.user_id, ctx.guild.id, state['payout'], "game",
-                f"Xoc Dia win: {state['payout']}"
-            )
-        
-        await ctx.send(embed=embed)
+        await ctx.send(embed=render.xoc_dia_embed(game))
     
     @commands.command(name="transfer")
     async def transfer_money(self, ctx, member: discord.Member, amount: int):
@@ -405,25 +386,15 @@ class CasinoCog(commands.Cog):
                 await ctx.send("❌ Bạn không thể chuyển tiền cho chính mình!")
                 return
             
-            # Kiểm tra số dư
-            sender_balance = self.get_user_balance(ctx.author.id, ctx.guild.id)
-            if sender_balance < amount:
-                await ctx.send("❌ Bạn không đủ tiền để chuyển!")
-                return
-            
-            # Thực hiện chuyển tiền
-            self.db.update_balance(ctx.author.id, ctx.guild.id, -amount)
-            self.db.update_balance(member.id, ctx.guild.id, amount)
-            
-            # Ghi log transaction
-            self.db.add_transaction(
-                ctx.author.id, ctx.guild.id, -amount, "transfer",
-                f"Chuyển tiền cho {member.display_name}"
-            )
-            self.db.add_transaction(
-                member.id, ctx.guild.id, amount, "transfer",
+            # Chuyển tiền và ghi log trong một transaction
+            sender_balance = await self.db.transfer(
+                ctx.author.id, member.id, ctx.guild.id, amount,
+                f"Chuyển tiền cho {member.display_name}",
                 f"Nhận tiền từ {ctx.author.display_name}"
             )
+            if sender_balance is None:
+                await ctx.send("❌ Bạn không đủ tiền để chuyển!")
+                return
             
             embed = discord.Embed(
                 title="✅ Chuyển tiền thành công",
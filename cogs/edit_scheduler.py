@@ -0,0 +1,157 @@
+import discord
+import asyncio
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+from config import config
+
+class _PendingEdit:
+    __slots__ = ("message", "kwargs", "final")
+
+    def __init__(self, message: discord.Message, kwargs: dict, final: bool):
+        self.message = message
+        self.kwargs = kwargs
+        self.final = final
+
+class _ChannelQueue:
+    """Hàng đợi edit và rate limit của một channel"""
+    __slots__ = ("finals", "updates", "sent_at", "blocked_until", "task")
+
+    def __init__(self):
+        self.finals: Deque[int] = deque()   # Message id có edit kết quả cuối, gửi trước
+        self.updates: Deque[int] = deque()  # Message id có edit trạng thái trung gian
+        self.sent_at: Deque[float] = deque()  # Thời điểm các edit gần đây (cửa sổ trượt)
+        self.blocked_until = 0.0  # Sau 429: chờ đến lúc này
+        self.task: Optional[asyncio.Task] = None
+
+class EditScheduler:
+    """Gom và giới hạn tốc độ các lần sửa message game theo từng channel.
+
+    submit() không chờ Discord: mỗi message chỉ giữ edit mới nhất (edit cũ
+    chưa gửi bị bỏ), mỗi channel có một task gửi lần lượt với tối đa
+    EDIT_RATE_LIMIT edit trong EDIT_RATE_WINDOW giây. Edit kết quả cuối
+    (final=True) được gửi trước các edit trung gian. Khi Discord vẫn trả 429,
+    channel bị chặn theo retry_after và edit được xếp lại.
+    """
+
+    def __init__(self, rate_limit: Optional[int] = None, window: Optional[float] = None):
+        self.rate_limit = rate_limit or config.EDIT_RATE_LIMIT
+        self.window = window or config.EDIT_RATE_WINDOW
+        self._pending: Dict[int, _PendingEdit] = {}
+        self._channels: Dict[int, _ChannelQueue] = {}
+
+        self.sent = 0
+        self.dropped = 0
+        self.rate_limited = 0
+        self.failed = 0
+
+    def submit(self, message: discord.Message, final: bool = False, **kwargs):
+        """Xếp lịch sửa `message` với kwargs của Message.edit; edit sau thay edit trước"""
+        queue = self._channels.get(message.channel.id)
+        if queue is None:
+            queue = self._channels[message.channel.id] = _ChannelQueue()
+
+        pending = self._pending.get(message.id)
+        if pending is not None:
+            # Trạng thái trung gian chưa kịp gửi thì bỏ, chỉ giữ bản mới nhất
+            self.dropped += 1
+            pending.message = message
+            pending.kwargs = kwargs
+            if final and not pending.final:
+                pending.final = True
+                queue.finals.append(message.id)
+        else:
+            self._pending[message.id] = _PendingEdit(message, kwargs, final)
+            (queue.finals if final else queue.updates).append(message.id)
+
+        if queue.task is None:
+            queue.task = asyncio.create_task(self._drain(message.channel.id, queue))
+
+    @property
+    def depth(self) -> int:
+        """Số message đang chờ sửa"""
+        return len(self._pending)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "depth": self.depth,
+            "channels": sum(1 for queue in self._channels.values() if queue.task is not None),
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "rate_limited": self.rate_limited,
+            "failed": self.failed
+        }
+
+    def _next(self, queue: _ChannelQueue) -> Optional[int]:
+        """Message id kế tiếp cần gửi, ưu tiên edit kết quả cuối"""
+        while queue.finals:
+            message_id = queue.finals.popleft()
+            pending = self._pending.get(message_id)
+            if pending is not None and pending.final:
+                return message_id
+        while queue.updates:
+            message_id = queue.updates.popleft()
+            if message_id in self._pending:
+                return message_id
+        return None
+
+    async def _wait_for_slot(self, queue: _ChannelQueue):
+        while True:
+            now = time.monotonic()
+            while queue.sent_at and queue.sent_at[0] <= now - self.window:
+                queue.sent_at.popleft()
+
+            wait = queue.blocked_until - now
+            if len(queue.sent_at) >= self.rate_limit:
+                wait = max(wait, queue.sent_at[0] + self.window - now)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    async def _drain(self, channel_id: int, queue: _ChannelQueue):
+        try:
+            while True:
+                # Chờ slot trước khi lấy edit, để các submit trong lúc chờ được gom lại
+                await self._wait_for_slot(queue)
+                message_id = self._next(queue)
+                if message_id is None:
+                    break
+
+                edit = self._pending.pop(message_id)
+                queue.sent_at.append(time.monotonic())
+                try:
+                    await edit.message.edit(**edit.kwargs)
+                    self.sent += 1
+                except discord.HTTPException as e:
+                    if e.status != 429:
+                        self.failed += 1
+                        print(f"Error editing message {message_id}: {e}")
+                        continue
+
+                    self.rate_limited += 1
+                    retry_after = float(e.response.headers.get("Retry-After", self.window))
+                    queue.blocked_until = time.monotonic() + retry_after
+                    # Gửi lại sau nếu chưa có bản mới hơn
+                    if message_id not in self._pending:
+                        self._pending[message_id] = edit
+                        (queue.finals if edit.final else queue.updates).appendleft(message_id)
+                except Exception as e:
+                    self.failed += 1
+                    print(f"Error editing message {message_id}: {e}")
+        finally:
+            queue.task = None
+            # Giữ lại channel còn edit gần đây để lần sau vẫn tính đúng rate limit
+            now = time.monotonic()
+            if not queue.finals and not queue.updates and (not queue.sent_at or queue.sent_at[-1] <= now - self.window):
+                self._channels.pop(channel_id, None)
+
+    async def close(self, timeout: float = 5.0):
+        """Chờ gửi nốt các edit đang chờ (tối đa `timeout` giây) rồi dừng"""
+        tasks: List[asyncio.Task] = [queue.task for queue in self._channels.values() if queue.task is not None]
+        if tasks:
+            done, running = await asyncio.wait(tasks, timeout=timeout)
+            for task in running:
+                task.cancel()
+        self._pending.clear()
+        self._channels.clear()
@@ -0,0 +1,74 @@
+import discord
+from typing import List, Optional, Tuple
+
+from cogs import render
+from config import config
+
+class HistoryView(discord.ui.View):
+    """Lật trang lịch sử giao dịch của một user.
+
+    Mỗi trang được đọc theo keyset (created_at, id) của dòng cuối trang trước;
+    `cursors` giữ keyset đầu mỗi trang đã xem để quay lại không cần query lùi.
+    """
+
+    def __init__(self, db, viewer_id: int, user_id: int, guild_id: int, name: str):
+        super().__init__(timeout=180)
+        self.db = db
+        self.viewer_id = viewer_id
+        self.user_id = user_id
+        self.guild_id = guild_id
+        self.name = name
+        self.page_size = config.HISTORY_PAGE_SIZE
+        self.cursors: List[Optional[Tuple]] = [None]  # cursors[i]: keyset trước trang i
+        self.rows: List[Tuple] = []
+        self.has_next = False
+        self.message: Optional[discord.Message] = None
+
+        self.prev_button = HistoryPageButton(-1, "◀️ Mới hơn")
+        self.next_button = HistoryPageButton(1, "Cũ hơn ▶️")
+        self.add_item(self.prev_button)
+        self.add_item(self.next_button)
+
+    @property
+    def page(self) -> int:
+        return len(self.cursors) - 1
+
+    async def load(self) -> discord.Embed:
+        """Đọc trang hiện tại (thêm một dòng để biết còn trang sau không) và dựng embed"""
+        rows = await self.db.get_transactions(self.user_id, self.guild_id, self.cursors[-1], self.page_size + 1)
+        self.has_next = len(rows) > self.page_size
+        self.rows = rows[:self.page_size]
+        self.prev_button.disabled = self.page == 0
+        self.next_button.disabled = not self.has_next
+        return render.history_embed(self.name, self.rows, self.page)
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.user.id != self.viewer_id:
+            await interaction.response.send_message("❌ Đây không phải lịch sử bạn đang xem!", ephemeral=True)
+            return False
+        return True
+
+    async def on_timeout(self):
+        if self.message is None:
+            return
+        for item in self.children:
+            item.disabled = True
+        try:
+            await self.message.edit(view=self)
+        except Exception as e:
+            print(f"Error updating message: {e}")
+
+class HistoryPageButton(discord.ui.Button):
+    def __init__(self, step: int, label: str):
+        super().__init__(style=discord.ButtonStyle.secondary, label=label)
+        self.step = step
+
+    async def callback(self, interaction: discord.Interaction):
+        view: HistoryView = self.view
+        if self.step > 0 and view.has_next:
+            last = view.rows[-1]
+            view.cursors.append((last[1], last[0]))
+        elif self.step < 0 and view.page > 0:
+            view.cursors.pop()
+        embed = await view.load()
+        await interaction.response.edit_message(embed=embed, view=view)
@@ -0,0 +1,220 @@
+"""Dựng embed kết quả game từ state gọn của game.
+
+Các phần tĩnh (text kết quả, emoji xúc xắc/đồng xu, chuỗi lá bài của dealer,
+dòng điều khiển, màu) được tính một lần lúc import; mỗi lần cập nhật chỉ
+ghép vài chuỗi và gọi Embed.add_field. Các hàm ở đây chỉ hiển thị, không
+trả tiền hay thay đổi game.
+"""
+import discord
+from itertools import product
+from typing import Dict, Tuple
+
+from games.autoplay import AutoplayResult
+from games.bau_cua import BauCuaAnimal, BauCuaGame
+from games.blackjack import BlackjackGame
+from games.card_game import CARDS_PER_DECK, CARD_HARD_VALUE, CARD_STR
+from games.hand import Hand
+from games.provably_fair import FairPool
+from games.xoc_dia import XocDiaGame
+
+BLACKJACK_RESULT_TEXT = {
+    "BUST": "💥 Bạn đã quá 21!",
+    "DEALER_BUST": "🎉 Dealer quá 21! Bạn thắng!",
+    "WIN": "🎉 Bạn thắng!",
+    "LOSE": "😞 Bạn thua!",
+    "PUSH": "🤝 Hòa!",
+    "BLACKJACK": "🎯 Blackjack! Tuyệt vời!",
+    "EXPIRED": "⏰ Ván đã hết thời gian!",
+    "SPLIT": "✂️ Xem kết quả từng tay"
+}
+
+BLACKJACK_COLOR = discord.Color.blue()
+BAU_CUA_COLOR = discord.Color.green()
+XOC_DIA_COLOR = discord.Color.orange()
+
+# Bài dealer khi còn úp lá thứ hai, theo lá đầu tiên
+DEALER_HIDDEN_TEXT: Tuple[str, ...] = tuple(
+    f"{CARD_STR[i]} ? ? (Điểm: {CARD_HARD_VALUE[i]}+)" for i in range(CARDS_PER_DECK)
+)
+
+# Dòng điều khiển cho lệnh prefix theo (có thể double, có thể split)
+BLACKJACK_CONTROLS: Dict[Tuple[bool, bool], str] = {
+    (can_double, can_split): " | ".join(
+        ["🔄 !hit", "✋ !stand"] + (["💰 !double"] if can_double else []) + (["➗ !split"] if can_split else [])
+    )
+    for can_double, can_split in product((False, True), repeat=2)
+}
+
+_ANIMALS = tuple(BauCuaAnimal)
+ANIMAL_NAME: Dict[BauCuaAnimal, str] = {animal: animal.value[0] for animal in _ANIMALS}
+# Chuỗi emoji cho cả 216 kết quả 3 xúc xắc
+DICE_TEXT: Dict[Tuple[BauCuaAnimal, ...], str] = {
+    dice: " ".join(animal.value[1] for animal in dice) for dice in product(_ANIMALS, repeat=3)
+}
+
+AUTOPLAY_STOP_TEXT = {
+    None: "Đã chơi hết số ván",
+    "stop_loss": "🛑 Dừng do chạm stop-loss",
+    "take_profit": "🎯 Dừng do chạm take-profit"
+}
+
+COIN_GLYPHS = ("⚪", "🔴")
+# Chuỗi emoji cho cả 16 kết quả 4 đồng xu (True = đỏ)
+COIN_TEXT: Dict[Tuple[bool, ...], str] = {
+    coins: " ".join(COIN_GLYPHS[coin] for coin in coins) for coins in product((False, True), repeat=4)
+}
+
+def hand_text(hand: Hand) -> str:
+    return f"{hand} (Điểm: {hand.value})"
+
+def summary_text(total_bet: int, payout: int, bet_label: str = "Tổng cược") -> str:
+    return f"{bet_label}: {total_bet:,}\nThưởng: {payout:,}\nLợi nhuận: {payout - total_bet:,}"
+
+def fair_footer(embed: discord.Embed, rng):
+    """Ghi cam kết provably fair của ván (nếu có) vào footer"""
+    if isinstance(rng, FairPool) and rng.server_seed_hash:
+        embed.set_footer(text=f"🔐 Server seed hash: {rng.server_seed_hash[:16]}… | Client seed: {rng.client_seed} | Nonce: {rng.nonce}")
+
+def blackjack_embed(game: BlackjackGame, controls: bool = False) -> discord.Embed:
+    """Embed của ván Blackjack; controls=True thêm dòng lệnh prefix khi ván chưa xong"""
+    embed = discord.Embed(title="🎰 Blackjack", color=BLACKJACK_COLOR)
+    game_over = game.game_over
+
+    if game.is_split:
+        # Sau split: mỗi tay một dòng, đánh dấu tay đang chơi
+        for i, hand in enumerate(game.hands):
+            value = f"{hand_text(hand)} | Cược: {game.bets[i]:,}"
+            if game_over:
+                result = game.hand_results[i]
+                value += f" | {BLACKJACK_RESULT_TEXT.get(result, result)}"
+            marker = "👉 " if i == game.active else ""
+            embed.add_field(name=f"{marker}Tay {i + 1}", value=value, inline=False)
+    else:
+        embed.add_field(name="Bài của bạn", value=hand_text(game.player_hand), inline=False)
+
+    if game_over:
+        embed.add_field(name="Bài của Dealer", value=hand_text(game.dealer_hand), inline=False)
+    else:
+        embed.add_field(name="Bài của Dealer", value=DEALER_HIDDEN_TEXT[game.dealer_hand.cards[0]], inline=False)
+
+    embed.add_field(name="💰 Cược", value=f"{game.bet:,}", inline=True)
+
+    if game_over:
+        embed.add_field(name="Kết quả", value=BLACKJACK_RESULT_TEXT.get(game.result, game.result), inline=False)
+        embed.add_field(name="💰 Thưởng", value=f"{game.payout:,}", inline=True)
+    elif controls:
+        embed.add_field(name="Điều khiển", value=BLACKJACK_CONTROLS[(game.can_double(), game.can_split())], inline=False)
+    return embed
+
+def bau_cua_embed(game: BauCuaGame) -> discord.Embed:
+    embed = discord.Embed(title="🎲 Bầu Cua", color=BAU_CUA_COLOR)
+    embed.add_field(name="🎯 Kết quả", value=DICE_TEXT[tuple(game.dice_results)], inline=False)
+    embed.add_field(
+        name="💰 Cược của bạn",
+        value="\n".join(f"{ANIMAL_NAME[animal]}: {amount:,}" for animal, amount in game.bets.items()),
+        inline=True
+    )
+    embed.add_field(name="📊 Kết quả", value=summary_text(game.total_bet, game.payout), inline=True)
+    fair_footer(embed, game.rng)
+    return embed
+
+def xoc_dia_embed(game: XocDiaGame) -> discord.Embed:
+    embed = discord.Embed(title="🎪 Xóc Đĩa", color=XOC_DIA_COLOR)
+    embed.add_field(name="🎯 Kết quả", value=COIN_TEXT[tuple(game.coin_results)], inline=False)
+    embed.add_field(name="🔴 Số mặt đỏ", value=sum(game.coin_results), inline=True)
+    embed.add_field(name="📊 Kết quả", value=summary_text(game.total_bet, game.payout, "Cược"), inline=True)
+    fair_footer(embed, game.rng)
+    return embed
+
+def outcome_emoji(game) -> str:
+    """Kết quả xúc xắc / đồng xu của một ván Bầu Cua hoặc Xóc Đĩa"""
+    if isinstance(game, BauCuaGame):
+        return DICE_TEXT[tuple(game.dice_results)]
+    return COIN_TEXT[tuple(game.coin_results)]
+
+def autoplay_embed(title: str, color: discord.Color, bet_text: str, result: AutoplayResult) -> discord.Embed:
+    """Tổng kết autoplay: số ván, thắng/thua, phân bố lợi nhuận mỗi ván và lãi/lỗ ròng"""
+    embed = discord.Embed(title=f"{title} - Autoplay", color=color)
+    embed.add_field(
+        name="🔁 Số ván",
+        value=f"{result.rounds_played:,} / {result.rounds_requested:,}\n{AUTOPLAY_STOP_TEXT[result.stopped_by]}",
+        inline=False
+    )
+    embed.add_field(name="💰 Cược mỗi ván", value=bet_text, inline=True)
+    embed.add_field(
+        name="📈 Thắng / Thua / Hòa",
+        value=f"{result.wins:,} / {result.losses:,} / {result.pushes:,}",
+        inline=True
+    )
+    embed.add_field(
+        name="📊 Lợi nhuận mỗi ván",
+        value="\n".join(f"{net:+,}: {count:,} ván" for net, count in sorted(result.histogram.items())),
+        inline=False
+    )
+    embed.add_field(name="📊 Kết quả", value=summary_text(result.total_bet, result.total_payout), inline=False)
+    return embed
+
+GAME_LABEL = {
+    "blackjack": "🃏 Blackjack",
+    "blackjack_table": "🃏 Bàn Blackjack",
+    "bau_cua": "🎲 Bầu Cua",
+    "xoc_dia": "🪙 Xóc Đĩa"
+}
+RANK_PREFIX = ("🥇", "🥈", "🥉")
+
+def leaderboard_embed(guild_name: str, entries) -> discord.Embed:
+    """Bảng xếp hạng số dư từ các cặp (user_id, balance) đã sắp xếp"""
+    lines = [
+        f"{RANK_PREFIX[rank] if rank < len(RANK_PREFIX) else f'`{rank + 1}.`'} <@{user_id}> - 💰 {balance:,}"
+        for rank, (user_id, balance) in enumerate(entries)
+    ]
+    return discord.Embed(
+        title=f"🏆 Bảng xếp hạng - {guild_name}",
+        description="\n".join(lines) or "Chưa có người chơi nào",
+        color=discord.Color.gold()
+    )
+
+def stats_embed(name: str, stats) -> discord.Embed:
+    """Thống kê theo từng game (các dòng PlayerStats) và tổng cộng"""
+    embed = discord.Embed(title=f"📊 Thống kê của {name}", color=discord.Color.gold())
+    if not stats:
+        embed.description = "Chưa chơi ván nào"
+        return embed
+
+    for row in stats:
+        embed.add_field(
+            name=GAME_LABEL.get(row.game_type, row.game_type),
+            value=(
+                f"Số ván: {row.rounds:,} (thắng {row.wins:,} / thua {row.losses:,})\n"
+                f"Tổng cược: {row.wagered:,}\n"
+                f"Lãi/lỗ: {row.net:+,}\n"
+                f"Thắng lớn nhất: {row.biggest_win:,}"
+            ),
+            inline=True
+        )
+    rounds = sum(row.rounds for row in stats)
+    wins = sum(row.wins for row in stats)
+    embed.add_field(
+        name="📈 Tổng cộng",
+        value=(
+            f"Số ván: {rounds:,} (tỉ lệ thắng {wins / rounds:.1%})\n"
+            f"Tổng cược: {sum(row.wagered for row in stats):,}\n"
+            f"Lãi/lỗ: {sum(row.net for row in stats):+,}"
+        ),
+        inline=False
+    )
+    return embed
+
+def history_embed(name: str, rows, page: int) -> discord.Embed:
+    """Một trang lịch sử: (id, created_at, amount, transaction_type, description, game_type, round_id)"""
+    lines = [
+        f"`{created_at:%Y-%m-%d %H:%M}` **{amount:+,}** · {description}"
+        for _, created_at, amount, _, description, _, _ in rows
+    ]
+    embed = discord.Embed(
+        title=f"📜 Lịch sử giao dịch của {name}",
+        description="\n".join(lines) or "Không có giao dịch nào",
+        color=discord.Color.gold()
+    )
+    embed.set_footer(text=f"Trang {page + 1} · giờ UTC")
+    return embed
@@ -6,6 +6,12 @@ import random
 from games.blackjack import BlackjackGame
 from games.bau_cua import BauCuaGame, BauCuaAnimal
 from games.xoc_dia import XocDiaGame, XocDiaBetType
+from games.rng import format_state, new_round_id
+from games.provably_fair import FAIR_GAMES, hash_seed, replay_game, round_ref
+from games.autoplay import autoplay_bau_cua, autoplay_xoc_dia
+from database.player_stats import RoundResult
+from cogs import render
+from cogs.history_view import HistoryView
 
 class BlackjackView(discord.ui.View):
     def __init__(self, game: BlackjackGame, db, bot, user_id: int, guild_id: int):
@@ -15,6 +21,7 @@ class BlackjackView(discord.ui.View):
         self.bot = bot
         self.user_id = user_id
         self.guild_id = guild_id
+        self.message: Optional[discord.Message] = None  # Để sửa message khi hết thời gian
         
         # Cập nhật buttons dựa trên trạng thái game
         self.update_buttons()
@@ -24,9 +31,7 @@ class BlackjackView(discord.ui.View):
         # Xóa tất cả buttons cũ
         self.clear_items()
         
-        state = self.game.get_game_state()
-        
-        if not state['game_over']:
+        if not self.game.game_over:
             # Thêm button Hit
             self.add_item(HitButton())
             
@@ -34,72 +39,56 @@ class BlackjackView(discord.ui.View):
             self.add_item(StandButton())
             
             # Thêm button Double nếu có thể
-            if state['can_double']:
+            if self.game.can_double():
                 self.add_item(DoubleButton())
             
             # Thêm button Split nếu có thể
-            if state['can_split']:
+            if self.game.can_split():
                 self.add_item(SplitButton())
     
-    async def update_message(self, interaction: discord.Interaction):
-        """Cập nhật message với trạng thái game mới"""
-        state = self.game.get_game_state()
+    async def build_embed(self) -> discord.Embed:
+        """Tạo embed cho trạng thái game hiện tại, trả tiền và dọn game khi kết thúc"""
+        embed = render.blackjack_embed(self.game)
         
-        embed = discord.Embed(title="🎰 Blackjack", color=discord.Color.blue())
-        embed.add_field(
-            name="Bài của bạn",
-            value=f"{' '.join(state['player_hand'])} (Điểm: {state['player_value']})",
-            inline=False
-        )
-        
-        if state['game_over']:
-            embed.add_field(
-                name="Bài của Dealer", 
-                value=f"{' '.join(state['dealer_hand'])} (Điểm: {state['dealer_value']})",
-                inline=False
-            )
-            
-            result_text = {
-                "BUST": "💥 Bạn đã quá 21!",
-                "DEALER_BUST": "🎉 Dealer quá 21! Bạn thắng!",
-                "WIN": "🎉 Bạn thắng!",
-                "LOSE": "😞 Bạn thua!",
-                "PUSH": "🤝 Hòa!",
-                "BLACKJACK": "🎯 Blackjack! Tuyệt vời!"
-            }.get(state['result'], state['result'])
-            
-            embed.add_field(name="Kết quả", value=result_text, inline=False)
-            embed.add_field(name="💰 Thưởng", value=f"{state['payout']:,}", inline=True)
-            
-            # Cộng tiền thắng
+        if self.game.game_over:
+            # Cộng tiền thắng (chỉ một lần dù có nhiều click đến sau hoặc reaper đã trả)
             from config import config
-            if self.user_id not in config.ADMIN_IDS and state['payout'] > 0:
-                self.db.update_balance(self.user_id, self.guild_id, state['payout'])
-                self.db.add_transaction(
-                    self.user_id, self.guild_id, state['payout'], "game",
-                    f"Blackjack win: {state['payout']}"
-                )
-            
-            # Xóa game khỏi active
+            if not self.game.settled and self.user_id not in config.ADMIN_IDS:
+                result = RoundResult("blackjack", self.game.bet, self.game.payout)
+                if self.game.payout > 0:
+                    await self.db.settle(
+                        self.user_id, self.guild_id, self.game.payout, "game",
+                        f"Blackjack win: {self.game.payout}", result=result,
+                        game_type="blackjack", round_id=self.game.round_id, bet=0, payout=self.game.payout
+                    )
+                else:
+                    await self.db.record_results([(self.user_id, self.guild_id, result)])
+            self.game.settled = True
+            
+            # Xóa game khỏi active (nếu chưa bị thay bằng ván mới)
             game_key = f"{self.user_id}_{self.guild_id}"
-            if game_key in self.bot.active_games:
+            if self.bot.active_games.get(game_key) is self.game:
                 del self.bot.active_games[game_key]
             
             # Disable tất cả buttons khi game kết thúc
             for item in self.children:
                 item.disabled = True
-                
+            self.stop()
         else:
-            embed.add_field(
-                name="Bài của Dealer",
-                value=f"{state['dealer_hand'][0]} ? ? (Điểm: {state['dealer_value']}+)",
-                inline=False
-            )
-            
             # Cập nhật buttons cho trạng thái mới
             self.update_buttons()
+            self.bot.active_games.touch(f"{self.user_id}_{self.guild_id}")
+        
+        return embed
+    
+    async def update_message(self, interaction: discord.Interaction):
+        """Cập nhật message với trạng thái game mới"""
+        embed = await self.build_embed()
         
-        embed.add_field(name="💰 Cược", value=f"{state['bet']:,}", inline=True)
+        if self.message is not None and interaction.response.is_done():
+            # Đã defer: để EditScheduler gom các lần bấm liên tiếp và tránh rate limit
+            self.bot.edits.submit(self.message, final=self.game.game_over, embed=embed, view=self)
+            return
         
         try:
             if interaction.response.is_done():
@@ -108,6 +97,23 @@ class BlackjackView(discord.ui.View):
                 await interaction.response.edit_message(embed=embed, view=self)
         except Exception as e:
             print(f"Error updating message: {e}")
+    
+    async def on_timeout(self):
+        """Hết 3 phút không bấm: kết thúc ván theo GAME_EXPIRY_POLICY"""
+        game_key = f"{self.user_id}_{self.guild_id}"
+        if self.bot.active_games.get(game_key) is self.game:
+            await self.bot.active_games.expire(game_key)
+        
+        if self.message is None:
+            return
+        try:
+            async with self.db.user_lock(self.user_id, self.guild_id):
+                embed = await self.build_embed()
+            for item in self.children:
+                item.disabled = True
+            self.bot.edits.submit(self.message, final=True, embed=embed, view=self)
+        except Exception as e:
+            print(f"Error updating message: {e}")
 
 class HitButton(discord.ui.Button):
     def __init__(self):
@@ -117,12 +123,14 @@ class HitButton(discord.ui.Button):
         await interaction.response.defer()
         
         view: BlackjackView = self.view
-        success = view.game.player_hit()
-        
-        if success:
-            await view.update_message(interaction)
-        else:
-            await interaction.followup.send("❌ Không thể rút bài!", ephemeral=True)
+        async with view.db.user_lock(view.user_id, view.guild_id):
+            success = view.game.player_hit()
+            
+            # Hit quá 21 trả về False nhưng ván đã kết thúc, vẫn cần hiển thị kết quả
+            if success or view.game.game_over:
+                await view.update_message(interaction)
+            else:
+                await interaction.followup.send("❌ Không thể rút bài!", ephemeral=True)
 
 class StandButton(discord.ui.Button):
     def __init__(self):
@@ -132,9 +140,10 @@ class StandButton(discord.ui.Button):
         await interaction.response.defer()
         
         view: BlackjackView = self.view
-        view.game.player_stand()
-        
-        await view.update_message(interaction)
+        async with view.db.user_lock(view.user_id, view.guild_id):
+            view.game.player_stand()
+            
+            await view.update_message(interaction)
 
 class DoubleButton(discord.ui.Button):
     def __init__(self):
@@ -145,23 +154,30 @@ class DoubleButton(discord.ui.Button):
         
         view: BlackjackView = self.view
         
-        # Kiểm tra số dư
-        from config import config
-        if view.user_id not in config.ADMIN_IDS:
-            balance_obj = view.db.get_user_balance(view.user_id, view.guild_id)
-            if balance_obj.balance < view.game.bet:
-                await interaction.followup.send("❌ Bạn không đủ tiền để double!", ephemeral=True)
+        # Lock theo user để hai lần bấm liền nhau không trừ tiền double hai lần
+        async with view.db.user_lock(view.user_id, view.guild_id):
+            if not view.game.can_double():
+                await interaction.followup.send("❌ Không thể double!", ephemeral=True)
                 return
             
-            # Trừ thêm tiền cược
-            view.db.update_balance(view.user_id, view.guild_id, -view.game.bet)
-        
-        success = view.game.player_double()
-        
-        if success:
-            await view.update_message(interaction)
-        else:
-            await interaction.followup.send("❌ Không thể double!", ephemeral=True)
+            # Trừ thêm tiền cược (kiểm tra số dư trong cùng câu UPDATE)
+            from config import config
+            if view.user_id not in config.ADMIN_IDS:
+                new_balance = await view.db.settle(
+                    view.user_id, view.guild_id, -view.game.current_bet, "game",
+                    f"Blackjack double: {view.game.current_bet}",
+                    game_type="blackjack", round_id=view.game.round_id, bet=view.game.current_bet, payout=0
+                )
+                if new_balance is None:
+                    await interaction.followup.send("❌ Bạn không đủ tiền để double!", ephemeral=True)
+                    return
+            
+            success = view.game.player_double()
+            
+            if success:
+                await view.update_message(interaction)
+            else:
+                await interaction.followup.send("❌ Không thể double!", ephemeral=True)
 
 class SplitButton(discord.ui.Button):
     def __init__(self):
@@ -169,18 +185,37 @@ class SplitButton(discord.ui.Button):
     
     async def callback(self, interaction: discord.Interaction):
         await interaction.response.defer()
-        await interaction.followup.send("❌ Tính năng Split chưa được hỗ trợ!", ephemeral=True)
+        
+        view: BlackjackView = self.view
+        async with view.db.user_lock(view.user_id, view.guild_id):
+            if not view.game.can_split():
+                await interaction.followup.send("❌ Không thể split!", ephemeral=True)
+                return
+            
+            # Tay mới có cùng mức cược với tay đang split
+            from config import config
+            if view.user_id not in config.ADMIN_IDS:
+                new_balance = await view.db.settle(
+                    view.user_id, view.guild_id, -view.game.current_bet, "game",
+                    f"Blackjack split: {view.game.current_bet}",
+                    game_type="blackjack", round_id=view.game.round_id, bet=view.game.current_bet, payout=0
+                )
+                if new_balance is None:
+                    await interaction.followup.send("❌ Bạn không đủ tiền để split!", ephemeral=True)
+                    return
+            
+            view.game.player_split()
+            await view.update_message(interaction)
 
 class SlashCommandsCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.db = bot.db
 
-    def get_user_balance(self, user_id: int, guild_id: int) -> int:
+    async def get_user_balance(self, user_id: int, guild_id: int) -> int:
         """Lấy số dư của user"""
         try:
-            balance_obj = self.bot.db.get_or_create_user_balance(user_id, guild_id)
-            return balance_obj.balance
+            return await self.bot.db.get_balance(user_id, guild_id)
         except Exception as e:
             print(f"Error getting balance for {user_id}: {e}")
             return 0
@@ -199,9 +234,8 @@ class SlashCommandsCog(commands.Cog):
             target = member or interaction.user
             print(f"Checking balance for user: {target.id}, guild: {interaction.guild.id}")
             
-            # Đảm bảo user có balance record
-            balance_obj = self.db.get_or_create_user_balance(target.id, interaction.guild.id)
-            balance = balance_obj.balance
+            # Lấy số dư (tạo record nếu chưa có)
+            balance = await self.get_user_balance(target.id, interaction.guild.id)
             
             if self.is_admin(target.id):
                 balance_text = "♾️ Vô hạn (Admin)"
@@ -219,6 +253,49 @@ class SlashCommandsCog(commands.Cog):
             print(f"Balance error: {e}")
             await interaction.response.send_message("❌ Đã xảy ra lỗi khi kiểm tra số dư!", ephemeral=True)
 
+    @app_commands.command(name="leaderboard", description="Bảng xếp hạng số dư của server")
+    async def slash_leaderboard(self, interaction: discord.Interaction):
+        """Top số dư từ bảng xếp hạng trong bộ nhớ"""
+        try:
+            entries = await self.db.get_leaderboard(interaction.guild.id)
+            await interaction.response.send_message(embed=render.leaderboard_embed(interaction.guild.name, entries))
+            
+        except Exception as e:
+            print(f"Leaderboard error: {e}")
+            await interaction.response.send_message("❌ Đã xảy ra lỗi khi xem bảng xếp hạng!", ephemeral=True)
+
+    @app_commands.command(name="history", description="Xem lịch sử giao dịch")
+    @app_commands.describe(member="Người muốn xem lịch sử (Admin only, để trống để xem của bạn)")
+    async def slash_history(self, interaction: discord.Interaction, member: Optional[discord.Member] = None):
+        """Lịch sử giao dịch, mỗi trang một embed"""
+        try:
+            target = member or interaction.user
+            if target != interaction.user and not self.is_admin(interaction.user.id):
+                await interaction.response.send_message("❌ Bạn chỉ xem được lịch sử của mình!", ephemeral=True)
+                return
+            
+            view = HistoryView(self.db, interaction.user.id, target.id, interaction.guild.id, target.display_name)
+            embed = await view.load()
+            await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
+            view.message = await interaction.original_response()
+            
+        except Exception as e:
+            print(f"History error: {e}")
+            await interaction.response.send_message("❌ Đã xảy ra lỗi khi xem lịch sử!", ephemeral=True)
+
+    @app_commands.command(name="stats", description="Thống kê thắng/thua theo từng game")
+    @app_commands.describe(member="Người muốn xem thống kê (để trống để xem của bạn)")
+    async def slash_stats(self, interaction: discord.Interaction, member: Optional[discord.Member] = None):
+        """Thống kê của bạn hoặc người khác"""
+        try:
+            target = member or interaction.user
+            stats = await self.db.get_player_stats(target.id, interaction.guild.id)
+            await interaction.response.send_message(embed=render.stats_embed(target.display_name, stats))
+            
+        except Exception as e:
+            print(f"Stats error: {e}")
+            await interaction.response.send_message("❌ Đã xảy ra lỗi khi xem thống kê!", ephemeral=True)
+
     # SLASH COMMANDS - BLACKJACK (VỚI BUTTONS)
     @app_commands.command(name="blackjack", description="Chơi Blackjack")
     @app_commands.describe(bet="Số tiền cược")
@@ -232,51 +309,35 @@ class SlashCommandsCog(commands.Cog):
             user_id = interaction.user.id
             guild_id = interaction.guild.id
             
-            # Đảm bảo user có balance record
-            balance_obj = self.db.get_or_create_user_balance(user_id, guild_id)
-            
-            # Kiểm tra số dư
+            # Trừ tiền cược (kiểm tra số dư trong cùng câu UPDATE)
+            round_id = new_round_id()
             if not self.is_admin(user_id):
-                if balance_obj.balance < bet:
+                new_balance = await self.db.settle(
+                    user_id, guild_id, -bet, "game",
+                    f"Blackjack bet: {bet}",
+                    game_type="blackjack", round_id=round_id, bet=bet, payout=0
+                )
+                if new_balance is None:
                     await interaction.response.send_message("❌ Bạn không đủ tiền để đặt cược!", ephemeral=True)
                     return
 
             # Tạo game Blackjack mới
             luck_factor = 1.0
-            game = BlackjackGame(bet, user_id, luck_factor)
+            shoe = self.bot.shoes.get(guild_id, interaction.channel_id)
+            game = BlackjackGame(bet, user_id, luck_factor, shoe=shoe, round_id=round_id)
             
             # Lưu game active
             game_key = f"{user_id}_{guild_id}"
             self.bot.active_games[game_key] = game
             
-            # Trừ tiền cược
-            if not self.is_admin(user_id):
-                self.db.update_balance(user_id, guild_id, -bet)
-                self.db.add_transaction(
-                    user_id, guild_id, -bet, "game", 
-                    f"Blackjack bet: {bet}"
-                )
-            
             # Hiển thị game state với buttons
-            state = game.get_game_state()
-            
-            embed = discord.Embed(title="🎰 Blackjack", color=discord.Color.blue())
-            embed.add_field(
-                name="Bài của bạn",
-                value=f"{' '.join(state['player_hand'])} (Điểm: {state['player_value']})",
-                inline=False
-            )
-            embed.add_field(
-                name="Bài của Dealer",
-                value=f"{state['dealer_hand'][0]} ? ? (Điểm: {state['dealer_value']}+)",
-                inline=False
-            )
-            embed.add_field(name="💰 Cược", value=f"{state['bet']:,}", inline=True)
+            embed = render.blackjack_embed(game)
             
             # Tạo view với buttons
             view = BlackjackView(game, self.db, self.bot, user_id, guild_id)
             
             await interaction.response.send_message(embed=embed, view=view)
+            view.message = await interaction.original_response()
             
         except Exception as e:
             print(f"Blackjack error: {e}")
@@ -288,7 +349,10 @@ class SlashCommandsCog(commands.Cog):
         bet="Tổng số tiền cược",
         animal1="Cửa cược thứ nhất",
         animal2="Cửa cược thứ hai", 
-        animal3="Cửa cược thứ ba"
+        animal3="Cửa cược thứ ba",
+        rounds="Số ván chơi liên tiếp với cùng cược (mặc định 1)",
+        stop_loss="Dừng khi lỗ lũy kế đạt mức này",
+        take_profit="Dừng khi lãi lũy kế đạt mức này"
     )
     @app_commands.choices(
         animal1=[
@@ -317,7 +381,8 @@ class SlashCommandsCog(commands.Cog):
         ]
     )
     async def slash_baucua(self, interaction: discord.Interaction, bet: int, 
-                          animal1: str, animal2: Optional[str] = None, animal3: Optional[str] = None):
+                          animal1: str, animal2: Optional[str] = None, animal3: Optional[str] = None,
+                          rounds: int = 1, stop_loss: Optional[int] = None, take_profit: Optional[int] = None):
         """Chơi Bầu Cua qua slash command"""
         try:
             animals = [animal1]
@@ -353,56 +418,38 @@ class SlashCommandsCog(commands.Cog):
                 animal_bets[animal] = bet_per_animal
 
             total_bet = bet_per_animal * len(animals)
-            
-            # Đảm bảo user có balance record
-            balance_obj = self.db.get_or_create_user_balance(user_id, guild_id)
-            
-            # Kiểm tra số dư
-            if not self.is_admin(user_id):
-                if balance_obj.balance < total_bet:
-                    await interaction.response.send_message("❌ Bạn không đủ tiền để đặt cược!", ephemeral=True)
-                    return
 
+            if rounds != 1:
+                await self.autoplay(
+                    interaction, rounds, stop_loss, take_profit, "🎲 Bầu Cua", render.BAU_CUA_COLOR,
+                    "\n".join(f"{render.ANIMAL_NAME[animal]}: {amount:,}" for animal, amount in animal_bets.items()),
+                    lambda rounds: autoplay_bau_cua(animal_bets, rounds, 1.0, stop_loss, take_profit),
+                    "Bau Cua", "bau_cua"
+                )
+                return
+            
             # Tạo game
             luck_factor = 1.0
-            game = BauCuaGame(animal_bets, user_id, luck_factor)
+            pool = await self.bot.fair_seeds.next_pool(user_id, guild_id)
+            game = BauCuaGame(animal_bets, user_id, luck_factor, rng=pool)
             
-            # Trừ tiền cược
+            # Trừ cược và cộng thưởng trong một lần settle.
+            # balance + (payout - bet) >= payout  <=>  balance >= bet
             if not self.is_admin(user_id):
-                self.db.update_balance(user_id, guild_id, -total_bet)
-                self.db.add_transaction(
-                    user_id, guild_id, -total_bet, "game",
-                    f"Bau Cua bet: {total_bet}"
+                new_balance = await self.db.settle(
+                    user_id, guild_id, game.payout - total_bet, "game",
+                    f"Bau Cua bet: {total_bet}, win: {game.payout}, fair: {round_ref(pool)}",
+                    min_balance=game.payout, result=RoundResult("bau_cua", total_bet, game.payout),
+                    game_type="bau_cua", round_id=round_ref(pool), bet=total_bet, payout=game.payout
                 )
+                if new_balance is None:
+                    await interaction.response.send_message("❌ Bạn không đủ tiền để đặt cược!", ephemeral=True)
+                    return
             
-            # Hiển thị kết quả
-            state = game.get_game_state()
-            
-            embed = discord.Embed(title="🎲 Bầu Cua", color=discord.Color.green())
-            
-            # Hiển thị kết quả xúc xắc
-            dice_display = " ".join([emoji for _, emoji in state['dice_results']])
-            embed.add_field(name="🎯 Kết quả", value=dice_display, inline=False)
-            
-            # Hiển thị cược
-            bets_text = "\n".join([f"{animal}: {amount:,}" for animal, amount in state['bets'].items()])
-            embed.add_field(name="💰 Cược của bạn", value=bets_text, inline=True)
-            
-            # Hiển thị kết quả chi tiết
-            result_text = f"Tổng cược: {state['total_bet']:,}\n"
-            result_text += f"Thưởng: {state['payout']:,}\n"
-            profit = state['payout'] - state['total_bet']
-            result_text += f"Lợi nhuận: {profit:,}"
-            
-            embed.add_field(name="📊 Kết quả", value=result_text, inline=True)
+            await self.bot.fair_seeds.record(user_id, guild_id, "bau_cua", pool, game)
             
-            # Cộng tiền thắng
-            if not self.is_admin(user_id) and state['payout'] > 0:
-                self.db.update_balance(user_id, guild_id, state['payout'])
-                self.db.add_transaction(
-                    user_id, guild_id, state['payout'], "game",
-                    f"Bau Cua win: {state['payout']}"
-                )
+            # Hiển thị kết quả
+            embed = render.bau_cua_embed(game)
             
             await interaction.response.send_message(embed=embed)
             
@@ -414,7 +461,10 @@ class SlashCommandsCog(commands.Cog):
     @app_commands.command(name="xocdia", description="Chơi Xóc Đĩa")
     @app_commands.describe(
         bet="Số tiền cược", 
-        bet_type="Loại cược"
+        bet_type="Loại cược",
+        rounds="Số ván chơi liên tiếp với cùng cược (mặc định 1)",
+        stop_loss="Dừng khi lỗ lũy kế đạt mức này",
+        take_profit="Dừng khi lãi lũy kế đạt mức này"
     )
     @app_commands.choices(
         bet_type=[
@@ -427,7 +477,8 @@ class SlashCommandsCog(commands.Cog):
             app_commands.Choice(name="4 Trắng (1:8)", value="4trang")
         ]
     )
-    async def slash_xocdia(self, interaction: discord.Interaction, bet: int, bet_type: str):
+    async def slash_xocdia(self, interaction: discord.Interaction, bet: int, bet_type: str,
+                          rounds: int = 1, stop_loss: Optional[int] = None, take_profit: Optional[int] = None):
         """Chơi Xóc Đĩa qua slash command"""
         try:
             user_id = interaction.user.id
@@ -449,53 +500,41 @@ class SlashCommandsCog(commands.Cog):
                 await interaction.response.send_message("❌ Loại cược không hợp lệ!", ephemeral=True)
                 return
             
-            # Đảm bảo user có balance record
-            balance_obj = self.db.get_or_create_user_balance(user_id, guild_id)
-            
-            # Kiểm tra số dư
-            if not self.is_admin(user_id):
-                if balance_obj.balance < bet:
-                    await interaction.response.send_message("❌ Bạn không đủ tiền để đặt cược!", ephemeral=True)
-                    return
+            if bet <= 0:
+                await interaction.response.send_message("❌ Số tiền cược phải lớn hơn 0!", ephemeral=True)
+                return
+
+            if rounds != 1:
+                await self.autoplay(
+                    interaction, rounds, stop_loss, take_profit, "🎪 Xóc Đĩa", render.XOC_DIA_COLOR,
+                    f"{bet:,} ({bet_type})",
+                    lambda rounds: autoplay_xoc_dia(xd_bet_type, bet, rounds, 1.0, stop_loss, take_profit),
+                    f"Xoc Dia ({bet_type})", "xoc_dia"
+                )
+                return
             
             # Tạo game
             bets = {xd_bet_type: bet}
             luck_factor = 1.0
-            game = XocDiaGame(bets, user_id, luck_factor)
+            pool = await self.bot.fair_seeds.next_pool(user_id, guild_id)
+            game = XocDiaGame(bets, user_id, luck_factor, rng=pool)
             
-            # Trừ tiền cược
+            # Trừ cược và cộng thưởng trong một lần settle (xem Bầu Cua)
             if not self.is_admin(user_id):
-                self.db.update_balance(user_id, guild_id, -bet)
-                self.db.add_transaction(
-                    user_id, guild_id, -bet, "game",
-                    f"Xoc Dia bet: {bet} ({bet_type})"
+                new_balance = await self.db.settle(
+                    user_id, guild_id, game.payout - bet, "game",
+                    f"Xoc Dia bet: {bet} ({bet_type}), win: {game.payout}, fair: {round_ref(pool)}",
+                    min_balance=game.payout, result=RoundResult("xoc_dia", bet, game.payout),
+                    game_type="xoc_dia", round_id=round_ref(pool), bet=bet, payout=game.payout
                 )
+                if new_balance is None:
+                    await interaction.response.send_message("❌ Bạn không đủ tiền để đặt cược!", ephemeral=True)
+                    return
             
-            # Hiển thị kết quả
-            state = game.get_game_state()
-            
-            embed = discord.Embed(title="🎪 Xóc Đĩa", color=discord.Color.orange())
-            
-            # Hiển thị kết quả đồng xu
-            coins_display = " ".join(state['coin_results'])
-            embed.add_field(name="🎯 Kết quả", value=coins_display, inline=False)
-            embed.add_field(name="🔴 Số mặt đỏ", value=state['red_count'], inline=True)
+            await self.bot.fair_seeds.record(user_id, guild_id, "xoc_dia", pool, game)
             
             # Hiển thị kết quả
-            result_text = f"Cược: {state['total_bet']:,}\n"
-            result_text += f"Thưởng: {state['payout']:,}\n"
-            profit = state['payout'] - state['total_bet']
-            result_text += f"Lợi nhuận: {profit:,}"
-            
-            embed.add_field(name="📊 Kết quả", value=result_text, inline=True)
-            
-            # Cộng tiền thắng
-            if not self.is_admin(user_id) and state['payout'] > 0:
-                self.db.update_balance(user_id, guild_id, state['payout'])
-                self.db.add_transaction(
-                    user_id, guild_id, state['payout'], "game",
-                    f"Xoc Dia win: {state['payout']}"
-                )
+            embed = render.xoc_dia_embed(game)
             
             await interaction.response.send_message(embed=embed)
             
@@ -503,6 +542,114 @@ class SlashCommandsCog(commands.Cog):
             print(f"Xoc dia error: {e}")
             await interaction.response.send_message("❌ Đã xảy ra lỗi khi chơi Xóc Đĩa!", ephemeral=True)
 
+    # SLASH COMMANDS - PROVABLY FAIR
+    @app_commands.command(name="seed", description="Xem hoặc đổi cặp seed provably fair của bạn")
+    @app_commands.describe(client_seed="Client seed mới (đổi seed sẽ công bố server seed đang dùng)")
+    async def slash_seed(self, interaction: discord.Interaction, client_seed: Optional[str] = None):
+        """Xem cam kết seed hiện tại, hoặc đổi seed và công bố server seed cũ"""
+        try:
+            user_id = interaction.user.id
+            guild_id = interaction.guild.id
+            embed = discord.Embed(title="🔐 Provably Fair", color=discord.Color.dark_teal())
+            
+            if client_seed is not None:
+                client_seed = client_seed.strip()
+                if not 1 <= len(client_seed) <= 64:
+                    await interaction.response.send_message("❌ Client seed phải dài 1-64 ký tự!", ephemeral=True)
+                    return
+                revealed = await self.bot.fair_seeds.rotate(user_id, guild_id, client_seed)
+                if revealed:
+                    server_seed, seed_hash, old_client_seed, rounds = revealed
+                    embed.add_field(
+                        name="Seed cũ (đã công bố)",
+                        value=f"Server seed: `{server_seed}`\nHash: `{seed_hash}`\nClient seed: `{old_client_seed}`\nSố ván: {rounds:,}",
+                        inline=False
+                    )
+            
+            seed_hash, current_client_seed, nonce = await self.bot.fair_seeds.commitment(user_id, guild_id)
+            embed.add_field(
+                name="Seed đang dùng",
+                value=f"Server seed hash: `{seed_hash}`\nClient seed: `{current_client_seed}`\nNonce kế tiếp: {nonce:,}",
+                inline=False
+            )
+            embed.set_footer(text="Đổi seed bằng /seed client_seed:<...> rồi kiểm tra các ván cũ bằng /verify")
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            
+        except Exception as e:
+            print(f"Seed error: {e}")
+            await interaction.response.send_message("❌ Đã xảy ra lỗi khi xem seed!", ephemeral=True)
+
+    @app_commands.command(name="verify", description="Tính lại kết quả một ván provably fair từ seed đã công bố")
+    @app_commands.describe(
+        game="Trò chơi",
+        server_seed="Server seed đã công bố",
+        client_seed="Client seed của ván",
+        nonce="Nonce của ván"
+    )
+    @app_commands.choices(
+        game=[
+            app_commands.Choice(name="Bầu Cua", value="bau_cua"),
+            app_commands.Choice(name="Xóc Đĩa", value="xoc_dia")
+        ]
+    )
+    async def slash_verify(self, interaction: discord.Interaction, game: str, server_seed: str,
+                           client_seed: str, nonce: int):
+        """Chơi lại ván từ seed và hiển thị kết quả cùng hash để đối chiếu"""
+        try:
+            if game not in FAIR_GAMES or nonce < 0:
+                await interaction.response.send_message("❌ Thông tin ván không hợp lệ!", ephemeral=True)
+                return
+            
+            server_seed = server_seed.strip()
+            replayed = replay_game(game, server_seed, client_seed, nonce)
+            embed = discord.Embed(title="🔐 Kiểm tra ván", color=discord.Color.dark_teal())
+            embed.add_field(name="Server seed hash", value=f"`{hash_seed(server_seed)}`", inline=False)
+            embed.add_field(name="Client seed / Nonce", value=f"`{client_seed}` / {nonce:,}", inline=False)
+            embed.add_field(name="🎯 Kết quả", value=render.outcome_emoji(replayed), inline=False)
+            embed.set_footer(text="Hash phải trùng với hash được công bố trước khi chơi")
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            
+        except Exception as e:
+            print(f"Verify error: {e}")
+            await interaction.response.send_message("❌ Đã xảy ra lỗi khi kiểm tra ván!", ephemeral=True)
+
+    async def autoplay(self, interaction: discord.Interaction, rounds: int, stop_loss: Optional[int],
+                       take_profit: Optional[int], title: str, color: discord.Color, bet_text: str,
+                       play, label: str, game_type: str):
+        """Chơi nhiều ván một lần: một lần settle, một dòng lịch sử và một embed tổng kết"""
+        from config import config
+
+        if not 1 <= rounds <= config.MAX_AUTOPLAY_ROUNDS:
+            await interaction.response.send_message(
+                f"❌ Số ván phải từ 1 đến {config.MAX_AUTOPLAY_ROUNDS:,}!", ephemeral=True
+            )
+            return
+        if (stop_loss is not None and stop_loss <= 0) or (take_profit is not None and take_profit <= 0):
+            await interaction.response.send_message("❌ Stop-loss và take-profit phải lớn hơn 0!", ephemeral=True)
+            return
+
+        result = play(rounds)
+
+        # Số dư phải đủ cược ở mọi ván đã chơi:
+        # balance >= required_balance  <=>  balance + net >= required_balance + net
+        user_id = interaction.user.id
+        if not self.is_admin(user_id):
+            new_balance = await self.db.settle(
+                user_id, interaction.guild.id, result.net, "game",
+                f"{label} autoplay: {result.rounds_played} rounds, bet: {result.total_bet}, win: {result.total_payout}, "
+                f"rng: {format_state(result.rng_state)}",
+                min_balance=result.required_balance + result.net, result=RoundResult.from_autoplay(game_type, result),
+                game_type=game_type, round_id=new_round_id(), bet=result.total_bet, payout=result.total_payout
+            )
+            if new_balance is None:
+                await interaction.response.send_message(
+                    f"❌ Bạn cần ít nhất {result.required_balance:,} để chơi {result.rounds_played:,} ván này!",
+                    ephemeral=True
+                )
+                return
+
+        await interaction.response.send_message(embed=render.autoplay_embed(title, color, bet_text, result))
+
     # SLASH COMMANDS - CHUYỂN TIỀN
     @app_commands.command(name="transfer", description="Chuyển tiền cho người chơi khác")
     @app_commands.describe(
@@ -520,28 +667,15 @@ class SlashCommandsCog(commands.Cog):
                 await interaction.response.send_message("❌ Bạn không thể chuyển tiền cho chính mình!", ephemeral=True)
                 return
             
-            # Đảm bảo cả 2 user đều có balance record
-            sender_balance_obj = self.db.get_or_create_user_balance(interaction.user.id, interaction.guild.id)
-            receiver_balance_obj = self.db.get_or_create_user_balance(member.id, interaction.guild.id)
-            
-            # Kiểm tra số dư
-            if sender_balance_obj.balance < amount:
-                await interaction.response.send_message("❌ Bạn không đủ tiền để chuyển!", ephemeral=True)
-                return
-            
-            # Thực hiện chuyển tiền
-            self.db.update_balance(interaction.user.id, interaction.guild.id, -amount)
-            self.db.update_balance(member.id, interaction.guild.id, amount)
-            
-            # Ghi log transaction
-            self.db.add_transaction(
-                interaction.user.id, interaction.guild.id, -amount, "transfer",
-                f"Chuyển tiền cho {member.display_name}"
-            )
-            self.db.add_transaction(
-                member.id, interaction.guild.id, amount, "transfer",
+            # Chuyển tiền và ghi log trong một transaction
+            sender_balance = await self.db.transfer(
+                interaction.user.id, member.id, interaction.guild.id, amount,
+                f"Chuyển tiền cho {member.display_name}",
                 f"Nhận tiền từ {interaction.user.display_name}"
             )
+            if sender_balance is None:
+                await interaction.response.send_message("❌ Bạn không đủ tiền để chuyển!", ephemeral=True)
+                return
             
             embed = discord.Embed(
                 title="✅ Chuyển tiền thành công",
@@ -571,14 +705,13 @@ class SlashCommandsCog(commands.Cog):
                 await interaction.response.send_message("❌ Số tiền phải lớn hơn 0!", ephemeral=True)
                 return
             
-            # Đảm bảo user có balance record
-            self.db.get_or_create_user_balance(member.id, interaction.guild.id)
-            
-            self.db.update_balance(member.id, interaction.guild.id, amount)
-            self.db.add_transaction(
+            new_balance = await self.db.settle(
                 member.id, interaction.guild.id, amount, "admin",
                 f"Admin {interaction.user.display_name} add money"
             )
+            if new_balance is None:
+                await interaction.response.send_message("❌ Không thể thêm tiền, vui lòng thử lại!", ephemeral=True)
+                return
             
             embed = discord.Embed(
                 title="✅ Thêm tiền thành công",
@@ -607,16 +740,20 @@ class SlashCommandsCog(commands.Cog):
                 await interaction.response.send_message("❌ Số tiền phải lớn hơn 0!", ephemeral=True)
                 return
             
-            # Đảm bảo user có balance record
-            balance_obj = self.db.get_or_create_user_balance(member.id, interaction.guild.id)
-            current_balance = balance_obj.balance
-            remove_amount = min(amount, current_balance)
-            
-            self.db.update_balance(member.id, interaction.guild.id, -remove_amount)
-            self.db.add_transaction(
-                member.id, interaction.guild.id, -remove_amount, "admin",
-                f"Admin {interaction.user.display_name} remove money"
-            )
+            # Giữ lock để số dư không đổi giữa lúc đọc và lúc trừ
+            async with self.db.user_lock(member.id, interaction.guild.id):
+                current_balance = await self.db.get_balance(member.id, interaction.guild.id)
+                remove_amount = min(amount, current_balance)
+                
+                new_balance = await self.db.settle(
+                    member.id, interaction.guild.id, -remove_amount, "admin",
+                    f"Admin {interaction.user.display_name} remove money"
+                )
+            if new_balance is None:
+                await interaction.response.send_message(
+                    "❌ Không thể xóa tiền: số dư đã thay đổi, vui lòng thử lại!", ephemeral=True
+                )
+                return
             
             embed = discord.Embed(
                 title="✅ Xóa tiền thành công",
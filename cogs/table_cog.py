@@ -0,0 +1,364 @@
+import discord
+from discord import app_commands
+from discord.ext import commands
+import asyncio
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from games.blackjack_table import BlackjackTable
+from database.player_stats import RoundResult
+from config import config
+
+RESULT_TEXT = {
+    "BUST": "💥 Quá 21",
+    "DEALER_BUST": "🎉 Dealer quá 21",
+    "WIN": "🎉 Thắng",
+    "LOSE": "😞 Thua",
+    "PUSH": "🤝 Hòa",
+    "BLACKJACK": "🎯 Blackjack"
+}
+
+class TableSession:
+    """Một vòng đang diễn ra ở một channel: bàn, message hiển thị và task điều khiển"""
+
+    def __init__(self, guild_id: int, channel_id: int, table: BlackjackTable):
+        self.guild_id = guild_id
+        self.channel_id = channel_id
+        self.table = table
+        self.message: Optional[discord.Message] = None
+        self.view: Optional["TableView"] = None
+        self.lock = asyncio.Lock()  # Action của các seat được xử lý lần lượt
+        self.all_done = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        # Tiền cược đã trừ của từng user, chưa được trả thưởng hay hoàn lại
+        self.charged: Dict[int, int] = {}
+
+class TableView(discord.ui.View):
+    def __init__(self, cog: "TableCog", session: TableSession):
+        super().__init__(timeout=None)  # TableCog tự hẹn giờ cho vòng chơi
+        self.cog = cog
+        self.session = session
+        self.add_item(TableActionButton("hit", discord.ButtonStyle.primary, "🔄 Hit"))
+        self.add_item(TableActionButton("stand", discord.ButtonStyle.secondary, "✋ Stand"))
+        self.add_item(TableActionButton("double", discord.ButtonStyle.success, "💰 Double"))
+
+class TableActionButton(discord.ui.Button):
+    def __init__(self, action: str, style: discord.ButtonStyle, label: str):
+        super().__init__(style=style, label=label)
+        self.action = action
+
+    async def callback(self, interaction: discord.Interaction):
+        view: TableView = self.view
+        await view.cog.handle_action(interaction, view.session, self.action)
+
+class TableCog(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        self.db = bot.db
+        self.sessions: Dict[Tuple[int, int], TableSession] = {}
+
+    def is_admin(self, user_id: int) -> bool:
+        """Kiểm tra có phải admin không"""
+        return user_id in config.ADMIN_IDS
+
+    async def cog_unload(self):
+        """Kết thúc các vòng đang chơi để không giữ tiền cược của người chơi"""
+        for session in list(self.sessions.values()):
+            if session.task:
+                session.task.cancel()
+            if session.table.phase == BlackjackTable.PLAYING:
+                await self.finish_round(session)
+            elif session.charged:
+                await self.refund_round(session)
+        self.sessions.clear()
+
+    # ------------------------------------------------------------------
+    # Hiển thị
+    # ------------------------------------------------------------------
+
+    def build_embed(self, session: TableSession) -> discord.Embed:
+        """Một embed cho cả bàn"""
+        table = session.table
+        if table.phase == BlackjackTable.BETTING:
+            description = f"⏳ Đang nhận cược trong {config.TABLE_BETTING_WINDOW:.0f}s - dùng `/table` hoặc `!table <cược>` để vào bàn"
+        elif table.phase == BlackjackTable.PLAYING:
+            description = f"🃏 Hit / Stand / Double trong {config.TABLE_ACTION_TIMEOUT:.0f}s, hết giờ tự động Stand"
+        else:
+            description = "🏁 Vòng đã kết thúc"
+
+        embed = discord.Embed(title="🎰 Bàn Blackjack", description=description, color=discord.Color.blue())
+
+        dealer = table.dealer_hand
+        if table.phase == BlackjackTable.FINISHED:
+            embed.add_field(name="Dealer", value=f"{dealer} (Điểm: {dealer.value})", inline=False)
+        elif len(dealer):
+            embed.add_field(name="Dealer", value=f"{dealer[0]} ? (Điểm: {dealer[0].get_value()}+)", inline=False)
+
+        for seat in table.seats.values():
+            if table.phase == BlackjackTable.BETTING:
+                value = f"💰 Cược: {seat.bet:,}"
+            else:
+                value = f"{seat.hand} (Điểm: {seat.hand.value})\n💰 Cược: {seat.bet:,}"
+                if table.phase == BlackjackTable.FINISHED:
+                    value += f" | {RESULT_TEXT.get(seat.result, seat.result)} | Thưởng: {seat.payout:,}"
+                elif seat.done:
+                    value += " | ✋ Xong"
+            embed.add_field(name=seat.name, value=value, inline=True)
+
+        if not table.seats:
+            embed.add_field(name="Chưa có ai", value="Vòng bị hủy vì không có người chơi", inline=False)
+        return embed
+
+    async def refresh_message(self, session: TableSession):
+        """Sửa message của bàn (một lần cho cả bàn, qua EditScheduler)"""
+        if session.message is None:
+            return
+        finished = session.table.phase == BlackjackTable.FINISHED
+        view = session.view if session.table.phase == BlackjackTable.PLAYING else None
+        self.bot.edits.submit(session.message, final=finished, embed=self.build_embed(session), view=view)
+
+    # ------------------------------------------------------------------
+    # Vòng chơi
+    # ------------------------------------------------------------------
+
+    async def join_table(self, guild_id: int, channel, user, bet: int) -> Tuple[Optional[str], Optional[TableSession], bool]:
+        """Vào bàn của channel, mở bàn mới nếu chưa có. Trả về (lỗi, session, bàn mới)"""
+        if bet <= 0:
+            return "Số tiền cược phải lớn hơn 0!", None, False
+
+        # Kiểm tra sớm để báo lỗi ngay; tiền cược thật được trừ một lần lúc chia bài
+        if not self.is_admin(user.id) and await self.db.get_balance(user.id, guild_id) < bet:
+            return "Bạn không đủ tiền để đặt cược!", None, False
+
+        key = (guild_id, channel.id)
+        session = self.sessions.get(key)
+        created = session is None
+        if created:
+            shoe = self.bot.shoes.get(guild_id, channel.id)
+            session = TableSession(guild_id, channel.id, BlackjackTable(shoe))
+            self.sessions[key] = session
+
+        error = session.table.join(user.id, user.display_name, bet)
+        if error:
+            return error, None, False
+        return None, session, created
+
+    async def open_round(self, session: TableSession, send: Callable[[], Awaitable[discord.Message]]):
+        """Gửi message của bàn vừa mở rồi chạy vòng chơi.
+
+        Gửi lỗi thì gỡ bàn (chưa ai bị trừ tiền) để channel mở được bàn mới.
+        """
+        try:
+            session.message = await send()
+        except Exception:
+            self.close_session(session)
+            raise
+        session.task = asyncio.create_task(self.run_round(session))
+
+    def close_session(self, session: TableSession):
+        """Bỏ bàn khỏi channel (nếu chưa bị thay bằng bàn khác)"""
+        if self.sessions.get((session.guild_id, session.channel_id)) is session:
+            del self.sessions[(session.guild_id, session.channel_id)]
+
+    async def run_round(self, session: TableSession):
+        """Chờ hết thời gian đặt cược, chia bài, chờ các seat rồi kết thúc vòng"""
+        try:
+            await asyncio.sleep(config.TABLE_BETTING_WINDOW)
+            if not await self.deal_round(session):
+                return
+
+            try:
+                await asyncio.wait_for(session.all_done.wait(), config.TABLE_ACTION_TIMEOUT)
+            except asyncio.TimeoutError:
+                pass
+            await self.finish_round(session)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Blackjack table error: {e}")
+            # Lỗi sau khi đã trừ cược (chia bài, hiển thị...): hoàn lại thay vì bỏ vòng
+            if session.charged:
+                await self.refund_round(session)
+        finally:
+            self.close_session(session)
+
+    async def deal_round(self, session: TableSession) -> bool:
+        """Trừ tiền cược của cả bàn trong một transaction rồi chia bài"""
+        table = session.table
+        async with session.lock:
+            seats = [seat for seat in table.seats.values() if not self.is_admin(seat.user_id)]
+            balances = await self.db.settle_many([
+                (seat.user_id, session.guild_id, -seat.bet, "game", f"Blackjack table bet: {seat.bet}", 0,
+                 {"game_type": "blackjack_table", "round_id": table.round_id, "bet": seat.bet, "payout": 0})
+                for seat in seats
+            ])
+            # Ai không còn đủ tiền thì rời bàn
+            for seat, new_balance in zip(seats, balances):
+                if new_balance is None:
+                    table.leave(seat.user_id)
+                else:
+                    session.charged[seat.user_id] = seat.bet
+
+            if not table.seats:
+                table.phase = BlackjackTable.FINISHED
+                await self.refresh_message(session)
+                return False
+
+            table.deal()
+            session.view = TableView(self, session)
+            if table.all_done:
+                session.all_done.set()
+            await self.refresh_message(session)
+            return True
+
+    async def finish_round(self, session: TableSession):
+        """Dealer chơi một lần, trả thưởng cả bàn trong một transaction và sửa message"""
+        async with session.lock:
+            table = session.table
+            if table.phase != BlackjackTable.PLAYING:
+                return
+            seats = table.finish()
+            if session.view:
+                session.view.stop()
+
+            players = [seat for seat in seats if not self.is_admin(seat.user_id)]
+            try:
+                await self.db.settle_many([
+                    (seat.user_id, session.guild_id, seat.payout, "game", f"Blackjack table win: {seat.payout}", None,
+                     {"game_type": "blackjack_table", "round_id": table.round_id, "bet": 0, "payout": seat.payout})
+                    for seat in players
+                    if seat.payout > 0
+                ], results=[
+                    (seat.user_id, session.guild_id, RoundResult("blackjack_table", seat.bet, seat.payout))
+                    for seat in players
+                ])
+            except Exception as e:
+                # settle_many là một transaction: chưa ai được trả, hoàn lại cược cả bàn
+                print(f"❌ Error settling blackjack table round: {e}")
+                await self.refund_round(session)
+                return
+            session.charged.clear()
+            await self.refresh_message(session)
+
+    async def refund_round(self, session: TableSession):
+        """Hoàn lại tiền cược đã trừ của vòng bị lỗi và báo cho channel"""
+        refunds = [(user_id, amount) for user_id, amount in session.charged.items() if amount > 0]
+        round_id = session.table.round_id
+        try:
+            await self.db.settle_many([
+                (user_id, session.guild_id, amount, "game", f"Blackjack table refund: {amount}", None,
+                 {"game_type": "blackjack_table", "round_id": round_id, "bet": 0, "payout": amount})
+                for user_id, amount in refunds
+            ])
+            session.charged.clear()
+            text = "⚠️ Vòng Blackjack bị lỗi, tiền cược đã được hoàn lại."
+        except Exception as e:
+            print(f"❌ Error refunding blackjack table round {round_id}: {e}")
+            text = f"❌ Vòng Blackjack bị lỗi và chưa hoàn được tiền cược, vui lòng báo admin (mã vòng: {round_id})."
+
+        channel = self.bot.get_channel(session.channel_id)
+        if channel is not None:
+            try:
+                await channel.send(text)
+            except discord.HTTPException as e:
+                print(f"Blackjack table error: {e}")
+
+    async def handle_action(self, interaction: discord.Interaction, session: TableSession, action: str):
+        """Xử lý Hit/Stand/Double của một seat"""
+        user_id = interaction.user.id
+        table = session.table
+
+        async with session.lock:
+            seat = table.seats.get(user_id)
+            if seat is None:
+                await interaction.response.send_message("❌ Bạn không ngồi ở bàn này!", ephemeral=True)
+                return
+
+            if action == "hit":
+                success = table.hit(user_id)
+            elif action == "stand":
+                success = table.stand(user_id)
+            elif action == "double":
+                success = seat.can_double() and table.phase == BlackjackTable.PLAYING
+                if success and not self.is_admin(user_id):
+                    # settle phải chờ executor DB: defer trước để interaction không quá hạn 3 giây
+                    await interaction.response.defer()
+                    new_balance = await self.db.settle(
+                        user_id, session.guild_id, -seat.bet, "game",
+                        f"Blackjack table double: {seat.bet}",
+                        game_type="blackjack_table", round_id=table.round_id, bet=seat.bet, payout=0
+                    )
+                    if new_balance is None:
+                        await interaction.followup.send("❌ Bạn không đủ tiền để double!", ephemeral=True)
+                        return
+                    session.charged[user_id] = session.charged.get(user_id, 0) + seat.bet
+                if success:
+                    success = table.double(user_id)
+            else:
+                success = False
+
+            if not success:
+                if interaction.response.is_done():
+                    await interaction.followup.send("❌ Action không hợp lệ!", ephemeral=True)
+                else:
+                    await interaction.response.send_message("❌ Action không hợp lệ!", ephemeral=True)
+                return
+
+            if not interaction.response.is_done():
+                await interaction.response.defer()
+            if table.all_done:
+                # Task của vòng sẽ kết thúc vòng và sửa message kết quả
+                session.all_done.set()
+                return
+            await self.refresh_message(session)
+
+    # ------------------------------------------------------------------
+    # Commands
+    # ------------------------------------------------------------------
+
+    @commands.command(name="table", aliases=["bjt"])
+    async def play_table(self, ctx, bet: int):
+        """Vào bàn Blackjack nhiều người của channel - !table <cược>"""
+        try:
+            error, session, created = await self.join_table(ctx.guild.id, ctx.channel, ctx.author, bet)
+            if error:
+                await ctx.send(f"❌ {error}")
+                return
+
+            if created:
+                await self.open_round(session, lambda: ctx.send(embed=self.build_embed(session)))
+            else:
+                await self.refresh_message(session)
+                await ctx.message.add_reaction("✅")
+
+        except Exception as e:
+            await ctx.send("❌ Đã xảy ra lỗi khi vào bàn Blackjack!")
+
+    @app_commands.command(name="table", description="Vào bàn Blackjack nhiều người của channel")
+    @app_commands.describe(bet="Số tiền cược")
+    async def slash_table(self, interaction: discord.Interaction, bet: int):
+        """Vào bàn Blackjack nhiều người qua slash command"""
+        try:
+            error, session, created = await self.join_table(interaction.guild.id, interaction.channel, interaction.user, bet)
+            if error:
+                await interaction.response.send_message(f"❌ {error}", ephemeral=True)
+                return
+
+            if created:
+                async def send():
+                    await interaction.response.send_message(embed=self.build_embed(session))
+                    return await interaction.original_response()
+
+                await self.open_round(session, send)
+            else:
+                await interaction.response.send_message(f"✅ Đã vào bàn với cược {bet:,}", ephemeral=True)
+                await self.refresh_message(session)
+
+        except Exception as e:
+            print(f"Blackjack table error: {e}")
+            if interaction.response.is_done():
+                await interaction.followup.send("❌ Đã xảy ra lỗi khi vào bàn Blackjack!", ephemeral=True)
+            else:
+                await interaction.response.send_message("❌ Đã xảy ra lỗi khi vào bàn Blackjack!", ephemeral=True)
+
+async def setup(bot):
+    await bot.add_cog(TableCog(bot))
@@ -17,6 +17,86 @@ class Config:
     
     DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///casino_bot.db')
     
+    # Số thread dành riêng cho database (SQLite chỉ nên dùng 1 để tránh tranh chấp lock)
+    DB_EXECUTOR_WORKERS = int(os.getenv('DB_EXECUTOR_WORKERS', '1'))
+    
+    # Profile engine (xem database/engine.py): 'tuned' (WAL, synchronous=NORMAL), 'durable' (WAL, synchronous=FULL)
+    # hoặc 'default' (mặc định của SQLite); các PRAGMA còn lại của SQLite
+    DB_PROFILE = os.getenv('DB_PROFILE', 'tuned').lower()
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+    SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
+    SQLITE_CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', '65536'))
+    
+    # Pool kết nối khi dùng database server (Postgres...)
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))
+    
+    # Ghi lịch sử giao dịch theo lô (write-behind)
+    JOURNAL_ENABLED = os.getenv('JOURNAL_ENABLED', 'True').lower() == 'true'
+    JOURNAL_MAX_QUEUE = int(os.getenv('JOURNAL_MAX_QUEUE', '10000'))
+    JOURNAL_BATCH_SIZE = int(os.getenv('JOURNAL_BATCH_SIZE', '500'))
+    JOURNAL_FLUSH_INTERVAL = float(os.getenv('JOURNAL_FLUSH_INTERVAL', '1.0'))
+    JOURNAL_SPILL_PATH = os.getenv('JOURNAL_SPILL_PATH', 'transaction_journal.spill')
+    JOURNAL_FSYNC = os.getenv('JOURNAL_FSYNC', 'False').lower() == 'true'
+    # Số lần thử lại một lô lỗi trước khi tách từng dòng; dòng vẫn lỗi được chuyển vào file dead letter
+    JOURNAL_MAX_RETRIES = int(os.getenv('JOURNAL_MAX_RETRIES', '5'))
+    JOURNAL_DEAD_LETTER_PATH = os.getenv('JOURNAL_DEAD_LETTER_PATH', 'transaction_journal.dead')
+    
+    # Số (user, guild) tối đa giữ trong cache số dư
+    BALANCE_CACHE_SIZE = int(os.getenv('BALANCE_CACHE_SIZE', '10000'))
+    
+    # Chu kỳ (giây) nạp lại cache cấu hình guild, 0 = chỉ nạp lúc khởi động
+    GUILD_CONFIG_TTL = float(os.getenv('GUILD_CONFIG_TTL', '0'))
+    
+    # Shoe Blackjack dùng chung cho mỗi bàn (guild, channel)
+    SHOE_DECKS = int(os.getenv('SHOE_DECKS', '6'))
+    SHOE_PENETRATION = float(os.getenv('SHOE_PENETRATION', '0.75'))  # Xáo lại sau khi chia 75% shoe
+    SHOE_MAX_TABLES = int(os.getenv('SHOE_MAX_TABLES', '1000'))
+    
+    # Nguồn ngẫu nhiên: số giá trị sinh sẵn mỗi lô; RNG_SEED cố định seed (test/tái hiện),
+    # để trống thì seed lấy từ secrets
+    RNG_POOL_SIZE = int(os.getenv('RNG_POOL_SIZE', '4096'))
+    RNG_SEED = int(os.getenv('RNG_SEED'), 0) if os.getenv('RNG_SEED') else None
+    
+    # Chu kỳ (giây) gom snapshot các ván đang chơi xuống database
+    ACTIVE_GAME_FLUSH_INTERVAL = float(os.getenv('ACTIVE_GAME_FLUSH_INTERVAL', '0.5'))
+    
+    # Ván không có action trong ACTIVE_GAME_TIMEOUT giây bị kết thúc theo policy:
+    # 'stand' (tự dừng), 'refund' (trả lại cược) hoặc 'forfeit' (mất cược)
+    ACTIVE_GAME_TIMEOUT = float(os.getenv('ACTIVE_GAME_TIMEOUT', '180'))
+    ACTIVE_GAME_MAX = int(os.getenv('ACTIVE_GAME_MAX', '10000'))
+    GAME_EXPIRY_POLICY = os.getenv('GAME_EXPIRY_POLICY', 'stand').lower()
+    
+    # Luật split: số tay tối đa, split lại ace, double sau khi split
+    BLACKJACK_MAX_HANDS = int(os.getenv('BLACKJACK_MAX_HANDS', '4'))
+    BLACKJACK_RESPLIT_ACES = os.getenv('BLACKJACK_RESPLIT_ACES', 'False').lower() == 'true'
+    BLACKJACK_DOUBLE_AFTER_SPLIT = os.getenv('BLACKJACK_DOUBLE_AFTER_SPLIT', 'True').lower() == 'true'
+    
+    # Bàn Blackjack nhiều người: số ghế, thời gian đặt cược và thời gian action (giây)
+    TABLE_MAX_SEATS = int(os.getenv('TABLE_MAX_SEATS', '7'))
+    TABLE_BETTING_WINDOW = float(os.getenv('TABLE_BETTING_WINDOW', '20'))
+    TABLE_ACTION_TIMEOUT = float(os.getenv('TABLE_ACTION_TIMEOUT', '60'))
+    
+    # Số ván tối đa cho một lượt autoplay Bầu Cua / Xóc Đĩa
+    MAX_AUTOPLAY_ROUNDS = int(os.getenv('MAX_AUTOPLAY_ROUNDS', '1000'))
+    
+    # Giới hạn sửa message game mỗi channel: tối đa EDIT_RATE_LIMIT lần trong EDIT_RATE_WINDOW giây
+    EDIT_RATE_LIMIT = int(os.getenv('EDIT_RATE_LIMIT', '5'))
+    EDIT_RATE_WINDOW = float(os.getenv('EDIT_RATE_WINDOW', '5.0'))
+    
+    # Bảng xếp hạng: số dòng hiển thị và số user giữ trong bộ nhớ cho mỗi guild
+    LEADERBOARD_SIZE = int(os.getenv('LEADERBOARD_SIZE', '10'))
+    LEADERBOARD_CAPACITY = int(os.getenv('LEADERBOARD_CAPACITY', '50'))
+    
+    # Số giao dịch mỗi trang của lệnh lịch sử
+    HISTORY_PAGE_SIZE = int(os.getenv('HISTORY_PAGE_SIZE', '10'))
+    
+    # Gộp lịch sử giao dịch cũ hơn LEDGER_COMPACTION_DAYS ngày, dòng gốc lưu vào LEDGER_ARCHIVE_DIR
+    LEDGER_COMPACTION_DAYS = int(os.getenv('LEDGER_COMPACTION_DAYS', '90'))
+    LEDGER_ARCHIVE_DIR = os.getenv('LEDGER_ARCHIVE_DIR', 'ledger_archive')
+    
     # Emoji cho các trò chơi
     EMOJIS = {
         "cards": {
@@ -0,0 +1,348 @@
+import asyncio
+import base64
+import datetime
+import heapq
+import itertools
+import struct
+import time
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from games.blackjack import BlackjackGame
+from games.shoe import Shoe
+from config import config
+
+# game_type lưu trong bảng active_games -> class có to_state/from_state
+GAME_TYPES = {
+    "blackjack": BlackjackGame
+}
+_TYPE_NAMES = {cls: name for name, cls in GAME_TYPES.items()}
+
+def game_key(user_id: int, guild_id: int) -> str:
+    return f"{user_id}_{guild_id}"
+
+def _split_key(key: str) -> Tuple[int, int]:
+    user_id, guild_id = key.split("_")
+    return int(user_id), int(guild_id)
+
+class ActiveGameStore:
+    """Các ván đang chơi, giữ trong bộ nhớ và snapshot xuống bảng active_games.
+
+    Dùng như dict cũ (key "{user_id}_{guild_id}"). Mỗi thay đổi chỉ đánh dấu
+    key là dirty; task nền gom các key dirty mỗi ACTIVE_GAME_FLUSH_INTERVAL
+    giây và ghi snapshot mới nhất (BlackjackGame.to_state, base64) trong một
+    transaction, nên nhiều action liên tiếp chỉ tốn một lần ghi và click
+    không bao giờ phải chờ database.
+
+    Khi khởi động, start() nạp lại mọi ván trong bảng active_games với
+    deadline tính từ lúc snapshot, nên ván bỏ dở trước khi restart (kể cả ván
+    của lệnh slash) vẫn được chơi tiếp bằng lệnh prefix, hoặc hết hạn và được
+    trả tiền như mọi ván khác.
+
+    Mỗi ván có deadline = action cuối + ACTIVE_GAME_TIMEOUT, lưu trong một heap
+    (entry cũ bị bỏ qua khi lấy ra thay vì xóa khỏi heap). Task reaper ngủ đến
+    deadline gần nhất rồi gọi `on_expire` cho các ván hết hạn, và cũng kết
+    thúc sớm các ván cũ nhất khi số ván vượt ACTIVE_GAME_MAX. Vì mọi ván đã
+    lưu đều được nạp lúc khởi động, giới hạn này và timeout áp dụng cho mọi
+    ván còn sống, không chỉ các ván đã được chơi lại sau khi restart.
+    """
+
+    def __init__(self, db, flush_interval: Optional[float] = None,
+                 timeout: Optional[float] = None, max_games: Optional[int] = None,
+                 on_expire: Optional[Callable[[int, int, object], Awaitable[None]]] = None):
+        self.db = db
+        self.flush_interval = flush_interval or config.ACTIVE_GAME_FLUSH_INTERVAL
+        self.timeout = timeout or config.ACTIVE_GAME_TIMEOUT
+        self.max_games = max_games or config.ACTIVE_GAME_MAX
+        # Gọi (user_id, guild_id, game) để kết thúc và trả tiền ván hết hạn
+        self.on_expire = on_expire
+        self._games: Dict[str, object] = {}
+        self._dirty: Set[str] = set()
+        self._deleted: Set[str] = set()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+        self._deadlines: Dict[str, float] = {}
+        self._heap: List[Tuple[float, int, str]] = []
+        self._sequence = itertools.count()
+        self._reaper_wakeup = asyncio.Event()
+        self._reaper_task: Optional[asyncio.Task] = None
+
+        self.snapshots_written = 0
+        self.rehydrated = 0
+        self.expired = 0
+        self.evicted = 0
+
+    async def start(self):
+        """Nạp lại các ván đã lưu rồi chạy task flush và task reaper nền"""
+        try:
+            await self.load_all()
+        except Exception as e:
+            print(f"❌ Error loading active games: {e}")
+        self._task = asyncio.create_task(self._run())
+        self._reaper_task = asyncio.create_task(self._reap())
+
+    # ------------------------------------------------------------------
+    # API kiểu dict
+    # ------------------------------------------------------------------
+
+    def get(self, key: str, default=None):
+        return self._games.get(key, default)
+
+    def __getitem__(self, key: str):
+        return self._games[key]
+
+    def __setitem__(self, key: str, game):
+        self._games[key] = game
+        self._deleted.discard(key)
+        self.touch(key)
+        if len(self._games) > self.max_games:
+            self._reaper_wakeup.set()
+
+    def __delitem__(self, key: str):
+        del self._games[key]
+        self._forget(key)
+
+    def pop(self, key: str, default=None):
+        game = self._games.pop(key, default)
+        self._forget(key)
+        return game
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._games
+
+    def __len__(self) -> int:
+        return len(self._games)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._games)
+
+    def touch(self, key: str):
+        """Đánh dấu ván đã thay đổi (snapshot ở lần flush kế tiếp) và gia hạn deadline"""
+        if key in self._games:
+            self._dirty.add(key)
+            self._wakeup.set()
+            self._schedule(key)
+
+    def _forget(self, key: str):
+        self._dirty.discard(key)
+        self._deleted.add(key)
+        self._deadlines.pop(key, None)
+        self._wakeup.set()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._games),
+            "max_size": self.max_games,
+            "heap": len(self._heap),
+            "dirty": len(self._dirty),
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "rehydrated": self.rehydrated,
+            "snapshots_written": self.snapshots_written
+        }
+
+    # ------------------------------------------------------------------
+    # Nạp lại sau khi khởi động lại
+    # ------------------------------------------------------------------
+
+    def _restore(self, key: str, game_type: str, game_data: str, shoe: Optional[Shoe] = None):
+        """Dựng lại một ván từ snapshot; None (và đánh dấu xóa dòng) nếu snapshot hỏng hoặc ván đã trả tiền"""
+        cls = GAME_TYPES.get(game_type)
+        game = None
+        if cls is None:
+            print(f"❌ Error restoring active game {key}: unknown game type {game_type!r}")
+        else:
+            try:
+                game = cls.from_state(base64.b64decode(game_data), shoe=shoe)
+            except (ValueError, struct.error, IndexError) as e:
+                print(f"❌ Error restoring active game {key}: {e}")
+        if game is None or game.settled:
+            self._deleted.add(key)
+            self._wakeup.set()
+            return None
+        return game
+
+    async def load_all(self) -> int:
+        """Nạp mọi ván trong bảng active_games; deadline tính từ lúc snapshot.
+
+        Ván đã quá ACTIVE_GAME_TIMEOUT hết hạn ngay ở lượt reaper đầu tiên.
+        Ván không dựng lại được hoặc đã trả tiền bị xóa khỏi bảng, các ván
+        khác vẫn được nạp. Trả về số ván đã nạp.
+        """
+        rows = await self.db.get_all_active_games()
+        now = time.monotonic()
+        utcnow = datetime.datetime.utcnow()
+        loaded = 0
+        for user_id, guild_id, game_type, game_data, snapshot_at in rows:
+            key = game_key(user_id, guild_id)
+            if key in self._games or key in self._deleted:
+                continue
+            game = self._restore(key, game_type, game_data)
+            if game is None:
+                continue
+            age = (utcnow - snapshot_at).total_seconds() if snapshot_at else self.timeout
+            self._games[key] = game
+            self._schedule(key, now + max(0.0, self.timeout - age))
+            loaded += 1
+
+        self.rehydrated += loaded
+        # Số ván nạp lại có thể vượt max_games: để reaper kết thúc bớt
+        self._reaper_wakeup.set()
+        if loaded:
+            print(f"✅ Restored {loaded} active games")
+        return loaded
+
+    async def load(self, user_id: int, guild_id: int, shoe: Optional[Shoe] = None):
+        """Lấy ván đang chơi; nếu không có trong bộ nhớ thì dựng lại từ snapshot"""
+        key = game_key(user_id, guild_id)
+        game = self._games.get(key)
+        if game is not None or key in self._deleted:
+            return game
+
+        row = await self.db.get_active_game(user_id, guild_id)
+        if row is None:
+            return None
+
+        # Có thể đã có ván mới trong lúc chờ database
+        if key in self._games or key in self._deleted:
+            return self._games.get(key)
+
+        game_type, game_data = row
+        game = self._restore(key, game_type, game_data, shoe)
+        if game is None:
+            return None
+
+        self._games[key] = game
+        self._schedule(key)
+        self.rehydrated += 1
+        return game
+
+    # ------------------------------------------------------------------
+    # Hết hạn
+    # ------------------------------------------------------------------
+
+    def _schedule(self, key: str, deadline: Optional[float] = None):
+        if deadline is None:
+            deadline = time.monotonic() + self.timeout
+        self._deadlines[key] = deadline
+        heapq.heappush(self._heap, (deadline, next(self._sequence), key))
+
+        # Mỗi touch để lại một entry cũ, dựng lại heap khi entry cũ quá nhiều
+        if len(self._heap) > 4 * len(self._deadlines) + 64:
+            self._heap = [(deadline, next(self._sequence), key) for key, deadline in self._deadlines.items()]
+            heapq.heapify(self._heap)
+
+        # Deadline này sớm nhất: reaper có thể đang ngủ không hẹn giờ (registry rỗng)
+        if self._heap[0][2] == key:
+            self._reaper_wakeup.set()
+
+    def _pop_due(self, now: float) -> List[Tuple[str, bool]]:
+        """Lấy các key đã hết hạn, và các key cũ nhất nếu vượt max_games"""
+        due = []
+        overflow = len(self._games) - self.max_games
+        while self._heap:
+            deadline, _, key = self._heap[0]
+            if self._deadlines.get(key) != deadline:
+                heapq.heappop(self._heap)  # Entry cũ
+                continue
+            if deadline > now and overflow <= 0:
+                break
+            heapq.heappop(self._heap)
+            del self._deadlines[key]
+            due.append((key, deadline > now))
+            overflow -= 1
+        return due
+
+    def _next_deadline(self) -> Optional[float]:
+        while self._heap and self._deadlines.get(self._heap[0][2]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    async def _reap(self):
+        while True:
+            deadline = self._next_deadline()
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                await asyncio.wait_for(self._reaper_wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._reaper_wakeup.clear()
+
+            for key, evicted in self._pop_due(time.monotonic()):
+                try:
+                    await self.expire(key)
+                except Exception as e:
+                    print(f"❌ Error expiring active game {key}: {e}")
+                if evicted:
+                    self.evicted += 1
+
+    async def expire(self, key: str):
+        """Kết thúc ngay một ván theo policy hết hạn và xóa khỏi registry"""
+        game = self._games.get(key)
+        if game is None:
+            return None
+
+        if self.on_expire is not None:
+            user_id, guild_id = _split_key(key)
+            await self.on_expire(user_id, guild_id, game)
+
+        # Người chơi có thể đã bắt đầu ván mới trong lúc chờ
+        if self._games.get(key) is game:
+            self.pop(key)
+        self.expired += 1
+        return game
+
+    # ------------------------------------------------------------------
+    # Flush nền
+    # ------------------------------------------------------------------
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            # Gom các thay đổi đến trong khoảng flush_interval
+            await asyncio.sleep(self.flush_interval)
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        """Ghi snapshot của mọi ván dirty và xóa các ván đã kết thúc"""
+        if not self._dirty and not self._deleted:
+            return
+
+        dirty, self._dirty = self._dirty, set()
+        deleted, self._deleted = self._deleted, set()
+
+        saves = []
+        for key in dirty:
+            game = self._games.get(key)
+            type_name = _TYPE_NAMES.get(type(game))
+            if type_name is None:
+                continue
+            if getattr(game, "settled", False):
+                # Ván đã trả tiền thì không cần khôi phục (ván xong nhưng chưa trả vẫn được lưu)
+                deleted.add(key)
+                continue
+            user_id, guild_id = _split_key(key)
+            saves.append((user_id, guild_id, type_name, base64.b64encode(game.to_state()).decode("ascii")))
+
+        try:
+            await self.db.sync_active_games(saves, [_split_key(key) for key in deleted])
+            self.snapshots_written += len(saves)
+        except Exception as e:
+            print(f"❌ Error flushing active games: {e}")
+            # Thử lại ở lần sau, giữ thay đổi mới hơn nếu có
+            self._dirty |= {key for key in dirty if key in self._games}
+            self._deleted |= {key for key in deleted if key not in self._games}
+            self._wakeup.set()
+
+    async def close(self):
+        """Dừng task nền và ghi nốt thay đổi; ván chưa xong vẫn giữ snapshot để khôi phục"""
+        for task in (self._reaper_task, self._task):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = self._reaper_task = None
+        await self.flush()
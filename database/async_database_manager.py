@@ -0,0 +1,321 @@
+import asyncio
+import datetime
+import contextlib
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, List, Tuple
+
+from .database_manager import DatabaseManager
+from .models import GuildConfig, UserBalance, PlayerStats
+from .transaction_journal import TransactionJournal
+from .balance_cache import BalanceCache
+from .guild_config_cache import GuildConfigCache
+from . import reconciliation
+from .history_export import export_csv
+from .leaderboard import Leaderboard
+from .player_stats import RoundResult
+from config import config
+
+class AsyncDatabaseManager:
+    """Bọc DatabaseManager để các cog await mà không chặn event loop.
+
+    Mọi truy vấn chạy trên một executor riêng; với SQLite nên để 1 worker
+    để các lệnh ghi được xếp hàng thay vì tranh chấp lock của file.
+    """
+
+    def __init__(self, db: Optional[DatabaseManager] = None, max_workers: Optional[int] = None):
+        self.sync = db or DatabaseManager()
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers or config.DB_EXECUTOR_WORKERS,
+            thread_name_prefix="casino-db"
+        )
+        self.journal = TransactionJournal(self._write_transactions) if config.JOURNAL_ENABLED else None
+        self.balance_cache = BalanceCache()
+        self.guild_configs = GuildConfigCache()
+        self.leaderboard = Leaderboard()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Khởi động các thành phần nền (journal, cache cấu hình guild)"""
+        if self.journal:
+            await self.journal.start()
+        await self.reload_guild_configs()
+        if self.guild_configs.ttl > 0:
+            self._refresh_task = asyncio.create_task(self._refresh_guild_configs())
+
+    async def _run(self, func, *args, **kwargs):
+        """Chạy hàm đồng bộ của DatabaseManager trên executor"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    def _remember_balance(self, user_id: int, guild_id: int, balance: int):
+        """Số dư vừa commit: ghi vào cache và bảng xếp hạng"""
+        self.balance_cache.set((user_id, guild_id), balance)
+        self.leaderboard.update(user_id, guild_id, balance)
+
+    async def _write_transactions(self, rows: List[dict]):
+        await self._run(self.sync.add_transactions, rows)
+
+    async def reload_guild_configs(self):
+        """Nạp lại toàn bộ cache cấu hình guild"""
+        self.guild_configs.load_all(await self._run(self.sync.get_all_guild_configs))
+
+    async def _refresh_guild_configs(self):
+        while True:
+            await asyncio.sleep(self.guild_configs.ttl)
+            try:
+                await self.reload_guild_configs()
+            except Exception as e:
+                print(f"❌ Error reloading guild configs: {e}")
+
+    def get_prefix(self, guild_id: int) -> str:
+        """Prefix của guild lấy từ cache, không query database"""
+        return self.guild_configs.prefix(guild_id)
+
+    async def get_guild_config(self, guild_id: int) -> Optional[GuildConfig]:
+        """Lấy cấu hình của guild"""
+        if self.guild_configs.loaded:
+            return self.guild_configs.get(guild_id)
+        return await self.refresh_guild_config(guild_id)
+
+    async def refresh_guild_config(self, guild_id: int) -> Optional[GuildConfig]:
+        """Đọc lại cấu hình một guild từ database và cập nhật cache"""
+        guild_config = await self._run(self.sync.get_guild_config, guild_id)
+        if guild_config:
+            self.guild_configs.set(guild_config)
+        else:
+            self.guild_configs.invalidate(guild_id)
+        return guild_config
+
+    async def create_guild_config(self, guild_id: int, prefix: str = "!", starting_balance: int = 1000) -> GuildConfig:
+        """Tạo cấu hình mới cho guild"""
+        guild_config = await self._run(self.sync.create_guild_config, guild_id, prefix, starting_balance)
+        self.guild_configs.set(guild_config)
+        return guild_config
+
+    async def get_or_create_user_balance(self, user_id: int, guild_id: int) -> UserBalance:
+        """Lấy hoặc tạo balance mới cho user"""
+        async with self.balance_cache.lock((user_id, guild_id)):
+            balance = await self._run(self.sync.get_or_create_user_balance, user_id, guild_id)
+            self._remember_balance(user_id, guild_id, balance.balance)
+            return balance
+
+    async def get_user_balance(self, user_id: int, guild_id: int) -> Optional[UserBalance]:
+        """Lấy số dư của user (giữ nguyên cho tương thích)"""
+        return await self.get_or_create_user_balance(user_id, guild_id)
+
+    async def create_user_balance(self, user_id: int, guild_id: int, balance: int = None) -> UserBalance:
+        """Tạo balance mới cho user"""
+        return await self.get_or_create_user_balance(user_id, guild_id)
+
+    async def get_balance(self, user_id: int, guild_id: int) -> int:
+        """Lấy số dư (int) của user, ưu tiên cache"""
+        balance = self.balance_cache.get((user_id, guild_id))
+        if balance is None:
+            balance = (await self.get_or_create_user_balance(user_id, guild_id)).balance
+        return balance
+
+    def user_lock(self, user_id: int, guild_id: int):
+        """Lock theo user để gom kiểm tra + trừ tiền + cập nhật game thành một bước"""
+        return self.balance_cache.lock((user_id, guild_id))
+
+    async def settle(self, user_id: int, guild_id: int, delta: int, tx_type: str, description: str,
+                     min_balance: Optional[int] = 0, result: Optional[RoundResult] = None,
+                     **ledger) -> Optional[int]:
+        """Cộng/trừ tiền và ghi lịch sử trong một transaction, None nếu không đủ tiền.
+
+        `result`: kết quả ván được chốt bởi lần settle này (cộng vào thống kê).
+        `ledger`: game_type, round_id, bet, payout của dòng lịch sử.
+        """
+        key = (user_id, guild_id)
+        async with self.balance_cache.lock(key):
+            new_balance = await self._run(
+                self.sync.settle, user_id, guild_id, delta, tx_type, description, min_balance,
+                record=self.journal is None, result=result, **ledger
+            )
+            if new_balance is None:
+                self.balance_cache.invalidate(key)
+                return None
+
+            self._remember_balance(user_id, guild_id, new_balance)
+            if self.journal:
+                await self.journal.append(user_id, guild_id, delta, tx_type, description, **ledger)
+            return new_balance
+
+    async def settle_many(self, entries: List[Tuple[int, int, int, str, str, Optional[int], Optional[dict]]],
+                          results: Optional[List[Tuple[int, int, RoundResult]]] = None) -> List[Optional[int]]:
+        """settle nhiều user (user_id, guild_id, delta, tx_type, description, min_balance, ledger) trong một transaction.
+
+        `results`: (user_id, guild_id, RoundResult) cộng vào thống kê trong cùng transaction.
+        """
+        keys = sorted({(user_id, guild_id) for user_id, guild_id, *_ in entries})
+        async with contextlib.AsyncExitStack() as stack:
+            # Lấy lock theo thứ tự cố định như transfer
+            for key in keys:
+                await stack.enter_async_context(self.balance_cache.lock(key))
+
+            balances = await self._run(self.sync.settle_many, entries, record=self.journal is None, results=results)
+            for key in keys:
+                self.balance_cache.invalidate(key)
+            # Các dòng được áp dụng theo thứ tự, dòng thành công cuối cùng là số dư mới nhất
+            for (user_id, guild_id, delta, tx_type, description, _, ledger), new_balance in zip(entries, balances):
+                if new_balance is None:
+                    continue
+                self._remember_balance(user_id, guild_id, new_balance)
+                if self.journal:
+                    await self.journal.append(user_id, guild_id, delta, tx_type, description, **(ledger or {}))
+            return balances
+
+    async def transfer(self, sender_id: int, receiver_id: int, guild_id: int, amount: int,
+                       sender_description: str, receiver_description: str) -> Optional[int]:
+        """Chuyển tiền giữa hai user trong một transaction"""
+        # Lấy lock theo thứ tự cố định để hai lệnh chuyển ngược chiều không deadlock
+        first, second = sorted([(sender_id, guild_id), (receiver_id, guild_id)])
+        async with self.balance_cache.lock(first), self.balance_cache.lock(second):
+            sender_balance = await self._run(
+                self.sync.transfer, sender_id, receiver_id, guild_id, amount,
+                sender_description, receiver_description, record=self.journal is None
+            )
+            self.balance_cache.invalidate((receiver_id, guild_id))
+            self.leaderboard.forget(guild_id)
+            if sender_balance is None:
+                self.balance_cache.invalidate((sender_id, guild_id))
+                return None
+
+            self._remember_balance(sender_id, guild_id, sender_balance)
+            if self.journal:
+                await self.journal.append(sender_id, guild_id, -amount, "transfer", sender_description)
+                await self.journal.append(receiver_id, guild_id, amount, "transfer", receiver_description)
+            return sender_balance
+
+    async def record_results(self, results: List[Tuple[int, int, RoundResult]]):
+        """Cộng kết quả các ván thua (không có lần settle trả thưởng) vào thống kê"""
+        return await self._run(self.sync.record_results, results)
+
+    async def get_leaderboard(self, guild_id: int, limit: Optional[int] = None) -> List[Tuple[int, int]]:
+        """Top (user_id, balance) của guild từ bảng trong bộ nhớ, chỉ query khi cần nạp lại"""
+        limit = min(limit or config.LEADERBOARD_SIZE, self.leaderboard.capacity)
+        board = self.leaderboard.board(guild_id)
+        entries = board.top(limit)
+        if entries is not None:
+            return entries
+
+        async with board.lock:
+            entries = board.top(limit)
+            if entries is None:
+                board.begin_load()
+                try:
+                    rows = await self._run(self.sync.get_top_balances, guild_id, board.capacity)
+                except Exception:
+                    board.abort_load()
+                    raise
+                board.finish_load(rows)
+                # Cập nhật đến trong lúc nạp có thể làm top chưa chắc chắn: dùng ảnh chụp vừa đọc
+                entries = board.top(limit) or rows[:limit]
+        return entries
+
+    async def get_player_stats(self, user_id: int, guild_id: int) -> List[PlayerStats]:
+        """Thống kê theo từng game của user"""
+        return await self._run(self.sync.get_player_stats, user_id, guild_id)
+
+    async def get_transactions(self, user_id: int, guild_id: int, before: Optional[Tuple[datetime.datetime, int]] = None,
+                               limit: int = 10) -> List[Tuple]:
+        """Một trang lịch sử giao dịch (keyset theo (created_at, id)).
+
+        Dòng còn trong journal (chưa tới JOURNAL_FLUSH_INTERVAL) chưa xuất hiện.
+        """
+        return await self._run(self.sync.get_transactions, user_id, guild_id, before, limit)
+
+    async def export_transactions(self, guild_id: int, user_id: Optional[int] = None):
+        """Xuất lịch sử ra CSV, trả về (file, số dòng, số byte).
+
+        Chạy trên thread riêng thay vì executor DB: đọc cả guild mất vài giây
+        và không được chặn các lệnh settle đang xếp hàng.
+        """
+        return await asyncio.to_thread(export_csv, self.sync, guild_id, user_id)
+
+    async def reconcile(self, incremental: bool = False,
+                        repair_mode: Optional[str] = None) -> reconciliation.ReconcileReport:
+        """Đối soát số dư với ledger, sửa lệch nếu có `repair_mode` ("ledger" hoặc "balance").
+
+        Lượt quét chạy trên thread riêng. Các user lệch được đọc lại (và sửa)
+        trong lúc giữ lock của họ, sau khi journal đã ghi hết các dòng append
+        trước đó: settle giữ lock đến khi dòng lịch sử vào journal, nên không
+        giao dịch nào của các user này còn ghi dở và lệch tạm thời không bị
+        báo hay sửa nhầm.
+        """
+        engine = self.sync.engine
+        report = await asyncio.to_thread(reconciliation.reconcile, engine, incremental)
+        if report.drifts:
+            # Lấy lock theo thứ tự cố định như settle_many/transfer
+            keys = sorted({(drift.user_id, drift.guild_id) for drift in report.drifts})
+            async with contextlib.AsyncExitStack() as stack:
+                for key in keys:
+                    await stack.enter_async_context(self.balance_cache.lock(key))
+                if self.journal:
+                    await self.journal.drain()
+                report.drifts = await self._run(reconciliation.recheck, engine, report.drifts)
+                if repair_mode and report.drifts:
+                    report.repaired = await self._run(reconciliation.repair, engine, report.drifts, repair_mode)
+                    for drift in report.drifts:
+                        self.balance_cache.invalidate((drift.user_id, drift.guild_id))
+                        self.leaderboard.forget(drift.guild_id)
+        await self._run(reconciliation.save_checkpoint, engine, report.checkpoint)
+        return report
+
+    async def add_transaction(self, user_id: int, guild_id: int, amount: int, transaction_type: str, description: str,
+                              **ledger):
+        """Thêm lịch sử giao dịch"""
+        if self.journal:
+            await self.journal.append(user_id, guild_id, amount, transaction_type, description, **ledger)
+            return
+        return await self._run(self.sync.add_transaction, user_id, guild_id, amount, transaction_type, description,
+                               **ledger)
+
+    async def save_active_game(self, user_id: int, guild_id: int, game_type: str, game_data: str) -> int:
+        """Lưu game đang active"""
+        return await self._run(self.sync.save_active_game, user_id, guild_id, game_type, game_data)
+
+    async def get_active_game(self, user_id: int, guild_id: int) -> Optional[Tuple[str, str]]:
+        """Lấy game đang active, trả về (game_type, game_data)"""
+        return await self._run(self.sync.get_active_game, user_id, guild_id)
+
+    async def get_all_active_games(self) -> List[Tuple[int, int, str, str, datetime.datetime]]:
+        """Mọi game đang active kèm thời điểm snapshot (nạp lại lúc khởi động)"""
+        return await self._run(self.sync.get_all_active_games)
+
+    async def delete_active_game(self, user_id: int, guild_id: int):
+        """Xóa game active"""
+        return await self._run(self.sync.delete_active_game, user_id, guild_id)
+
+    async def sync_active_games(self, saves: List[Tuple[int, int, str, str]], deletes: List[Tuple[int, int]]):
+        """Ghi/xóa một lô snapshot game active trong một transaction"""
+        return await self._run(self.sync.sync_active_games, saves, deletes)
+
+    async def get_fair_seed(self, user_id: int, guild_id: int) -> Optional[Tuple[str, str, str, int]]:
+        """Cặp seed provably fair đang dùng"""
+        return await self._run(self.sync.get_fair_seed, user_id, guild_id)
+
+    async def rotate_fair_seed(self, user_id: int, guild_id: int, server_seed: str, server_seed_hash: str,
+                               client_seed: str) -> Optional[Tuple[str, str, str, int]]:
+        """Công bố cặp seed đang dùng và chuyển sang cặp mới"""
+        return await self._run(self.sync.rotate_fair_seed, user_id, guild_id, server_seed, server_seed_hash, client_seed)
+
+    async def reserve_fair_nonce(self, server_seed_hash: str) -> int:
+        """Giữ chỗ nonce kế tiếp của seed đang dùng"""
+        return await self._run(self.sync.reserve_fair_nonce, server_seed_hash)
+
+    async def record_fair_round(self, user_id: int, guild_id: int, game_type: str, server_seed_hash: str,
+                                client_seed: str, nonce: int, outcome: str):
+        """Lưu một ván provably fair"""
+        return await self._run(self.sync.record_fair_round, user_id, guild_id, game_type,
+                               server_seed_hash, client_seed, nonce, outcome)
+
+    async def close(self):
+        """Flush journal, chờ các truy vấn đang chạy rồi đóng engine"""
+        if self._refresh_task:
+            self._refresh_task.cancel()
+        if self.journal:
+            await self.journal.close()
+        await asyncio.get_running_loop().run_in_executor(None, self.executor.shutdown, True)
+        self.sync.engine.dispose()
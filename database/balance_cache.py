@@ -0,0 +1,123 @@
+import asyncio
+import functools
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+from config import config
+
+BalanceKey = Tuple[int, int]  # (user_id, guild_id)
+
+class _KeyLock:
+    """asyncio.Lock cho phép cùng một task acquire lồng nhau.
+
+    Lệnh kiểm tra + trừ tiền + cập nhật game giữ lock, rồi gọi settle
+    (cũng lấy lock) mà không tự deadlock. `_users` đếm task đang giữ hoặc
+    đang chờ; khi về 0 thì gọi `on_idle` để cache bỏ lock không còn dùng.
+    """
+
+    def __init__(self, on_idle: Optional[Callable[[], None]] = None):
+        self._lock = asyncio.Lock()
+        self._owner = None
+        self._depth = 0
+        self._users = 0
+        self._on_idle = on_idle
+
+    def locked(self) -> bool:
+        return self._lock.locked()
+
+    def idle(self) -> bool:
+        """Không task nào giữ hoặc đang chờ lock"""
+        return self._users == 0
+
+    def _leave(self):
+        self._users -= 1
+        if self._users == 0 and self._on_idle is not None:
+            self._on_idle()
+
+    async def __aenter__(self):
+        task = asyncio.current_task()
+        if self._owner is task:
+            self._depth += 1
+            return self
+        self._users += 1
+        try:
+            await self._lock.acquire()
+        except BaseException:
+            self._leave()
+            raise
+        self._owner = task
+        self._depth = 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._depth -= 1
+        if self._depth == 0:
+            self._owner = None
+            self._lock.release()
+            self._leave()
+
+class BalanceCache:
+    """LRU cache số dư theo (user_id, guild_id), ghi xuyên (write-through) khi settle.
+
+    Mỗi key có một lock riêng để các thao tác đồng thời (bấm nút liên tục)
+    trên cùng một user được xếp hàng thay vì trừ tiền hai lần. Lock của key
+    không có trong cache bị bỏ ngay khi không còn task nào giữ hoặc chờ.
+    """
+
+    def __init__(self, max_size: Optional[int] = None):
+        self.max_size = max_size or config.BALANCE_CACHE_SIZE
+        self._entries: "OrderedDict[BalanceKey, int]" = OrderedDict()
+        self._locks: Dict[BalanceKey, _KeyLock] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: BalanceKey) -> Optional[int]:
+        """Lấy số dư trong cache, None nếu miss"""
+        balance = self._entries.get(key)
+        if balance is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return balance
+
+    def set(self, key: BalanceKey, balance: int):
+        """Ghi số dư mới nhất vào cache"""
+        self._entries[key] = balance
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            evicted, _ = self._entries.popitem(last=False)
+            self.evictions += 1
+            self._drop_lock(evicted)
+
+    def invalidate(self, key: BalanceKey):
+        """Xóa key khỏi cache (lần đọc sau sẽ lấy từ database)"""
+        self._entries.pop(key, None)
+        self._drop_lock(key)
+
+    def lock(self, key: BalanceKey) -> _KeyLock:
+        """Lock riêng của user, dùng với `async with`"""
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = _KeyLock(functools.partial(self._drop_lock, key))
+        return lock
+
+    def _drop_lock(self, key: BalanceKey):
+        """Bỏ lock của key không còn trong cache khi không task nào giữ hoặc chờ"""
+        lock = self._locks.get(key)
+        if lock is not None and lock.idle() and key not in self._entries:
+            del self._locks[key]
+
+    def stats(self) -> Dict[str, float]:
+        """Bộ đếm để điều chỉnh kích thước cache"""
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / total if total else 0.0
+        }
@@ -1,15 +1,24 @@
-from sqlalchemy import create_engine, and_
+from sqlalchemy import and_, update, select, insert, case, tuple_
 from sqlalchemy.orm import sessionmaker
-from typing import Optional, List
-import json
-from .models import Base, GuildConfig, UserBalance, TransactionHistory, ActiveGame
+import datetime
+from typing import Dict, Iterator, Optional, List, Tuple
+from .models import Base, GuildConfig, UserBalance, TransactionHistory, ActiveGame, FairSeed, FairRound, PlayerStats
+from .ledger import OPENING_TYPE, ledger_row
+from .player_stats import RoundResult
+from .migrate_ledger import ensure_ledger_schema
+from .engine import make_engine
 from config import config
 
 class DatabaseManager:
-    def __init__(self):
-        self.engine = create_engine(config.DATABASE_URL)
+    def __init__(self, database_url: Optional[str] = None, profile: Optional[str] = None):
+        self.engine = make_engine(database_url, profile)
         Base.metadata.create_all(self.engine)
-        self.Session = sessionmaker(bind=self.engine)
+        # Database cũ: thêm cột/index ledger còn thiếu (dữ liệu cũ điền bằng database.migrate_ledger)
+        ensure_ledger_schema(self.engine)
+        for index in UserBalance.__table__.indexes:
+            index.create(self.engine, checkfirst=True)
+        # expire_on_commit=False: object trả về được dùng ngoài session (và ngoài thread DB)
+        self.Session = sessionmaker(bind=self.engine, expire_on_commit=False)
     
     def get_guild_config(self, guild_id: int) -> Optional[GuildConfig]:
         """Lấy cấu hình của guild"""
@@ -19,6 +28,14 @@ class DatabaseManager:
         finally:
             session.close()
     
+    def get_all_guild_configs(self) -> List[GuildConfig]:
+        """Lấy cấu hình của tất cả guild"""
+        session = self.Session()
+        try:
+            return session.query(GuildConfig).all()
+        finally:
+            session.close()
+    
     def create_guild_config(self, guild_id: int, prefix: str = "!", starting_balance: int = 1000) -> GuildConfig:
         """Tạo cấu hình mới cho guild"""
         session = self.Session()
@@ -47,12 +64,7 @@ class DatabaseManager:
                 guild_config = self.get_guild_config(guild_id)
                 starting_balance = guild_config.starting_balance if guild_config else config.STARTING_BALANCE
                 
-                balance = UserBalance(
-                    user_id=user_id,
-                    guild_id=guild_id,
-                    balance=starting_balance
-                )
-                session.add(balance)
+                balance = self._open_account(session, user_id, guild_id, starting_balance)
                 session.commit()
                 print(f"✅ Created balance for user {user_id} in guild {guild_id}: {starting_balance}")
             
@@ -72,32 +84,209 @@ class DatabaseManager:
         """Tạo balance mới cho user"""
         return self.get_or_create_user_balance(user_id, guild_id)
     
-    def update_balance(self, user_id: int, guild_id: int, amount: int) -> bool:
-        """Cập nhật số dư của user"""
+    def _open_account(self, session, user_id: int, guild_id: int, starting_balance: int) -> UserBalance:
+        """Tạo số dư mới kèm dòng lịch sử "opening" để số dư luôn bằng tổng amount của user"""
+        balance = UserBalance(user_id=user_id, guild_id=guild_id, balance=starting_balance)
+        session.add(balance)
+        session.add(TransactionHistory(**ledger_row(
+            user_id, guild_id, starting_balance, OPENING_TYPE, f"Số dư khởi đầu: {starting_balance}"
+        )))
+        return balance
+    
+    def _apply_delta(self, session, user_id: int, guild_id: int, delta: int, min_balance: Optional[int]) -> Optional[int]:
+        """UPDATE có điều kiện trong session hiện tại, trả về số dư mới hoặc None nếu không đủ tiền"""
+        conditions = [UserBalance.user_id == user_id, UserBalance.guild_id == guild_id]
+        if min_balance is not None:
+            conditions.append(UserBalance.balance + delta >= min_balance)
+        
+        stmt = (
+            update(UserBalance)
+            .where(and_(*conditions))
+            .values(balance=UserBalance.balance + delta)
+            .execution_options(synchronize_session=False)
+        )
+        if session.execute(stmt).rowcount == 0:
+            # Chưa có record thì tạo rồi thử lại, còn lại là không đủ tiền
+            exists = session.query(UserBalance.id).filter(
+                and_(UserBalance.user_id == user_id, UserBalance.guild_id == guild_id)
+            ).first()
+            if exists:
+                return None
+            
+            guild_config = session.query(GuildConfig).filter(GuildConfig.guild_id == guild_id).first()
+            starting_balance = guild_config.starting_balance if guild_config else config.STARTING_BALANCE
+            self._open_account(session, user_id, guild_id, starting_balance)
+            session.flush()
+            if session.execute(stmt).rowcount == 0:
+                return None
+        
+        return session.execute(
+            select(UserBalance.balance).where(
+                and_(UserBalance.user_id == user_id, UserBalance.guild_id == guild_id)
+            )
+        ).scalar()
+    
+    def _apply_result(self, session, user_id: int, guild_id: int, result: RoundResult):
+        """Cộng dồn kết quả ván vào player_stats trong session hiện tại"""
+        stmt = (
+            update(PlayerStats)
+            .where(and_(
+                PlayerStats.guild_id == guild_id,
+                PlayerStats.user_id == user_id,
+                PlayerStats.game_type == result.game_type
+            ))
+            .values(
+                rounds=PlayerStats.rounds + result.rounds,
+                wins=PlayerStats.wins + result.win_count,
+                losses=PlayerStats.losses + result.loss_count,
+                wagered=PlayerStats.wagered + result.wagered,
+                net=PlayerStats.net + result.net,
+                biggest_win=case(
+                    (PlayerStats.biggest_win < result.best, result.best),
+                    else_=PlayerStats.biggest_win
+                ),
+                updated_at=datetime.datetime.utcnow()
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if session.execute(stmt).rowcount == 0:
+            session.add(PlayerStats(
+                user_id=user_id,
+                guild_id=guild_id,
+                game_type=result.game_type,
+                rounds=result.rounds,
+                wins=result.win_count,
+                losses=result.loss_count,
+                wagered=result.wagered,
+                net=result.net,
+                biggest_win=result.best
+            ))
+    
+    def settle(self, user_id: int, guild_id: int, delta: int, tx_type: str, description: str,
+               min_balance: Optional[int] = 0, record: bool = True, result: Optional[RoundResult] = None,
+               **ledger) -> Optional[int]:
+        """Cộng/trừ tiền và ghi lịch sử giao dịch trong cùng một transaction.
+        
+        Chỉ cập nhật khi số dư sau giao dịch >= min_balance (None = không giới hạn).
+        record=False khi lịch sử được ghi qua TransactionJournal.
+        `result`: kết quả ván được chốt bởi lần settle này, cộng vào player_stats.
+        `ledger`: game_type, round_id, bet, payout của dòng lịch sử (xem ledger_row).
+        Trả về số dư mới, hoặc None nếu không đủ tiền.
+        """
+        session = self.Session()
+        try:
+            new_balance = self._apply_delta(session, user_id, guild_id, delta, min_balance)
+            if new_balance is None:
+                session.rollback()
+                return None
+            
+            if result is not None:
+                self._apply_result(session, user_id, guild_id, result)
+            if record:
+                session.add(TransactionHistory(**ledger_row(user_id, guild_id, delta, tx_type, description, **ledger)))
+            session.commit()
+            return new_balance
+        except Exception as e:
+            session.rollback()
+            print(f"❌ Error settling balance: {e}")
+            raise
+        finally:
+            session.close()
+    
+    def settle_many(self, entries: List[Tuple[int, int, int, str, str, Optional[int], Optional[dict]]],
+                    record: bool = True,
+                    results: Optional[List[Tuple[int, int, RoundResult]]] = None) -> List[Optional[int]]:
+        """settle cho nhiều (user_id, guild_id, delta, tx_type, description, min_balance, ledger) trong một transaction.
+        
+        Mỗi dòng được kiểm tra số dư riêng: dòng không đủ tiền trả về None và
+        không ảnh hưởng các dòng khác. `results` (user_id, guild_id, RoundResult)
+        được cộng vào player_stats trong cùng transaction, kể cả người thua
+        không có dòng tiền nào. Trả về số dư mới theo thứ tự entries.
+        """
+        if not entries and not results:
+            return []
+        session = self.Session()
+        try:
+            balances = []
+            rows = []
+            for user_id, guild_id, delta, tx_type, description, min_balance, ledger in entries:
+                new_balance = self._apply_delta(session, user_id, guild_id, delta, min_balance)
+                balances.append(new_balance)
+                if new_balance is not None and record:
+                    rows.append(ledger_row(user_id, guild_id, delta, tx_type, description, **(ledger or {})))
+            
+            for user_id, guild_id, result in results or ():
+                self._apply_result(session, user_id, guild_id, result)
+            if rows:
+                session.execute(insert(TransactionHistory), rows)
+            session.commit()
+            return balances
+        except Exception as e:
+            session.rollback()
+            print(f"❌ Error settling balances: {e}")
+            raise
+        finally:
+            session.close()
+    
+    def transfer(self, sender_id: int, receiver_id: int, guild_id: int, amount: int,
+                 sender_description: str, receiver_description: str, record: bool = True) -> Optional[int]:
+        """Chuyển tiền giữa hai user trong một transaction, trả về số dư mới của người gửi"""
         session = self.Session()
         try:
-            balance = self.get_or_create_user_balance(user_id, guild_id)
-            balance.balance += amount
+            sender_balance = self._apply_delta(session, sender_id, guild_id, -amount, 0)
+            if sender_balance is None:
+                session.rollback()
+                return None
+            self._apply_delta(session, receiver_id, guild_id, amount, None)
+            
+            if record:
+                session.add_all([
+                    TransactionHistory(**ledger_row(sender_id, guild_id, -amount, "transfer", sender_description)),
+                    TransactionHistory(**ledger_row(receiver_id, guild_id, amount, "transfer", receiver_description))
+                ])
             session.commit()
-            print(f"✅ Updated balance for user {user_id}: {amount}")
-            return True
+            return sender_balance
         except Exception as e:
             session.rollback()
-            print(f"❌ Error updating balance: {e}")
-            return False
+            print(f"❌ Error transferring: {e}")
+            raise
+        finally:
+            session.close()
+    
+    def record_results(self, results: List[Tuple[int, int, RoundResult]]):
+        """Cộng kết quả các ván không có tiền trả về (thua) vào player_stats trong một transaction"""
+        self.settle_many([], results=results)
+    
+    def get_top_balances(self, guild_id: int, limit: int) -> List[Tuple[int, int]]:
+        """`limit` (user_id, balance) có số dư cao nhất của guild"""
+        session = self.Session()
+        try:
+            return [tuple(row) for row in session.execute(
+                select(UserBalance.user_id, UserBalance.balance)
+                .where(UserBalance.guild_id == guild_id)
+                .order_by(UserBalance.balance.desc())
+                .limit(limit)
+            )]
+        finally:
+            session.close()
+    
+    def get_player_stats(self, user_id: int, guild_id: int) -> List[PlayerStats]:
+        """Thống kê theo từng game của user"""
+        session = self.Session()
+        try:
+            return session.query(PlayerStats).filter(
+                and_(PlayerStats.guild_id == guild_id, PlayerStats.user_id == user_id)
+            ).order_by(PlayerStats.game_type).all()
         finally:
             session.close()
     
-    def add_transaction(self, user_id: int, guild_id: int, amount: int, transaction_type: str, description: str):
+    def add_transaction(self, user_id: int, guild_id: int, amount: int, transaction_type: str, description: str,
+                        **ledger):
         """Thêm lịch sử giao dịch"""
         session = self.Session()
         try:
             transaction = TransactionHistory(
-                user_id=user_id,
-                guild_id=guild_id,
-                amount=amount,
-                transaction_type=transaction_type,
-                description=description
+                **ledger_row(user_id, guild_id, amount, transaction_type, description, **ledger)
             )
             session.add(transaction)
             session.commit()
@@ -108,8 +297,65 @@ class DatabaseManager:
         finally:
             session.close()
     
-    def save_active_game(self, user_id: int, guild_id: int, game_type: str, game_data: dict) -> int:
-        """Lưu game đang active"""
+    def add_transactions(self, rows: List[dict]):
+        """Ghi nhiều dòng lịch sử giao dịch bằng một lệnh executemany"""
+        if not rows:
+            return
+        session = self.Session()
+        try:
+            session.execute(insert(TransactionHistory), rows)
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            print(f"❌ Error adding transactions: {e}")
+            raise
+        finally:
+            session.close()
+    
+    def get_transactions(self, user_id: int, guild_id: int, before: Optional[Tuple[datetime.datetime, int]] = None,
+                         limit: int = 10) -> List[Tuple]:
+        """Một trang lịch sử mới nhất trước `before` = (created_at, id) của dòng cuối trang trước.
+        
+        Keyset theo (created_at, id) trên index ix_transaction_history_user_time:
+        trang nào cũng chỉ đọc `limit` dòng, không OFFSET. Mỗi dòng là
+        (id, created_at, amount, transaction_type, description, game_type, round_id).
+        """
+        session = self.Session()
+        try:
+            conditions = [TransactionHistory.guild_id == guild_id, TransactionHistory.user_id == user_id]
+            if before is not None:
+                conditions.append(tuple_(TransactionHistory.created_at, TransactionHistory.id) < tuple_(*before))
+            return [tuple(row) for row in session.execute(
+                select(TransactionHistory.id, TransactionHistory.created_at, TransactionHistory.amount,
+                       TransactionHistory.transaction_type, TransactionHistory.description,
+                       TransactionHistory.game_type, TransactionHistory.round_id)
+                .where(and_(*conditions))
+                .order_by(TransactionHistory.created_at.desc(), TransactionHistory.id.desc())
+                .limit(limit)
+            )]
+        finally:
+            session.close()
+    
+    def iter_transactions(self, guild_id: int, user_id: Optional[int] = None,
+                          batch_size: int = 1000) -> Iterator[Tuple]:
+        """Mọi dòng lịch sử của guild (hoặc một user) theo id tăng dần, đọc từng lô `batch_size` dòng"""
+        with self.engine.connect() as conn:
+            conditions = [TransactionHistory.guild_id == guild_id]
+            if user_id is not None:
+                conditions.append(TransactionHistory.user_id == user_id)
+            stmt = (
+                select(TransactionHistory.id, TransactionHistory.created_at, TransactionHistory.user_id,
+                       TransactionHistory.amount, TransactionHistory.transaction_type, TransactionHistory.game_type,
+                       TransactionHistory.round_id, TransactionHistory.bet, TransactionHistory.payout,
+                       TransactionHistory.description)
+                .where(and_(*conditions))
+                .order_by(TransactionHistory.id)
+            )
+            for row in conn.execution_options(yield_per=batch_size).execute(stmt):
+                yield tuple(row)
+    
+    def save_active_game(self, user_id: int, guild_id: int, game_type: str, game_data: str) -> int:
+        """Lưu game đang active (game_data là snapshot đã mã hóa)"""
         session = self.Session()
         try:
             # Xóa game cũ nếu có
@@ -121,7 +367,7 @@ class DatabaseManager:
                 user_id=user_id,
                 guild_id=guild_id,
                 game_type=game_type,
-                game_data=json.dumps(game_data)
+                game_data=game_data
             )
             session.add(game)
             session.commit()
@@ -129,17 +375,25 @@ class DatabaseManager:
         finally:
             session.close()
     
-    def get_active_game(self, user_id: int, guild_id: int) -> Optional[dict]:
-        """Lấy game đang active"""
+    def get_active_game(self, user_id: int, guild_id: int) -> Optional[Tuple[str, str]]:
+        """Lấy game đang active, trả về (game_type, game_data)"""
         session = self.Session()
         try:
             game = session.query(ActiveGame).filter(
                 and_(ActiveGame.user_id == user_id, ActiveGame.guild_id == guild_id)
             ).first()
-            return json.loads(game.game_data) if game else None
+            return (game.game_type, game.game_data) if game else None
         finally:
             session.close()
     
+    def get_all_active_games(self) -> List[Tuple[int, int, str, str, datetime.datetime]]:
+        """Mọi game đang active: (user_id, guild_id, game_type, game_data, thời điểm snapshot)"""
+        with self.engine.connect() as conn:
+            return [tuple(row) for row in conn.execute(
+                select(ActiveGame.user_id, ActiveGame.guild_id, ActiveGame.game_type,
+                       ActiveGame.game_data, ActiveGame.created_at)
+            )]
+    
     def delete_active_game(self, user_id: int, guild_id: int):
         """Xóa game active"""
         session = self.Session()
@@ -149,4 +403,145 @@ class DatabaseManager:
             ).delete()
             session.commit()
         finally:
-            session.close()
\ No newline at end of file
+            session.close()
+    
+    def sync_active_games(self, saves: List[Tuple[int, int, str, str]], deletes: List[Tuple[int, int]]):
+        """Ghi một lô snapshot (user_id, guild_id, game_type, game_data) và xóa game đã kết thúc trong một transaction"""
+        if not saves and not deletes:
+            return
+        session = self.Session()
+        try:
+            keys = [(user_id, guild_id) for user_id, guild_id, _, _ in saves] + list(deletes)
+            for user_id, guild_id in keys:
+                session.query(ActiveGame).filter(
+                    and_(ActiveGame.user_id == user_id, ActiveGame.guild_id == guild_id)
+                ).delete(synchronize_session=False)
+            
+            if saves:
+                session.execute(insert(ActiveGame), [
+                    {"user_id": user_id, "guild_id": guild_id, "game_type": game_type, "game_data": game_data}
+                    for user_id, guild_id, game_type, game_data in saves
+                ])
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            print(f"❌ Error syncing active games: {e}")
+            raise
+        finally:
+            session.close()
+    
+    def get_fair_seed(self, user_id: int, guild_id: int) -> Optional[Tuple[str, str, str, int]]:
+        """Cặp seed đang dùng: (server_seed, server_seed_hash, client_seed, nonce)"""
+        session = self.Session()
+        try:
+            seed = session.query(FairSeed).filter(
+                and_(FairSeed.guild_id == guild_id, FairSeed.user_id == user_id, FairSeed.active == True)
+            ).first()
+            return (seed.server_seed, seed.server_seed_hash, seed.client_seed, seed.nonce) if seed else None
+        finally:
+            session.close()
+    
+    def rotate_fair_seed(self, user_id: int, guild_id: int, server_seed: str, server_seed_hash: str,
+                         client_seed: str) -> Optional[Tuple[str, str, str, int]]:
+        """Công bố cặp seed đang dùng và chuyển sang cặp mới, trả về cặp cũ (nếu có)"""
+        session = self.Session()
+        try:
+            old = session.query(FairSeed).filter(
+                and_(FairSeed.guild_id == guild_id, FairSeed.user_id == user_id, FairSeed.active == True)
+            ).first()
+            revealed = None
+            if old:
+                old.active = False
+                old.revealed_at = datetime.datetime.utcnow()
+                revealed = (old.server_seed, old.server_seed_hash, old.client_seed, old.nonce)
+            
+            session.add(FairSeed(
+                user_id=user_id,
+                guild_id=guild_id,
+                server_seed=server_seed,
+                server_seed_hash=server_seed_hash,
+                client_seed=client_seed,
+                nonce=0
+            ))
+            session.commit()
+            return revealed
+        except Exception as e:
+            session.rollback()
+            print(f"❌ Error rotating fair seed: {e}")
+            raise
+        finally:
+            session.close()
+    
+    def reserve_fair_nonce(self, server_seed_hash: str) -> int:
+        """Giữ chỗ nonce kế tiếp của seed đang dùng, trả về nonce được giữ.
+
+        UPDATE chạy trước SELECT trong cùng transaction nên hai lần giữ chỗ
+        không bao giờ nhận cùng một nonce.
+        """
+        session = self.Session()
+        try:
+            bumped = session.execute(
+                update(FairSeed)
+                .where(and_(FairSeed.server_seed_hash == server_seed_hash, FairSeed.active == True))
+                .values(nonce=FairSeed.nonce + 1)
+            ).rowcount
+            if not bumped:
+                raise LookupError(f"fair seed {server_seed_hash[:12]} is no longer active")
+            nonce = session.execute(
+                select(FairSeed.nonce).where(FairSeed.server_seed_hash == server_seed_hash)
+            ).scalar_one()
+            session.commit()
+            return nonce - 1
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+    
+    def record_fair_round(self, user_id: int, guild_id: int, game_type: str, server_seed_hash: str,
+                          client_seed: str, nonce: int, outcome: str):
+        """Lưu một ván provably fair (nonce đã được giữ chỗ bằng reserve_fair_nonce)"""
+        session = self.Session()
+        try:
+            session.add(FairRound(
+                user_id=user_id,
+                guild_id=guild_id,
+                game_type=game_type,
+                server_seed_hash=server_seed_hash,
+                client_seed=client_seed,
+                nonce=nonce,
+                outcome=outcome
+            ))
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+    
+    def get_fair_rounds(self, after_id: int = 0, limit: int = 5000) -> List[Tuple[int, str, str, str, int, str]]:
+        """Một trang các ván (id, game_type, server_seed_hash, client_seed, nonce, outcome) theo id tăng dần"""
+        session = self.Session()
+        try:
+            return [tuple(row) for row in session.execute(
+                select(FairRound.id, FairRound.game_type, FairRound.server_seed_hash,
+                       FairRound.client_seed, FairRound.nonce, FairRound.outcome)
+                .where(FairRound.id > after_id)
+                .order_by(FairRound.id)
+                .limit(limit)
+            )]
+        finally:
+            session.close()
+    
+    def get_revealed_seeds(self, server_seed_hashes: List[str]) -> Dict[str, str]:
+        """Server seed đã công bố theo hash (seed còn đang dùng không được trả về)"""
+        if not server_seed_hashes:
+            return {}
+        session = self.Session()
+        try:
+            return dict(session.execute(
+                select(FairSeed.server_seed_hash, FairSeed.server_seed)
+                .where(and_(FairSeed.server_seed_hash.in_(server_seed_hashes), FairSeed.active == False))
+            ).all())
+        finally:
+            session.close()
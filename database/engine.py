@@ -0,0 +1,70 @@
+"""Tạo engine SQLAlchemy theo profile cấu hình.
+
+SQLite: các PRAGMA của profile được đặt cho mỗi connection mới.
+  default - giữ mặc định của SQLite (rollback journal, fsync mỗi commit)
+  durable - WAL, synchronous=FULL: reader không chặn writer, vẫn fsync mỗi commit
+  tuned   - WAL, synchronous=NORMAL: chỉ fsync khi checkpoint; crash hệ điều
+            hành có thể mất vài commit cuối nhưng database không bị hỏng
+Cả ba profile đều đặt busy_timeout để lệnh ghi đồng thời (job gộp ledger,
+đối soát) chờ lock thay vì lỗi "database is locked" ngay.
+
+Database server (Postgres, MySQL): QueuePool với DB_POOL_SIZE kết nối thường
+trực, thêm tối đa DB_MAX_OVERFLOW khi tải cao, kiểm tra kết nối trước khi dùng.
+"""
+from typing import Dict, Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+
+from config import config
+
+def _sqlite_pragmas(profile: str) -> Dict[str, object]:
+    pragmas: Dict[str, object] = {"busy_timeout": config.SQLITE_BUSY_TIMEOUT_MS}
+    if profile == "default":
+        return pragmas
+    pragmas.update({
+        "journal_mode": "WAL",
+        "synchronous": "FULL" if profile == "durable" else "NORMAL",
+        "mmap_size": config.SQLITE_MMAP_SIZE,
+        "cache_size": -config.SQLITE_CACHE_SIZE_KB,  # Số âm: đơn vị KiB
+        "temp_store": "MEMORY"
+    })
+    return pragmas
+
+ENGINE_PROFILES = ("default", "durable", "tuned")
+
+def make_engine(database_url: Optional[str] = None, profile: Optional[str] = None, **kwargs) -> Engine:
+    """Engine cho `database_url` (mặc định config.DATABASE_URL) theo `profile` (mặc định config.DB_PROFILE)"""
+    database_url = database_url or config.DATABASE_URL
+    profile = (profile or config.DB_PROFILE).lower()
+    if profile not in ENGINE_PROFILES:
+        raise ValueError(f"Unknown database profile: {profile}")
+
+    url = make_url(database_url)
+    if url.get_backend_name() != "sqlite":
+        options = {
+            "pool_size": config.DB_POOL_SIZE,
+            "max_overflow": config.DB_MAX_OVERFLOW,
+            "pool_timeout": config.DB_POOL_TIMEOUT,
+            "pool_recycle": config.DB_POOL_RECYCLE,
+            "pool_pre_ping": True
+        }
+        options.update(kwargs)
+        return create_engine(database_url, **options)
+
+    engine = create_engine(database_url, **kwargs)
+    pragmas = _sqlite_pragmas(profile)
+    if url.database in (None, "", ":memory:"):
+        # Database trong bộ nhớ không có WAL/mmap
+        pragmas = {"busy_timeout": pragmas["busy_timeout"]}
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+    return engine
@@ -0,0 +1,119 @@
+import asyncio
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from games.provably_fair import (
+    FairPool, FairRoundRecord, VerifyReport, hash_seed, new_client_seed, new_server_seed,
+    outcome_text, round_ref, verify_rounds
+)
+from config import config
+
+SeedKey = Tuple[int, int]  # (user_id, guild_id)
+
+class _SeedPair:
+    __slots__ = ("server_seed", "server_seed_hash", "client_seed", "nonce")
+
+    def __init__(self, server_seed: str, server_seed_hash: str, client_seed: str, nonce: int):
+        self.server_seed = server_seed
+        self.server_seed_hash = server_seed_hash
+        self.client_seed = client_seed
+        self.nonce = nonce  # Nonce của ván kế tiếp
+
+class FairSeedStore:
+    """Cặp seed provably fair của từng người chơi, cache trong bộ nhớ.
+
+    Cặp seed được tạo ở ván đầu tiên. next_pool() giữ chỗ nonce trong database
+    trước khi ván được chơi, nên nonce đã dùng không bao giờ bị cấp lại kể cả
+    khi cặp seed bị đẩy khỏi cache hoặc bot khởi động lại; không giữ chỗ được
+    thì ván thất bại trước khi trừ tiền. record() lưu kết quả ván.
+    """
+
+    def __init__(self, db, max_entries: Optional[int] = None):
+        self.db = db
+        self.max_entries = max_entries or config.BALANCE_CACHE_SIZE
+        self._seeds: "OrderedDict[SeedKey, _SeedPair]" = OrderedDict()
+
+    async def _get(self, user_id: int, guild_id: int) -> _SeedPair:
+        key = (user_id, guild_id)
+        pair = self._seeds.get(key)
+        if pair is not None:
+            self._seeds.move_to_end(key)
+            return pair
+
+        async with self.db.user_lock(user_id, guild_id):
+            pair = self._seeds.get(key)
+            if pair is None:
+                row = await self.db.get_fair_seed(user_id, guild_id)
+                if row is None:
+                    await self.rotate(user_id, guild_id)
+                    return self._seeds[key]
+                pair = self._remember(key, _SeedPair(*row))
+            return pair
+
+    def _remember(self, key: SeedKey, pair: _SeedPair) -> _SeedPair:
+        self._seeds[key] = pair
+        self._seeds.move_to_end(key)
+        while len(self._seeds) > self.max_entries:
+            self._seeds.popitem(last=False)
+        return pair
+
+    async def commitment(self, user_id: int, guild_id: int) -> Tuple[str, str, int]:
+        """(server_seed_hash, client_seed, nonce kế tiếp) để người chơi lưu lại trước khi chơi"""
+        pair = await self._get(user_id, guild_id)
+        return pair.server_seed_hash, pair.client_seed, pair.nonce
+
+    async def next_pool(self, user_id: int, guild_id: int) -> FairPool:
+        """Nguồn ngẫu nhiên cho ván kế tiếp của người chơi"""
+        pair = await self._get(user_id, guild_id)
+        try:
+            nonce = await self.db.reserve_fair_nonce(pair.server_seed_hash)
+        except Exception as e:
+            # Seed đã bị đổi ở nơi khác: lần sau đọc lại từ database
+            self._seeds.pop((user_id, guild_id), None)
+            print(f"❌ Error reserving fair nonce for {user_id}: {e}")
+            raise
+        pair.nonce = nonce + 1
+        return FairPool(pair.server_seed, pair.client_seed, nonce, server_seed_hash=pair.server_seed_hash)
+
+    async def record(self, user_id: int, guild_id: int, game_type: str, pool: FairPool, game):
+        """Lưu kết quả ván đã chơi với `pool`; lỗi ghi được báo cho lệnh gọi thay vì hiện kết quả không kiểm chứng được"""
+        try:
+            await self.db.record_fair_round(
+                user_id, guild_id, game_type, pool.server_seed_hash, pool.client_seed, pool.nonce, outcome_text(game)
+            )
+        except Exception as e:
+            print(f"❌ Error recording fair round {round_ref(pool)}: {e}")
+            raise
+
+    async def rotate(self, user_id: int, guild_id: int,
+                     client_seed: Optional[str] = None) -> Optional[Tuple[str, str, str, int]]:
+        """Đổi sang cặp seed mới; trả về cặp cũ đã công bố (server_seed, hash, client_seed, số ván)"""
+        server_seed = new_server_seed()
+        pair = _SeedPair(server_seed, hash_seed(server_seed), client_seed or new_client_seed(), 0)
+        async with self.db.user_lock(user_id, guild_id):
+            revealed = await self.db.rotate_fair_seed(
+                user_id, guild_id, pair.server_seed, pair.server_seed_hash, pair.client_seed
+            )
+            self._remember((user_id, guild_id), pair)
+        return revealed
+
+    async def verify_history(self, batch_size: int = 5000) -> VerifyReport:
+        """Kiểm tra lại mọi ván đã lưu có server seed đã công bố.
+
+        Chạy trên thread riêng thay vì executor DB: tính lại HMAC của cả bảng
+        mất nhiều giây và không được chặn các lệnh settle đang xếp hàng.
+        """
+        return await asyncio.to_thread(verify_history, self.db.sync, batch_size)
+
+def verify_history(sync_db, batch_size: int = 5000) -> VerifyReport:
+    """Đọc bảng fair_rounds theo từng trang id và kiểm tra bằng verify_rounds (chạy ngoài event loop)"""
+    report = VerifyReport()
+    after_id = 0
+    while True:
+        rows: List[tuple] = sync_db.get_fair_rounds(after_id, batch_size)
+        if not rows:
+            return report
+        records = [FairRoundRecord(*row) for row in rows]
+        seeds = sync_db.get_revealed_seeds(list({record.server_seed_hash for record in records}))
+        verify_rounds(records, seeds, report)
+        after_id = records[-1].id
@@ -0,0 +1,48 @@
+import time
+from typing import Dict, Iterable, Optional
+
+from .models import GuildConfig
+from config import config
+
+class GuildConfigCache:
+    """Cache cấu hình guild trong bộ nhớ để get_prefix không phải query database.
+
+    Được nạp toàn bộ lúc setup_hook, nên guild không có trong cache nghĩa là
+    chưa đăng ký và dùng prefix mặc định. Các command thay đổi cấu hình làm
+    mới từng guild qua AsyncDatabaseManager.refresh_guild_config; nếu
+    GUILD_CONFIG_TTL > 0 thì toàn bộ cache được nạp lại định kỳ.
+    """
+
+    def __init__(self, ttl: Optional[float] = None):
+        self.ttl = config.GUILD_CONFIG_TTL if ttl is None else ttl
+        self._configs: Dict[int, GuildConfig] = {}
+        self._prefixes: Dict[int, str] = {}
+        self.loaded = False
+        self.loaded_at = 0.0
+
+    def load_all(self, configs: Iterable[GuildConfig]):
+        """Thay toàn bộ cache bằng danh sách cấu hình mới"""
+        self._configs = {c.guild_id: c for c in configs}
+        self._prefixes = {guild_id: c.prefix or config.DEFAULT_PREFIX for guild_id, c in self._configs.items()}
+        self.loaded = True
+        self.loaded_at = time.monotonic()
+
+    def get(self, guild_id: int) -> Optional[GuildConfig]:
+        return self._configs.get(guild_id)
+
+    def prefix(self, guild_id: int) -> str:
+        """Prefix của guild, O(1)"""
+        return self._prefixes.get(guild_id, config.DEFAULT_PREFIX)
+
+    def set(self, guild_config: GuildConfig):
+        """Cập nhật cấu hình một guild"""
+        self._configs[guild_config.guild_id] = guild_config
+        self._prefixes[guild_config.guild_id] = guild_config.prefix or config.DEFAULT_PREFIX
+
+    def invalidate(self, guild_id: int):
+        """Xóa cấu hình một guild khỏi cache"""
+        self._configs.pop(guild_id, None)
+        self._prefixes.pop(guild_id, None)
+
+    def __len__(self) -> int:
+        return len(self._configs)
@@ -0,0 +1,45 @@
+import csv
+import io
+import tempfile
+from itertools import islice
+from typing import BinaryIO, Optional, Tuple
+
+# Cột của file CSV, theo thứ tự của DatabaseManager.iter_transactions
+HISTORY_CSV_COLUMNS = (
+    "id", "created_at", "user_id", "amount", "transaction_type", "game_type", "round_id", "bet", "payout", "description"
+)
+
+# File nhỏ nằm trong bộ nhớ, lớn hơn thì tự chuyển sang file tạm trên đĩa
+SPOOL_MAX_MEMORY = 8 * 1024 * 1024
+
+def export_csv(sync_db, guild_id: int, user_id: Optional[int] = None,
+               batch_size: int = 1000) -> Tuple[BinaryIO, int, int]:
+    """Ghi lịch sử giao dịch ra CSV (chạy trên thread DB), trả về (file đã seek về đầu, số dòng, số byte).
+
+    Các dòng được đọc từng lô bằng yield_per; mỗi lô được ghi thành CSV trong
+    bộ nhớ rồi nối vào file, không giữ cả bảng trong bộ nhớ.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(HISTORY_CSV_COLUMNS)
+    count = 0
+    rows = sync_db.iter_transactions(guild_id, user_id, batch_size)
+    try:
+        while True:
+            batch = list(islice(rows, batch_size))
+            writer.writerows(batch)
+            spool.write(buffer.getvalue().encode("utf-8"))
+            buffer.seek(0)
+            buffer.truncate()
+            count += len(batch)
+            if len(batch) < batch_size:
+                break
+    except Exception:
+        spool.close()
+        raise
+    finally:
+        rows.close()
+    size = spool.tell()
+    spool.seek(0)
+    return spool, count, size
@@ -0,0 +1,122 @@
+import asyncio
+import heapq
+from operator import itemgetter
+from typing import Dict, List, Optional, Tuple
+
+from config import config
+
+Entry = Tuple[int, int]  # (user_id, balance)
+
+class GuildBoard:
+    """Top số dư của một guild, giữ trong bộ nhớ và cập nhật theo từng lần settle.
+
+    Chỉ giữ `capacity` user có số dư cao nhất (lớn hơn số dòng cần hiển thị)
+    cùng một cận trên `outside_max` cho số dư của mọi user nằm ngoài. Một min-heap
+    (xóa lười) cho biết user thấp nhất để đẩy ra khi có người mới vượt lên.
+    Top-N chỉ đúng khi N người đứng đầu đều >= outside_max; nếu người đứng đầu
+    thua xuống dưới cận đó thì nạp lại từ database (một truy vấn theo index).
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.balances: Dict[int, int] = {}
+        self._heap: List[Tuple[int, int]] = []  # (balance, user_id), có thể chứa mục đã cũ
+        self.outside_max: Optional[int] = None  # None: mọi user của guild đều có trong balances
+        self.loaded = False
+        self.reloads = 0
+        self.lock = asyncio.Lock()
+        self._pending: Optional[List[Entry]] = None
+
+    def update(self, user_id: int, balance: int):
+        """Số dư mới của một user (gọi sau khi đã commit)"""
+        if self._pending is not None:
+            # Đang nạp: áp dụng sau khi có kết quả để không bị ghi đè bởi dữ liệu cũ
+            self._pending.append((user_id, balance))
+            return
+        if not self.loaded:
+            return
+
+        if user_id in self.balances:
+            self.balances[user_id] = balance
+            self._push(user_id, balance)
+            return
+
+        if len(self.balances) < self.capacity:
+            self.balances[user_id] = balance
+            self._push(user_id, balance)
+            return
+
+        lowest_balance, lowest_user = self._lowest()
+        if balance > lowest_balance:
+            del self.balances[lowest_user]
+            self.balances[user_id] = balance
+            self._push(user_id, balance)
+            self._raise_outside(lowest_balance)
+        else:
+            self._raise_outside(balance)
+
+    def top(self, limit: int) -> Optional[List[Entry]]:
+        """`limit` user đứng đầu, None nếu cần nạp lại"""
+        if not self.loaded:
+            return None
+        entries = heapq.nlargest(limit, self.balances.items(), key=itemgetter(1))
+        if self.outside_max is not None and (len(entries) < limit or entries[-1][1] < self.outside_max):
+            return None
+        return entries
+
+    def begin_load(self):
+        self._pending = []
+
+    def finish_load(self, rows: List[Entry]):
+        """Thay bằng top `capacity` đọc từ database rồi áp dụng các cập nhật đến trong lúc nạp"""
+        pending, self._pending = self._pending or [], None
+        self.balances = dict(rows)
+        self._heap = [(balance, user_id) for user_id, balance in rows]
+        heapq.heapify(self._heap)
+        self.outside_max = rows[-1][1] if len(rows) >= self.capacity else None
+        self.loaded = True
+        self.reloads += 1
+        for user_id, balance in pending:
+            self.update(user_id, balance)
+
+    def abort_load(self):
+        self._pending = None
+
+    def _push(self, user_id: int, balance: int):
+        heapq.heappush(self._heap, (balance, user_id))
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(b, u) for u, b in self.balances.items()]
+            heapq.heapify(self._heap)
+
+    def _lowest(self) -> Tuple[int, int]:
+        while True:
+            balance, user_id = self._heap[0]
+            if self.balances.get(user_id) == balance:
+                return balance, user_id
+            heapq.heappop(self._heap)
+
+    def _raise_outside(self, balance: int):
+        if self.outside_max is None or balance > self.outside_max:
+            self.outside_max = balance
+
+class Leaderboard:
+    """GuildBoard của từng guild, nạp lười ở lần xem đầu tiên"""
+
+    def __init__(self, capacity: Optional[int] = None):
+        self.capacity = capacity or config.LEADERBOARD_CAPACITY
+        self._boards: Dict[int, GuildBoard] = {}
+
+    def board(self, guild_id: int) -> GuildBoard:
+        board = self._boards.get(guild_id)
+        if board is None:
+            board = self._boards[guild_id] = GuildBoard(self.capacity)
+        return board
+
+    def update(self, user_id: int, guild_id: int, balance: int):
+        board = self._boards.get(guild_id)
+        if board is not None:
+            board.update(user_id, balance)
+
+    def forget(self, guild_id: int):
+        """Bỏ bảng của guild (số dư bị sửa ngoài settle), lần xem sau nạp lại"""
+        self._boards.pop(guild_id, None)
@@ -0,0 +1,81 @@
+"""Các cột có cấu trúc của lịch sử giao dịch (game_type, round_id, bet, payout).
+
+Mỗi dòng thỏa amount = payout - bet: dòng trừ cược có bet, dòng trả thưởng
+có payout, ván chơi một lần (Bầu Cua, Xóc Đĩa) có cả hai. Các dòng của cùng
+một ván có chung round_id. Giao dịch không phải game để trống các cột này.
+"""
+import re
+from typing import Dict, Optional, Tuple
+
+# Giá trị của transaction_history.game_type
+LEDGER_GAME_TYPES = ("blackjack", "blackjack_table", "bau_cua", "xoc_dia")
+
+LEDGER_COLUMNS = ("game_type", "round_id", "bet", "payout")
+
+# Cột được thêm vào bảng transaction_history cũ (ensure_ledger_schema)
+ADDED_COLUMNS = LEDGER_COLUMNS + ("merged_rows",)
+
+# transaction_type của dòng ghi số dư khởi đầu khi tạo tài khoản
+OPENING_TYPE = "opening"
+
+def ledger_row(user_id: int, guild_id: int, amount: int, transaction_type: str, description: str,
+               game_type: Optional[str] = None, round_id: Optional[str] = None,
+               bet: Optional[int] = None, payout: Optional[int] = None) -> dict:
+    """Một dòng transaction_history; mọi dòng có đủ các key để ghi bằng executemany"""
+    if game_type is not None and game_type not in LEDGER_GAME_TYPES:
+        raise ValueError(f"Unknown ledger game type: {game_type}")
+    return {
+        "user_id": user_id,
+        "guild_id": guild_id,
+        "amount": amount,
+        "transaction_type": transaction_type,
+        "description": description,
+        "game_type": game_type,
+        "round_id": round_id,
+        "bet": bet,
+        "payout": payout
+    }
+
+# Tiền tố description -> game_type, tiền tố dài hơn được xét trước
+_GAME_PREFIXES = (
+    ("Blackjack table", "blackjack_table"),
+    ("Blackjack", "blackjack"),
+    ("Bau Cua", "bau_cua"),
+    ("Xoc Dia", "xoc_dia")
+)
+_BET_RE = re.compile(r"\b(?:bet|double|split): (\d+)")
+_PAYOUT_RE = re.compile(r"\b(?:win|refund): (\d+)")
+_FAIR_RE = re.compile(r"\bfair: (\S+)")
+
+def parse_description(description: str) -> Optional[Tuple[str, Optional[str], int, int]]:
+    """Đọc (game_type, round_id, bet, payout) từ description dạng cũ.
+
+    Hiểu các dạng đã từng ghi: "Blackjack bet: 100", "Blackjack win: 250",
+    "Bau Cua bet: 100, win: 200, fair: <mã>", "Xoc Dia win: 200",
+    "Bau Cua autoplay: 50 rounds, bet: 5000, win: 4800, ...". None nếu
+    không phải dòng game.
+    """
+    for prefix, game_type in _GAME_PREFIXES:
+        if description.startswith(prefix):
+            break
+    else:
+        return None
+
+    bet = _BET_RE.search(description)
+    payout = _PAYOUT_RE.search(description)
+    if bet is None and payout is None:
+        return None
+    fair = _FAIR_RE.search(description)
+    return (
+        game_type,
+        fair.group(1).rstrip(",") if fair else None,
+        int(bet.group(1)) if bet else 0,
+        int(payout.group(1)) if payout else 0
+    )
+
+def parsed_columns(description: str) -> Dict[str, Optional[object]]:
+    """Các cột ledger suy ra từ description (None hết nếu không đọc được)"""
+    parsed = parse_description(description)
+    if parsed is None:
+        return dict.fromkeys(LEDGER_COLUMNS)
+    return dict(zip(LEDGER_COLUMNS, parsed))
@@ -0,0 +1,237 @@
+"""Gộp và lưu trữ các dòng transaction_history cũ.
+
+    python -m database.ledger_compaction [--days 90] [--batch-size 2000] [--dry-run]
+
+Các dòng cũ hơn LEDGER_COMPACTION_DAYS ngày (tính tới 0h UTC) được chuyển ra
+file lưu trữ JSONL nén gzip theo tháng (<LEDGER_ARCHIVE_DIR>/transaction_history-YYYY-MM.jsonl.gz)
+và thay bằng một dòng tổng hợp cho mỗi (guild, user, ngày): transaction_type
+"summary", created_at là 0h của ngày đó, amount/bet/payout là tổng của các
+dòng đã gộp và merged_rows là số dòng đã gộp. Tổng amount của mỗi user không
+đổi nên đối soát số dư vẫn đúng. Dòng "opening" không bao giờ bị gộp: đối
+soát dựa vào nó để phân biệt user thiếu số dư khởi đầu.
+
+Mỗi lô id tăng dần chạy trong một transaction ngắn (ghi file lưu trữ, cộng
+vào dòng tổng hợp, xóa dòng gốc) nên bot vẫn ghi được giữa các lô; chạy lại
+được bất kỳ lúc nào. File lưu trữ được fsync trước khi xóa dòng gốc: nếu bị
+ngắt giữa hai bước, lô đó được lưu trữ lại ở lần chạy sau và file có thể
+chứa dòng trùng id (đọc bằng read_archive thì bỏ trùng).
+"""
+import argparse
+import datetime
+import gzip
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import and_, bindparam, delete, insert, select
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.engine import make_engine
+from database.ledger import OPENING_TYPE
+from database.models import TransactionHistory
+from config import config
+
+SUMMARY_TYPE = "summary"
+# Các dòng không bao giờ bị gộp
+KEPT_TYPES = (SUMMARY_TYPE, OPENING_TYPE)
+
+ARCHIVE_COLUMNS = (
+    "id", "user_id", "guild_id", "amount", "transaction_type", "description", "created_at",
+    "game_type", "round_id", "bet", "payout"
+)
+
+SummaryKey = Tuple[int, int, datetime.date]  # (guild_id, user_id, ngày)
+
+class _Summary:
+    __slots__ = ("count", "amount", "bet", "payout")
+
+    def __init__(self):
+        self.count = 0
+        self.amount = 0
+        self.bet: Optional[int] = None
+        self.payout: Optional[int] = None
+
+    def add(self, amount: int, bet: Optional[int], payout: Optional[int], count: int = 1):
+        self.count += count
+        self.amount += amount
+        if bet is not None:
+            self.bet = (self.bet or 0) + bet
+        if payout is not None:
+            self.payout = (self.payout or 0) + payout
+
+def compaction_cutoff(days: int, now: Optional[datetime.datetime] = None) -> datetime.datetime:
+    """Mốc 0h UTC `days` ngày trước: cả ngày được gộp cùng lúc, không bị cắt đôi"""
+    today = (now or datetime.datetime.utcnow()).date()
+    return datetime.datetime.combine(today - datetime.timedelta(days=days), datetime.time())
+
+def archive_path(archive_dir: str, month: str) -> str:
+    return os.path.join(archive_dir, f"transaction_history-{month}.jsonl.gz")
+
+def summary_description(day: datetime.date, summary: _Summary) -> str:
+    text = f"Tổng hợp {day.isoformat()}: {summary.count} giao dịch"
+    if summary.bet is not None or summary.payout is not None:
+        text += f", bet: {summary.bet or 0}, win: {summary.payout or 0}"
+    return text
+
+def _write_archives(archive_dir: str, rows: List[dict]):
+    """Nối các dòng vào file của tháng tương ứng (mỗi lần ghi là một gzip member) và fsync"""
+    by_month: Dict[str, List[dict]] = defaultdict(list)
+    for row in rows:
+        by_month[row["created_at"].strftime("%Y-%m")].append(row)
+
+    for month, month_rows in by_month.items():
+        payload = "".join(
+            json.dumps(dict(row, created_at=row["created_at"].isoformat()), ensure_ascii=False) + "\n"
+            for row in month_rows
+        ).encode("utf-8")
+        with open(archive_path(archive_dir, month), "ab") as f:
+            f.write(gzip.compress(payload))
+            f.flush()
+            os.fsync(f.fileno())
+
+def _merge_summaries(conn, summaries: Dict[SummaryKey, _Summary]):
+    """Cộng vào dòng tổng hợp đã có của (guild, user, ngày) hoặc tạo mới"""
+    table = TransactionHistory.__table__
+    # Một truy vấn cho cả lô: dòng tổng hợp của các user trong lô, trong khoảng ngày của lô
+    days = [day for _, _, day in summaries]
+    existing = {}
+    for row in conn.execute(
+        select(table.c.id, table.c.guild_id, table.c.user_id, table.c.created_at,
+               table.c.amount, table.c.bet, table.c.payout, table.c.merged_rows)
+        .where(and_(
+            table.c.guild_id.in_({guild_id for guild_id, _, _ in summaries}),
+            table.c.user_id.in_({user_id for _, user_id, _ in summaries}),
+            table.c.created_at >= datetime.datetime.combine(min(days), datetime.time()),
+            table.c.created_at <= datetime.datetime.combine(max(days), datetime.time()),
+            table.c.transaction_type == SUMMARY_TYPE
+        ))
+    ):
+        key = (row.guild_id, row.user_id, row.created_at.date())
+        if key in summaries:
+            existing[key] = row
+
+    updates, inserts = [], []
+    for key, summary in summaries.items():
+        guild_id, user_id, day = key
+        row = existing.get(key)
+        if row is not None:
+            summary.add(row.amount, row.bet, row.payout, row.merged_rows or 0)
+            updates.append({
+                "row_id": row.id,
+                "new_amount": summary.amount,
+                "new_bet": summary.bet,
+                "new_payout": summary.payout,
+                "new_merged_rows": summary.count,
+                "new_description": summary_description(day, summary)
+            })
+        else:
+            inserts.append({
+                "user_id": user_id,
+                "guild_id": guild_id,
+                "amount": summary.amount,
+                "transaction_type": SUMMARY_TYPE,
+                "description": summary_description(day, summary),
+                "created_at": datetime.datetime.combine(day, datetime.time()),
+                "game_type": None,
+                "round_id": None,
+                "bet": summary.bet,
+                "payout": summary.payout,
+                "merged_rows": summary.count
+            })
+
+    if updates:
+        conn.execute(
+            table.update().where(table.c.id == bindparam("row_id")).values(
+                amount=bindparam("new_amount"),
+                bet=bindparam("new_bet"),
+                payout=bindparam("new_payout"),
+                merged_rows=bindparam("new_merged_rows"),
+                description=bindparam("new_description")
+            ),
+            updates
+        )
+    if inserts:
+        conn.execute(insert(table), inserts)
+
+def compact(engine, days: Optional[int] = None, archive_dir: Optional[str] = None, batch_size: int = 2000,
+            dry_run: bool = False, pause: float = 0.0, verbose: bool = True) -> Tuple[int, int]:
+    """Gộp các dòng cũ hơn `days` ngày, trả về (số dòng đã lưu trữ, số nhóm (guild, user, ngày))"""
+    days = config.LEDGER_COMPACTION_DAYS if days is None else days
+    archive_dir = archive_dir or config.LEDGER_ARCHIVE_DIR
+    cutoff = compaction_cutoff(days)
+    table = TransactionHistory.__table__
+    columns = [table.c[name] for name in ARCHIVE_COLUMNS]
+    if not dry_run:
+        os.makedirs(archive_dir, exist_ok=True)
+
+    archived = groups = 0
+    last_id = 0
+    start = time.perf_counter()
+    while True:
+        with engine.begin() as conn:
+            rows = [dict(row._mapping) for row in conn.execute(
+                select(*columns)
+                .where(and_(
+                    table.c.id > last_id,
+                    table.c.created_at < cutoff,
+                    table.c.transaction_type.notin_(KEPT_TYPES)
+                ))
+                .order_by(table.c.id)
+                .limit(batch_size)
+            )]
+            if not rows:
+                break
+
+            summaries: Dict[SummaryKey, _Summary] = defaultdict(_Summary)
+            for row in rows:
+                summaries[(row["guild_id"], row["user_id"], row["created_at"].date())].add(
+                    row["amount"], row["bet"], row["payout"]
+                )
+
+            if not dry_run:
+                _write_archives(archive_dir, rows)
+                _merge_summaries(conn, summaries)
+                conn.execute(delete(table).where(table.c.id.in_([row["id"] for row in rows])))
+
+        last_id = rows[-1]["id"]
+        archived += len(rows)
+        groups += len(summaries)
+        if verbose:
+            print(f"  ... id <= {last_id}: {archived:,} dòng đã lưu trữ "
+                  f"({archived / (time.perf_counter() - start):,.0f} dòng/s)")
+        if pause:
+            # Nhường lock cho bot giữa các lô
+            time.sleep(pause)
+    return archived, groups
+
+def read_archive(path: str) -> Iterator[dict]:
+    """Đọc lại một file lưu trữ (mọi gzip member), bỏ các dòng trùng id"""
+    seen = set()
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            row = json.loads(line)
+            if row["id"] in seen:
+                continue
+            seen.add(row["id"])
+            row["created_at"] = datetime.datetime.fromisoformat(row["created_at"])
+            yield row
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=config.DATABASE_URL)
+    parser.add_argument("--days", type=int, default=config.LEDGER_COMPACTION_DAYS)
+    parser.add_argument("--archive-dir", default=config.LEDGER_ARCHIVE_DIR)
+    parser.add_argument("--batch-size", type=int, default=2000)
+    parser.add_argument("--pause", type=float, default=0.05, help="Nghỉ (giây) giữa các lô")
+    parser.add_argument("--dry-run", action="store_true", help="Chỉ đếm, không ghi")
+    args = parser.parse_args()
+
+    engine = make_engine(args.database_url)
+    archived, groups = compact(engine, args.days, args.archive_dir, args.batch_size, args.dry_run, args.pause)
+    print(f"✅ Xong: {archived:,} dòng {'sẽ được ' if args.dry_run else ''}gộp thành {groups:,} nhóm (guild, user, ngày)")
+    engine.dispose()
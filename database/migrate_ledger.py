@@ -0,0 +1,110 @@
+"""Chuyển transaction_history sang ledger có cấu trúc.
+
+    python -m database.migrate_ledger [--batch-size 5000] [--dry-run]
+
+Thêm các cột game_type/round_id/bet/payout và index còn thiếu, rồi đọc các
+dòng game cũ theo từng lô id tăng dần (không nạp cả bảng vào bộ nhớ), parse
+description và cập nhật mỗi lô bằng một lệnh executemany trong transaction
+riêng. Chạy lại được bất kỳ lúc nào: chỉ xét dòng game chưa có game_type.
+"""
+import argparse
+import os
+import sys
+import time
+from typing import List, Tuple
+
+from sqlalchemy import and_, bindparam, inspect, select
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.ledger import ADDED_COLUMNS, parse_description
+from database.engine import make_engine
+from database.models import TransactionHistory
+from config import config
+
+def ensure_ledger_schema(engine) -> List[str]:
+    """Thêm cột và index ledger vào bảng đã tồn tại, trả về tên các cột vừa thêm"""
+    table = TransactionHistory.__table__
+    existing = {column["name"] for column in inspect(engine).get_columns(table.name)}
+    added = []
+    with engine.begin() as conn:
+        for name in ADDED_COLUMNS:
+            if name not in existing:
+                column_type = table.c[name].type.compile(dialect=engine.dialect)
+                conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {name} {column_type}")
+                added.append(name)
+    for index in table.indexes:
+        index.create(engine, checkfirst=True)
+    return added
+
+def backfill(engine, batch_size: int = 5000, dry_run: bool = False, verbose: bool = True) -> Tuple[int, int]:
+    """Điền cột ledger từ description cho các dòng game cũ, trả về (số dòng đã đọc, số dòng cập nhật)"""
+    table = TransactionHistory.__table__
+    update_stmt = (
+        table.update()
+        .where(table.c.id == bindparam("row_id"))
+        .values(
+            game_type=bindparam("new_game_type"),
+            round_id=bindparam("new_round_id"),
+            bet=bindparam("new_bet"),
+            payout=bindparam("new_payout")
+        )
+    )
+
+    scanned = updated = 0
+    last_id = 0
+    start = time.perf_counter()
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                select(table.c.id, table.c.description)
+                .where(and_(
+                    table.c.id > last_id,
+                    table.c.transaction_type == "game",
+                    table.c.game_type.is_(None)
+                ))
+                .order_by(table.c.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+
+            params = []
+            for row_id, description in rows:
+                parsed = parse_description(description)
+                if parsed is None:
+                    continue
+                game_type, round_id, bet, payout = parsed
+                params.append({
+                    "row_id": row_id,
+                    "new_game_type": game_type,
+                    "new_round_id": round_id,
+                    "new_bet": bet,
+                    "new_payout": payout
+                })
+            if params and not dry_run:
+                conn.execute(update_stmt, params)
+
+        last_id = rows[-1].id
+        scanned += len(rows)
+        updated += len(params)
+        if verbose:
+            print(f"  ... id <= {last_id}: {scanned:,} dòng đã đọc, {updated:,} dòng cập nhật "
+                  f"({scanned / (time.perf_counter() - start):,.0f} dòng/s)")
+    return scanned, updated
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=config.DATABASE_URL)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--dry-run", action="store_true", help="Chỉ parse, không ghi")
+    args = parser.parse_args()
+
+    engine = make_engine(args.database_url)
+    added = ensure_ledger_schema(engine)
+    if added:
+        print(f"✅ Đã thêm cột: {', '.join(added)}")
+    scanned, updated = backfill(engine, args.batch_size, args.dry_run)
+    print(f"✅ Xong: {scanned:,} dòng game đã đọc, {updated:,} dòng {'sẽ được ' if args.dry_run else ''}cập nhật")
+    engine.dispose()
@@ -1,8 +1,10 @@
-from sqlalchemy import Column, Integer, String, BigInteger, Boolean, DateTime, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, BigInteger, Boolean, DateTime, Text, ForeignKey, Index, Enum, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 import datetime
 
+from .ledger import LEDGER_GAME_TYPES
+
 Base = declarative_base()
 
 class GuildConfig(Base):
@@ -24,6 +26,13 @@ class UserBalance(Base):
     balance = Column(Integer, default=1000)
     last_daily = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    
+    __table_args__ = (
+        # Tra số dư theo user khi settle, và đối soát theo thứ tự (guild_id, user_id)
+        Index('ix_user_balances_user', 'guild_id', 'user_id'),
+        # Bảng xếp hạng: top số dư của một guild đọc thẳng theo index
+        Index('ix_user_balances_guild_balance', 'guild_id', 'balance'),
+    )
 
 class TransactionHistory(Base):
     __tablename__ = 'transaction_history'
@@ -35,6 +44,18 @@ class TransactionHistory(Base):
     transaction_type = Column(String(50), nullable=False)  # 'game', 'transfer', 'admin'
     description = Column(Text, nullable=False)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    # Cột có cấu trúc (xem database/ledger.py), để trống với giao dịch không phải game
+    game_type = Column(Enum(*LEDGER_GAME_TYPES, name='ledger_game_type', native_enum=False, length=20), nullable=True)
+    round_id = Column(String(32), nullable=True)
+    bet = Column(Integer, nullable=True)
+    payout = Column(Integer, nullable=True)
+    # Dòng "summary" (database/ledger_compaction.py): số giao dịch gốc đã gộp vào
+    merged_rows = Column(Integer, nullable=True)
+    
+    __table_args__ = (
+        Index('ix_transaction_history_user_time', 'guild_id', 'user_id', 'created_at', 'id'),
+        Index('ix_transaction_history_round', 'round_id'),
+    )
 
 class ActiveGame(Base):
     __tablename__ = 'active_games'
@@ -44,4 +65,57 @@ class ActiveGame(Base):
     guild_id = Column(BigInteger, nullable=False)
     game_type = Column(String(50), nullable=False)  # 'blackjack', 'bau_cua', 'xoc_dia'
     game_data = Column(Text, nullable=False)  # JSON data
-    created_at = Column(DateTime, default=datetime.datetime.utcnow)
\ No newline at end of file
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+class FairSeed(Base):
+    __tablename__ = 'fair_seeds'
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(BigInteger, nullable=False)
+    guild_id = Column(BigInteger, nullable=False)
+    server_seed = Column(String(64), nullable=False)  # Bí mật cho tới khi đổi seed
+    server_seed_hash = Column(String(64), nullable=False, unique=True)
+    client_seed = Column(String(64), nullable=False)
+    nonce = Column(Integer, default=0)  # Nonce của ván kế tiếp
+    active = Column(Boolean, default=True)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    revealed_at = Column(DateTime, nullable=True)
+    
+    __table_args__ = (Index('ix_fair_seeds_user', 'guild_id', 'user_id', 'active'),)
+
+class FairRound(Base):
+    __tablename__ = 'fair_rounds'
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(BigInteger, nullable=False)
+    guild_id = Column(BigInteger, nullable=False)
+    game_type = Column(String(50), nullable=False)  # 'bau_cua', 'xoc_dia'
+    server_seed_hash = Column(String(64), nullable=False, index=True)
+    client_seed = Column(String(64), nullable=False)
+    nonce = Column(Integer, nullable=False)
+    outcome = Column(String(64), nullable=False)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+class PlayerStats(Base):
+    __tablename__ = 'player_stats'
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(BigInteger, nullable=False)
+    guild_id = Column(BigInteger, nullable=False)
+    game_type = Column(Enum(*LEDGER_GAME_TYPES, name='ledger_game_type', native_enum=False, length=20), nullable=False)
+    rounds = Column(Integer, nullable=False, default=0)
+    wins = Column(Integer, nullable=False, default=0)
+    losses = Column(Integer, nullable=False, default=0)
+    wagered = Column(BigInteger, nullable=False, default=0)
+    net = Column(BigInteger, nullable=False, default=0)
+    biggest_win = Column(BigInteger, nullable=False, default=0)  # Lãi lớn nhất của một ván
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow)
+    
+    __table_args__ = (UniqueConstraint('guild_id', 'user_id', 'game_type', name='uq_player_stats_user_game'),)
+
+class ReconcileCheckpoint(Base):
+    __tablename__ = 'reconcile_checkpoints'
+    
+    name = Column(String(50), primary_key=True)
+    last_transaction_id = Column(Integer, nullable=False, default=0)  # id lớn nhất đã đối soát
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow)
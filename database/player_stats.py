@@ -0,0 +1,55 @@
+"""Thống kê người chơi theo từng game, cộng dồn khi settle.
+
+Mỗi (guild, user, game_type) có một dòng player_stats: số ván, thắng, thua,
+tổng cược, lãi/lỗ và lãi lớn nhất của một ván. Dòng được cập nhật trong cùng
+transaction với lần settle kết thúc ván nên /stats chỉ đọc vài dòng theo
+khóa, không phải SUM trên transaction_history.
+"""
+from dataclasses import dataclass
+from typing import Optional
+
+from .ledger import LEDGER_GAME_TYPES
+
+@dataclass(frozen=True)
+class RoundResult:
+    """Kết quả đã chốt của một (hoặc nhiều, với autoplay) ván"""
+    game_type: str
+    wagered: int  # Tổng tiền cược, kể cả double/split
+    payout: int
+    rounds: int = 1
+    wins: Optional[int] = None  # None: suy ra từ lãi/lỗ của ván duy nhất
+    losses: Optional[int] = None
+    biggest_win: Optional[int] = None
+
+    def __post_init__(self):
+        if self.game_type not in LEDGER_GAME_TYPES:
+            raise ValueError(f"Unknown ledger game type: {self.game_type}")
+
+    @property
+    def net(self) -> int:
+        return self.payout - self.wagered
+
+    @property
+    def win_count(self) -> int:
+        return self.wins if self.wins is not None else int(self.net > 0)
+
+    @property
+    def loss_count(self) -> int:
+        return self.losses if self.losses is not None else int(self.net < 0)
+
+    @property
+    def best(self) -> int:
+        return self.biggest_win if self.biggest_win is not None else max(self.net, 0)
+
+    @classmethod
+    def from_autoplay(cls, game_type: str, result) -> "RoundResult":
+        """Gộp một lượt autoplay (games.autoplay.AutoplayResult)"""
+        return cls(
+            game_type,
+            wagered=result.total_bet,
+            payout=result.total_payout,
+            rounds=result.rounds_played,
+            wins=result.wins,
+            losses=result.losses,
+            biggest_win=max([profit for profit in result.histogram if profit > 0], default=0)
+        )
@@ -0,0 +1,264 @@
+"""Đối soát số dư với lịch sử giao dịch.
+
+    python -m database.reconciliation [--incremental] [--repair ledger|balance]
+
+Bất biến: user_balances.balance = SUM(transaction_history.amount) của user
+(tài khoản mới có dòng "opening" ghi số dư khởi đầu). Chế độ đầy đủ đọc hai
+luồng đã sắp theo (guild_id, user_id) - tổng ledger theo nhóm và số dư - rồi
+ghép một lượt (merge-join), bộ nhớ không phụ thuộc số user. Chế độ
+incremental chỉ kiểm tra các user có giao dịch mới từ checkpoint lần trước
+(số dư bị sửa ngoài settle mà không ghi lịch sử chỉ bắt được bằng chế độ
+đầy đủ).
+
+Sửa lệch:
+  ledger  - thêm dòng "adjustment" (hoặc "opening" nếu user chưa có opening và
+            ledger chưa bị gộp) bằng phần chênh lệch, số dư giữ nguyên
+  balance - đặt số dư về đúng tổng ledger
+Ledger có dòng nhưng không có số dư ("orphan") chỉ được báo cáo.
+
+Khi bot đang chạy nên dùng !reconcile: lệnh đó chờ journal ghi xong rồi mới
+đọc lại các user lệch, còn CLI có thể thấy lệch tạm thời của giao dịch chưa
+flush (chỉ --repair từ CLI khi bot đã tắt).
+"""
+import argparse
+import datetime
+import os
+import sys
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import and_, case, func, insert, select, true, tuple_, update
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.ledger import OPENING_TYPE, ledger_row
+from database.ledger_compaction import SUMMARY_TYPE
+from database.engine import make_engine
+from database.models import ReconcileCheckpoint, TransactionHistory, UserBalance
+from config import config
+
+ADJUSTMENT_TYPE = "adjustment"
+REPAIR_MODES = ("ledger", "balance")
+CHECKPOINT_NAME = "balances"
+
+UserKey = Tuple[int, int]  # (guild_id, user_id)
+
+@dataclass
+class Drift:
+    guild_id: int
+    user_id: int
+    balance: Optional[int]  # None: có ledger nhưng không có số dư
+    ledger_total: int
+    openings: int  # Số dòng "opening" của user
+    summaries: int = 0  # Số dòng "summary" (ledger đã bị gộp bởi ledger_compaction)
+
+    @property
+    def difference(self) -> int:
+        """Số dư trừ tổng ledger"""
+        return (self.balance or 0) - self.ledger_total
+
+    @property
+    def kind(self) -> str:
+        if self.balance is None:
+            return "orphan"
+        # Ledger đã gộp có thể chứa số dư khởi đầu trong dòng tổng hợp: chỉ điều chỉnh
+        if self.openings == 0 and self.summaries == 0:
+            return "missing_opening"
+        return "drift"
+
+@dataclass
+class ReconcileReport:
+    checked: int = 0
+    drifts: List[Drift] = field(default_factory=list)
+    repaired: int = 0
+    checkpoint: int = 0  # id giao dịch lớn nhất đã được tính
+
+    def counts(self) -> dict:
+        result = {}
+        for drift in self.drifts:
+            result[drift.kind] = result.get(drift.kind, 0) + 1
+        return result
+
+def _ledger_totals(conditions=()):
+    table = TransactionHistory
+    return (
+        select(
+            table.guild_id, table.user_id, func.sum(table.amount),
+            func.sum(case((table.transaction_type == OPENING_TYPE, 1), else_=0)),
+            func.sum(case((table.transaction_type == SUMMARY_TYPE, 1), else_=0))
+        )
+        .where(and_(true(), *conditions))
+        .group_by(table.guild_id, table.user_id)
+        .order_by(table.guild_id, table.user_id)
+    )
+
+def _balances(conditions=()):
+    return (
+        select(UserBalance.guild_id, UserBalance.user_id, UserBalance.balance)
+        .where(and_(true(), *conditions))
+        .order_by(UserBalance.guild_id, UserBalance.user_id)
+    )
+
+def merge_join(ledger_rows: Iterable[tuple], balance_rows: Iterable[tuple]) -> Iterator[Tuple[UserKey, Optional[int], int, int, int]]:
+    """Ghép hai luồng đã sắp theo (guild_id, user_id): (key, balance, tổng ledger, số dòng opening, số dòng summary)"""
+    ledger_iter, balance_iter = iter(ledger_rows), iter(balance_rows)
+    ledger_row_ = next(ledger_iter, None)
+    balance_row = next(balance_iter, None)
+    while ledger_row_ is not None or balance_row is not None:
+        ledger_key = (ledger_row_[0], ledger_row_[1]) if ledger_row_ is not None else None
+        balance_key = (balance_row[0], balance_row[1]) if balance_row is not None else None
+        if balance_key is None or (ledger_key is not None and ledger_key < balance_key):
+            yield (ledger_key, None, *_ledger_counts(ledger_row_))
+            ledger_row_ = next(ledger_iter, None)
+        elif ledger_key is None or balance_key < ledger_key:
+            yield balance_key, balance_row[2], 0, 0, 0
+            balance_row = next(balance_iter, None)
+        else:
+            yield (ledger_key, balance_row[2], *_ledger_counts(ledger_row_))
+            ledger_row_ = next(ledger_iter, None)
+            balance_row = next(balance_iter, None)
+
+def _ledger_counts(row: tuple) -> Tuple[int, int, int]:
+    """(tổng amount, số dòng opening, số dòng summary) của một dòng _ledger_totals"""
+    return int(row[2]), int(row[3]), int(row[4])
+
+def _check(report: ReconcileReport, joined: Iterable[Tuple[UserKey, Optional[int], int, int, int]]):
+    for (guild_id, user_id), balance, total, openings, summaries in joined:
+        report.checked += 1
+        if balance is None or balance != total:
+            report.drifts.append(Drift(guild_id, user_id, balance, total, openings, summaries))
+
+def _touched_users(conn, after_id: int, upto_id: int) -> List[UserKey]:
+    return [tuple(row) for row in conn.execute(
+        select(TransactionHistory.guild_id, TransactionHistory.user_id)
+        .where(and_(TransactionHistory.id > after_id, TransactionHistory.id <= upto_id))
+        .distinct()
+        .order_by(TransactionHistory.guild_id, TransactionHistory.user_id)
+    )]
+
+def check_users(conn, keys: List[UserKey], report: ReconcileReport, batch_size: int = 500):
+    """Đối soát một danh sách user (guild_id, user_id) đã sắp xếp, từng lô `batch_size`"""
+    for start in range(0, len(keys), batch_size):
+        chunk = keys[start:start + batch_size]
+        ledger_rows = conn.execute(_ledger_totals([
+            tuple_(TransactionHistory.guild_id, TransactionHistory.user_id).in_(chunk)
+        ])).all()
+        balance_rows = conn.execute(_balances([
+            tuple_(UserBalance.guild_id, UserBalance.user_id).in_(chunk)
+        ])).all()
+        _check(report, merge_join(ledger_rows, balance_rows))
+
+def reconcile(engine, incremental: bool = False, batch_size: int = 500) -> ReconcileReport:
+    """Tìm các user lệch số dư; incremental chỉ xét user có giao dịch sau checkpoint"""
+    report = ReconcileReport()
+    with engine.connect() as conn:
+        # Checkpoint lấy trước khi đọc: giao dịch đến trong lúc chạy được xét ở lần sau
+        report.checkpoint = conn.execute(select(func.coalesce(func.max(TransactionHistory.id), 0))).scalar()
+        if incremental:
+            after_id = conn.execute(
+                select(ReconcileCheckpoint.last_transaction_id).where(ReconcileCheckpoint.name == CHECKPOINT_NAME)
+            ).scalar() or 0
+            check_users(conn, _touched_users(conn, after_id, report.checkpoint), report, batch_size)
+        else:
+            ledger_rows = conn.execution_options(yield_per=batch_size).execute(_ledger_totals())
+            # Luồng thứ hai trên connection riêng để hai cursor cùng mở
+            with engine.connect() as balance_conn:
+                balance_rows = balance_conn.execution_options(yield_per=batch_size).execute(_balances())
+                _check(report, merge_join(ledger_rows, balance_rows))
+    return report
+
+def save_checkpoint(engine, last_transaction_id: int):
+    with engine.begin() as conn:
+        values = {"last_transaction_id": last_transaction_id, "updated_at": datetime.datetime.utcnow()}
+        if conn.execute(
+            update(ReconcileCheckpoint).where(ReconcileCheckpoint.name == CHECKPOINT_NAME).values(**values)
+        ).rowcount == 0:
+            conn.execute(insert(ReconcileCheckpoint).values(name=CHECKPOINT_NAME, **values))
+
+def recheck(engine, drifts: List[Drift], batch_size: int = 500) -> List[Drift]:
+    """Đọc lại các user bị lệch (loại các lệch tạm thời do giao dịch đang ghi dở)"""
+    report = ReconcileReport()
+    with engine.connect() as conn:
+        check_users(conn, sorted({(drift.guild_id, drift.user_id) for drift in drifts}), report, batch_size)
+    return report.drifts
+
+def repair(engine, drifts: List[Drift], mode: str) -> int:
+    """Sửa các lệch (trừ orphan) trong một transaction, trả về số user đã sửa.
+
+    Mỗi user chỉ được sửa nếu số dư vẫn đúng như lúc đối soát.
+    """
+    if mode not in REPAIR_MODES:
+        raise ValueError(f"Unknown repair mode: {mode}")
+    repaired = 0
+    with engine.begin() as conn:
+        for drift in drifts:
+            if drift.kind == "orphan":
+                continue
+            if mode == "balance":
+                result = conn.execute(
+                    update(UserBalance)
+                    .where(and_(
+                        UserBalance.guild_id == drift.guild_id,
+                        UserBalance.user_id == drift.user_id,
+                        UserBalance.balance == drift.balance
+                    ))
+                    .values(balance=drift.ledger_total)
+                )
+                repaired += result.rowcount
+                continue
+
+            current = conn.execute(
+                select(UserBalance.balance).where(and_(
+                    UserBalance.guild_id == drift.guild_id, UserBalance.user_id == drift.user_id
+                ))
+            ).scalar()
+            if current != drift.balance:
+                continue
+            # Đọc lại ledger trong cùng transaction: có giao dịch mới hoặc bị gộp
+            # (ledger_compaction) từ lúc đối soát thì để lần sau
+            ledger = conn.execute(_ledger_totals([
+                TransactionHistory.guild_id == drift.guild_id, TransactionHistory.user_id == drift.user_id
+            ])).first()
+            counts = _ledger_counts(ledger) if ledger is not None else (0, 0, 0)
+            if Drift(drift.guild_id, drift.user_id, current, *counts) != drift:
+                continue
+            if drift.kind == "missing_opening":
+                tx_type, description = OPENING_TYPE, f"Số dư khởi đầu (đối soát): {drift.difference}"
+            else:
+                tx_type, description = ADJUSTMENT_TYPE, f"Điều chỉnh đối soát: {drift.difference:+}"
+            conn.execute(insert(TransactionHistory), [
+                ledger_row(drift.user_id, drift.guild_id, drift.difference, tx_type, description)
+            ])
+            repaired += 1
+    return repaired
+
+def describe(report: ReconcileReport, limit: int = 20) -> List[str]:
+    """Các dòng mô tả lệch để in hoặc hiển thị"""
+    return [
+        f"{drift.kind:<16} guild {drift.guild_id} user {drift.user_id}: "
+        f"số dư {drift.balance if drift.balance is not None else '-'} / ledger {drift.ledger_total} "
+        f"({drift.difference:+})"
+        for drift in report.drifts[:limit]
+    ]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=config.DATABASE_URL)
+    parser.add_argument("--incremental", action="store_true", help="Chỉ xét user có giao dịch sau checkpoint")
+    parser.add_argument("--repair", choices=REPAIR_MODES, help="Sửa lệch theo ledger hoặc theo số dư")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    engine = make_engine(args.database_url)
+    report = reconcile(engine, args.incremental, args.batch_size)
+    if report.drifts:
+        report.drifts = recheck(engine, report.drifts, args.batch_size)
+    print(f"✅ Đã đối soát {report.checked:,} user, lệch: {len(report.drifts):,} {report.counts()}")
+    for line in describe(report):
+        print("  " + line)
+    if args.repair and report.drifts:
+        report.repaired = repair(engine, report.drifts, args.repair)
+        print(f"✅ Đã sửa {report.repaired:,} user ({args.repair})")
+    save_checkpoint(engine, report.checkpoint)
+    engine.dispose()
@@ -0,0 +1,369 @@
+import asyncio
+import datetime
+import functools
+import glob
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from .ledger import ledger_row, parsed_columns
+from config import config
+
+class TransactionJournal:
+    """Hàng đợi ghi lịch sử giao dịch theo lô (write-behind).
+
+    Mỗi dòng được ghi vào file spill trước khi vào hàng đợi, sau đó task nền
+    gom lô và ghi bằng một lệnh executemany. Nếu bot chết giữa chừng, các dòng
+    chưa commit trong file spill được ghi lại (replay) ở lần khởi động sau.
+
+    File spill chia thành segment (<JOURNAL_SPILL_PATH>.<n>): sau mỗi lô,
+    journal ghi một dòng "ack" các seq đã commit rồi chuyển sang segment mới;
+    segment cũ bị xóa khi mọi dòng của nó đã commit. Replay bỏ qua các dòng
+    đã ack, nên chỉ crash đúng lúc giữa commit và ghi ack mới có thể ghi một
+    lô hai lần.
+
+    Ghi spill chạy trên một thread riêng và được gom nhóm: các append đồng thời
+    dùng chung một lần write (+ fsync nếu JOURNAL_FSYNC), event loop không bị chặn.
+
+    Lô ghi lỗi được thử lại tối đa JOURNAL_MAX_RETRIES lần, sau đó ghi từng
+    dòng; dòng vẫn lỗi (vi phạm ràng buộc...) được chuyển sang file
+    JOURNAL_DEAD_LETTER_PATH để journal không bị kẹt.
+    """
+
+    def __init__(self, writer: Callable[[List[dict]], Awaitable[None]],
+                 spill_path: Optional[str] = None,
+                 max_queue: Optional[int] = None,
+                 batch_size: Optional[int] = None,
+                 flush_interval: Optional[float] = None,
+                 fsync: Optional[bool] = None,
+                 max_retries: Optional[int] = None,
+                 dead_letter_path: Optional[str] = None):
+        self.writer = writer
+        self.spill_path = spill_path or config.JOURNAL_SPILL_PATH
+        self.batch_size = batch_size or config.JOURNAL_BATCH_SIZE
+        self.flush_interval = flush_interval or config.JOURNAL_FLUSH_INTERVAL
+        self.fsync = config.JOURNAL_FSYNC if fsync is None else fsync
+        self.max_retries = config.JOURNAL_MAX_RETRIES if max_retries is None else max_retries
+        self.dead_letter_path = dead_letter_path or config.JOURNAL_DEAD_LETTER_PATH
+
+        # Hàng đợi có giới hạn: append() sẽ chờ khi đầy (backpressure)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue or config.JOURNAL_MAX_QUEUE)
+        # Mọi thao tác file spill chạy tuần tự trên một thread, theo thứ tự gửi
+        self._io = ThreadPoolExecutor(max_workers=1, thread_name_prefix="casino-journal")
+        self._seq = 0
+        self._outstanding: Dict[int, Optional[int]] = {}  # seq chưa commit -> segment chứa dòng
+        self._spill_buffer: List[Tuple[int, str]] = []
+        self._spill_done: Optional[asyncio.Future] = None
+        self._spill_wakeup = asyncio.Event()
+        self._committed = asyncio.Condition()
+        self._segment = 0
+        self._segment_rows: Dict[int, int] = {}  # Số dòng đã ghi vào segment
+        self._segment_pending: Dict[int, int] = {}  # Số dòng của segment chưa commit
+        self._spill = None  # File segment hiện tại, chỉ dùng trên thread io
+        self._task: Optional[asyncio.Task] = None
+        self._spill_task: Optional[asyncio.Task] = None
+        self._closing = False
+
+        self.flushed_rows = 0
+        self.flushed_batches = 0
+        self.dead_rows = 0
+
+    async def start(self):
+        """Replay file spill còn sót lại rồi chạy task flush nền"""
+        await self._replay()
+        self._segment_rows[self._segment] = self._segment_pending[self._segment] = 0
+        await self._io_call(self._open_segment, self._segment)
+        self._task = asyncio.create_task(self._run())
+        self._spill_task = asyncio.create_task(self._write_spill())
+
+    async def append(self, user_id: int, guild_id: int, amount: int, transaction_type: str, description: str,
+                     **ledger):
+        """Thêm một dòng lịch sử giao dịch vào journal (`ledger`: game_type, round_id, bet, payout)"""
+        row = self._make_row(user_id, guild_id, amount, transaction_type, description, **ledger)
+        if self._closing or self._task is None:
+            # Chưa start hoặc đang tắt: ghi thẳng để không mất dữ liệu
+            await self.writer([row])
+            return
+
+        self._seq += 1
+        seq = self._seq
+        self._outstanding[seq] = None
+        try:
+            await self._spill_row(seq, row)
+        except BaseException:
+            self._outstanding.pop(seq, None)
+            await self._notify_committed()
+            raise
+        await self.queue.put((seq, row))
+
+    async def drain(self):
+        """Chờ các dòng đã append trước lúc gọi được commit (dòng append sau đó không chờ)"""
+        if not self._task:
+            return
+        last_seq = self._seq
+        async with self._committed:
+            # _outstanding giữ thứ tự seq tăng dần: chỉ cần xem dòng cũ nhất chưa commit
+            await self._committed.wait_for(
+                lambda: not self._outstanding or next(iter(self._outstanding)) > last_seq
+            )
+
+    @property
+    def depth(self) -> int:
+        """Số dòng chưa được commit"""
+        return len(self._outstanding)
+
+    async def close(self):
+        """Flush toàn bộ hàng đợi rồi dừng task nền"""
+        self._closing = True
+        if self._task:
+            await self.queue.join()
+            for task in (self._task, self._spill_task):
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+            self._task = self._spill_task = None
+            await self._io_call(self._close_segment, self._segment, not self._segment_rows.get(self._segment))
+        self._io.shutdown(wait=True)
+        print(f"✅ Transaction journal closed ({self.flushed_rows} rows in {self.flushed_batches} batches"
+              f"{f', {self.dead_rows} dead-lettered' if self.dead_rows else ''})")
+
+    @staticmethod
+    def _make_row(user_id: int, guild_id: int, amount: int, transaction_type: str, description: str,
+                  **ledger) -> dict:
+        row = ledger_row(user_id, guild_id, amount, transaction_type, description, **ledger)
+        row["created_at"] = datetime.datetime.utcnow()
+        return row
+
+    @staticmethod
+    def _dump_row(row: dict, **extra) -> str:
+        return json.dumps(dict(row, created_at=row["created_at"].isoformat(), **extra), ensure_ascii=False)
+
+    # ------------------------------------------------------------------
+    # File spill (các hàm _open/_write/_close/_remove chạy trên thread io)
+    # ------------------------------------------------------------------
+
+    def _io_call(self, func, *args) -> asyncio.Future:
+        # Gửi ngay lúc gọi (không phải lúc await) để giữ thứ tự giữa các thao tác
+        return asyncio.get_running_loop().run_in_executor(self._io, functools.partial(func, *args))
+
+    def _segment_path(self, segment: int) -> str:
+        return f"{self.spill_path}.{segment}"
+
+    def _open_segment(self, segment: int):
+        if self._spill:
+            self._spill.close()
+        self._spill = open(self._segment_path(segment), "a", encoding="utf-8")
+
+    def _close_segment(self, segment: int, remove: bool):
+        if self._spill:
+            self._spill.close()
+            self._spill = None
+        if remove:
+            self._remove_segment(segment)
+
+    def _remove_segment(self, segment: int):
+        try:
+            os.remove(self._segment_path(segment))
+        except FileNotFoundError:
+            pass
+
+    def _write_lines(self, data: str):
+        self._spill.write(data)
+        self._spill.flush()
+        if self.fsync:
+            os.fsync(self._spill.fileno())
+
+    def _append_dead_letter(self, data: str):
+        with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    async def _spill_row(self, seq: int, row: dict):
+        """Chờ dòng được ghi vào file spill (gom chung lần ghi với các append đồng thời)"""
+        if self._spill_done is None:
+            self._spill_done = asyncio.get_running_loop().create_future()
+        done = self._spill_done
+        self._spill_buffer.append((seq, self._dump_row(row, seq=seq)))
+        self._spill_wakeup.set()
+        await asyncio.shield(done)
+
+    async def _write_spill(self):
+        while True:
+            await self._spill_wakeup.wait()
+            self._spill_wakeup.clear()
+            lines, done = self._spill_buffer, self._spill_done
+            self._spill_buffer, self._spill_done = [], None
+
+            # Gán segment ngay lúc gửi lệnh ghi: cùng thứ tự với các lần đổi segment
+            segment = self._segment
+            for seq, _ in lines:
+                if seq in self._outstanding:
+                    self._outstanding[seq] = segment
+            self._segment_rows[segment] += len(lines)
+            self._segment_pending[segment] += len(lines)
+            try:
+                await self._io_call(self._write_lines, "".join(line + "\n" for _, line in lines))
+            except Exception as e:
+                print(f"❌ Error writing journal spill: {e}")
+                self._segment_pending[segment] -= len(lines)
+                done.set_exception(e)
+                continue
+            done.set_result(None)
+
+    def _spill_files(self) -> List[Tuple[int, str]]:
+        """(segment, path) các file spill hiện có; file spill một tệp của phiên bản cũ là segment -1"""
+        files = []
+        if os.path.exists(self.spill_path):
+            files.append((-1, self.spill_path))
+        for path in glob.glob(glob.escape(self.spill_path) + ".*"):
+            suffix = path[len(self.spill_path) + 1:]
+            if suffix.isdigit():
+                files.append((int(suffix), path))
+        return sorted(files)
+
+    async def _replay(self):
+        """Ghi lại các dòng chưa commit còn trong file spill từ lần chạy trước"""
+        files = self._spill_files()
+        if not files:
+            return
+
+        rows: List[Tuple[Optional[int], dict]] = []
+        acked: Set[int] = set()
+        for _, path in files:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        row = json.loads(line)
+                    except ValueError:
+                        # Dòng cuối có thể bị ghi dở khi crash
+                        continue
+                    if "ack" in row:
+                        acked.update(row["ack"])
+                        continue
+                    seq = row.pop("seq", None)
+                    row["created_at"] = datetime.datetime.fromisoformat(row["created_at"])
+                    if "game_type" not in row:
+                        # File spill từ phiên bản chưa có cột ledger
+                        row.update(parsed_columns(row["description"]))
+                    rows.append((seq, row))
+
+        pending = [row for seq, row in rows if seq is None or seq not in acked]
+        failed = []
+        for start in range(0, len(pending), self.batch_size):
+            failed.extend(await self._write_rows(pending[start:start + self.batch_size]))
+        if failed:
+            await self._dead_letter(failed)
+
+        for _, path in files:
+            os.remove(path)
+        self._segment = files[-1][0] + 1
+        if pending:
+            print(f"✅ Replayed {len(pending) - len(failed)} journal rows from {self.spill_path}")
+
+    async def _dead_letter(self, rows: List[dict]):
+        data = "".join(self._dump_row(row) + "\n" for row in rows)
+        await self._io_call(self._append_dead_letter, data)
+        self.dead_rows += len(rows)
+        print(f"❌ Moved {len(rows)} journal rows to {self.dead_letter_path}")
+
+    # ------------------------------------------------------------------
+    # Flush
+    # ------------------------------------------------------------------
+
+    async def _run(self):
+        while True:
+            batch = [await self.queue.get()]
+            deadline = asyncio.get_running_loop().time() + self.flush_interval
+
+            # Gom thêm cho đến khi đủ lô hoặc hết thời gian chờ
+            while len(batch) < self.batch_size:
+                timeout = deadline - asyncio.get_running_loop().time()
+                if timeout <= 0 or self._closing:
+                    if self.queue.empty():
+                        break
+                    batch.append(self.queue.get_nowait())
+                    continue
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            await self._flush(batch)
+
+    async def _write_rows(self, rows: List[dict]) -> List[dict]:
+        """Ghi một lô (thử lại có giới hạn), trả về các dòng không ghi được"""
+        delay = 0.5
+        for attempt in range(self.max_retries + 1):
+            try:
+                await self.writer(rows)
+                return []
+            except Exception as e:
+                if attempt == self.max_retries:
+                    print(f"❌ Journal flush failed ({len(rows)} rows) after {attempt + 1} attempts: {e}")
+                    break
+                print(f"❌ Journal flush failed ({len(rows)} rows), retrying in {delay:.1f}s: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30.0)
+
+        if len(rows) == 1:
+            return rows
+        # Ghi từng dòng để chỉ loại các dòng lỗi
+        failed = []
+        for row in rows:
+            try:
+                await self.writer([row])
+            except Exception as e:
+                print(f"❌ Journal row rejected (user {row['user_id']}, guild {row['guild_id']}): {e}")
+                failed.append(row)
+        return failed
+
+    async def _flush(self, batch: List[Tuple[int, dict]]):
+        try:
+            failed = await self._write_rows([row for _, row in batch])
+            kept = set()
+            if failed:
+                try:
+                    await self._dead_letter(failed)
+                except Exception as e:
+                    # Giữ segment chứa các dòng này để lần khởi động sau replay lại
+                    print(f"❌ Error writing journal dead letter: {e}")
+                    kept = {id(row) for row in failed}
+
+            self.flushed_rows += len(batch) - len(failed)
+            self.flushed_batches += 1
+            committed = []
+            for seq, row in batch:
+                segment = self._outstanding.pop(seq, None)
+                if id(row) in kept:
+                    continue
+                committed.append(seq)
+                if segment is not None:
+                    self._segment_pending[segment] -= 1
+            await self._release_segments(committed)
+        except Exception as e:
+            print(f"❌ Error updating journal spill: {e}")
+        finally:
+            for _ in batch:
+                self.queue.task_done()
+            await self._notify_committed()
+
+    async def _notify_committed(self):
+        async with self._committed:
+            self._committed.notify_all()
+
+    async def _release_segments(self, committed: List[int]):
+        """Ghi ack cho các dòng vừa commit, đổi segment và xóa các segment đã commit hết"""
+        if committed:
+            await self._io_call(self._write_lines, json.dumps({"ack": committed}) + "\n")
+        if self._segment_rows.get(self._segment):
+            self._segment += 1
+            self._segment_rows[self._segment] = self._segment_pending[self._segment] = 0
+            await self._io_call(self._open_segment, self._segment)
+        for segment in [s for s in self._segment_rows if s != self._segment and self._segment_pending[s] <= 0]:
+            del self._segment_rows[segment]
+            del self._segment_pending[segment]
+            await self._io_call(self._remove_segment, segment)
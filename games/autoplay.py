@@ -0,0 +1,107 @@
+"""Chơi nhiều ván Bầu Cua / Xóc Đĩa trong một lần (autoplay) bằng NumPy.
+
+Toàn bộ xúc xắc/đồng xu của N ván được sinh một lần, lợi nhuận từng ván và
+tổng lũy kế tính bằng mảng. Stop-loss / take-profit được xét trên tổng lũy
+kế: dừng ngay sau ván đầu tiên chạm ngưỡng. Kết quả là một khoản chênh lệch
+số dư duy nhất để settle trong một transaction.
+"""
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+import numpy as np
+
+from .bau_cua import BauCuaAnimal
+from .rng import RandomPool, RngState, default_pool
+from .xoc_dia import XocDiaBetType, PAYOUT_TABLE
+
+_ANIMALS = tuple(BauCuaAnimal)
+
+@dataclass
+class AutoplayResult:
+    """Tổng kết một lượt autoplay"""
+    rounds_requested: int
+    rounds_played: int
+    bet_per_round: int
+    total_bet: int
+    total_payout: int
+    # Số dư tối thiểu cần có trước khi chơi để đủ tiền cược cho mọi ván
+    required_balance: int
+    wins: int
+    losses: int
+    pushes: int
+    # Lợi nhuận một ván -> số ván
+    histogram: Dict[int, int] = field(default_factory=dict)
+    stopped_by: Optional[str] = None  # "stop_loss", "take_profit" hoặc None
+    rng_state: Optional[RngState] = None  # Vị trí rng trước ván đầu tiên
+
+    @property
+    def net(self) -> int:
+        return self.total_payout - self.total_bet
+
+def _summarise(payouts: np.ndarray, bet: int, stop_loss: Optional[int],
+               take_profit: Optional[int]) -> AutoplayResult:
+    rounds = int(payouts.size)
+    net = payouts - bet
+    cumulative = np.cumsum(net)
+
+    played = rounds
+    stopped_by = None
+    stop_mask = np.zeros(rounds, dtype=bool)
+    if stop_loss is not None:
+        stop_mask |= cumulative <= -stop_loss
+    if take_profit is not None:
+        stop_mask |= cumulative >= take_profit
+    if stop_mask.any():
+        played = int(stop_mask.argmax()) + 1
+        stopped_by = "stop_loss" if stop_loss is not None and cumulative[played - 1] <= -stop_loss else "take_profit"
+
+    net = net[:played]
+    cumulative = cumulative[:played]
+    # Trước ván i số dư đã thay đổi cumulative[i-1]; phải còn đủ `bet` ở mọi ván
+    lowest = min(0, int(cumulative[:-1].min())) if played > 1 else 0
+    values, counts = np.unique(net, return_counts=True)
+
+    return AutoplayResult(
+        rounds_requested=rounds,
+        rounds_played=played,
+        bet_per_round=bet,
+        total_bet=bet * played,
+        total_payout=int(payouts[:played].sum()),
+        required_balance=bet - lowest,
+        wins=int((net > 0).sum()),
+        losses=int((net < 0).sum()),
+        pushes=int((net == 0).sum()),
+        histogram={int(v): int(c) for v, c in zip(values, counts)},
+        stopped_by=stopped_by
+    )
+
+def autoplay_bau_cua(bets: Dict[BauCuaAnimal, int], rounds: int, luck_factor: float = 1.0,
+                     stop_loss: Optional[int] = None, take_profit: Optional[int] = None,
+                     rng: Optional[RandomPool] = None) -> AutoplayResult:
+    """Chơi `rounds` ván Bầu Cua với cùng một bộ cược"""
+    rng = rng if rng is not None else default_pool()
+    rng_state = rng.state
+    bet_vector = np.array([bets.get(animal, 0) for animal in _ANIMALS], dtype=np.int64)
+
+    # Giống BauCuaGame: cửa có đặt cược được nhân luck_factor, mỗi xúc xắc một số của rng
+    cum_weights = np.cumsum(np.where(bet_vector > 0, luck_factor, 1.0))
+    dice = np.searchsorted(cum_weights, rng.take(rounds * 3) * cum_weights[-1], side="right").reshape(rounds, 3)
+
+    # Mỗi cửa trả cược * số lần xuất hiện
+    payouts = bet_vector[dice].sum(axis=1)
+    result = _summarise(payouts, int(bet_vector.sum()), stop_loss, take_profit)
+    result.rng_state = rng_state
+    return result
+
+def autoplay_xoc_dia(bet_type: XocDiaBetType, bet: int, rounds: int, luck_factor: float = 1.0,
+                     stop_loss: Optional[int] = None, take_profit: Optional[int] = None,
+                     rng: Optional[RandomPool] = None) -> AutoplayResult:
+    """Chơi `rounds` ván Xóc Đĩa với cùng một cửa cược"""
+    rng = rng if rng is not None else default_pool()
+    rng_state = rng.state
+    # Giống XocDiaGame.flip_coins
+    red_count = (rng.take(rounds * 4).reshape(rounds, 4) < min(0.9, 0.5 * luck_factor)).sum(axis=1)
+    payouts = bet * np.array(PAYOUT_TABLE[bet_type], dtype=np.int64)[red_count]
+    result = _summarise(payouts, bet, stop_loss, take_profit)
+    result.rng_state = rng_state
+    return result
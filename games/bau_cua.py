@@ -1,7 +1,9 @@
-import random
-from typing import List, Dict, Tuple
+from itertools import accumulate
+from typing import List, Dict, Optional, Tuple
 from enum import Enum
 
+from .rng import RandomPool, default_pool
+
 class BauCuaAnimal(Enum):
     BAU = ("Bầu", "🎉")
     CUA = ("Cua", "🦀")
@@ -11,13 +13,16 @@ class BauCuaAnimal(Enum):
     NAI = ("Nai", "🦌")
 
 class BauCuaGame:
-    def __init__(self, bets: Dict[BauCuaAnimal, int], user_id: int, luck_factor: float = 1.0):
+    def __init__(self, bets: Dict[BauCuaAnimal, int], user_id: int, luck_factor: float = 1.0,
+                 rng: Optional[RandomPool] = None):
         self.bets = bets
         self.user_id = user_id
         self.luck_factor = luck_factor
         self.dice_results: List[BauCuaAnimal] = []
         self.payout = 0
         self.total_bet = sum(bets.values())
+        self.rng = rng if rng is not None else default_pool()
+        self.rng_state = self.rng.state  # Ghi lại để chơi lại đúng ván này
         
         self.roll_dice()
         self.calculate_payout()
@@ -26,12 +31,11 @@ class BauCuaGame:
         """Xúc xắc"""
         self.dice_results = []
         animals = list(BauCuaAnimal)
+        # Áp dụng luck factor
+        cum_weights = list(accumulate(self._adjust_probabilities(animals)))
         
         for _ in range(3):
-            # Áp dụng luck factor
-            adjusted_probabilities = self._adjust_probabilities(animals)
-            result = random.choices(animals, weights=adjusted_probabilities)[0]
-            self.dice_results.append(result)
+            self.dice_results.append(animals[self.rng.choice(cum_weights)])
     
     def _adjust_probabilities(self, animals: List[BauCuaAnimal]) -> List[float]:
         """Điều chỉnh xác suất dựa trên luck factor"""
@@ -1,152 +1,344 @@
-from .card_game import Deck, Card
+from .card_game import Deck, Card, CardValue, CARD_IS_ACE
+from .hand import Hand
+from .shoe import Shoe
+from .rng import new_round_id
 from typing import List, Tuple, Dict, Optional
-import random
+import struct
+
+from config import config
+
+# Mã kết quả dùng trong snapshot nhị phân
+RESULTS = ("", "BUST", "DEALER_BUST", "WIN", "LOSE", "PUSH", "BLACKJACK", "EXPIRED", "SPLIT")
+_RESULT_CODES = {result: code for code, result in enumerate(RESULTS)}
+
+# Cách xử lý ván bị bỏ dở (config.GAME_EXPIRY_POLICY)
+EXPIRY_POLICIES = ("stand", "refund", "forfeit")
+
+# Cờ trạng thái của từng tay
+HAND_DONE = 1
+HAND_DOUBLED = 2
+HAND_SPLIT_ACE = 4  # Tay sinh ra từ split ace: không rút thêm, chỉ được split lại
+
+# version, cờ ván, result, user_id, payout, luck_factor, tay đang chơi, số tay, số lá dealer, round_id
+_STATE_HEADER = struct.Struct("<BBBQqdBBB8s")
+# Mỗi tay: bet, payout, cờ, result, số lá (theo sau là các lá bài)
+_HAND_HEADER = struct.Struct("<qqBBB")
+_STATE_VERSION = 1
+
+# Cờ ván trong snapshot
+_STATE_GAME_OVER = 1
+_STATE_SETTLED = 2
+
+def play_dealer(hand: Hand, shoe: Shoe):
+    """Dealer rút đến khi >= 17 (đứng ở soft 17)"""
+    while hand.value < 17:
+        hand.append(shoe.draw_index())
+
+def hand_result(player: Hand, dealer: Hand, bet: int, allow_blackjack: bool = True) -> Tuple[str, int]:
+    """So tay người chơi với dealer, trả về (kết quả, tiền trả lại gồm cả cược)"""
+    player_value = player.value
+    dealer_value = dealer.value
+    
+    if player_value > 21:
+        result, payout = "BUST", 0
+    elif dealer_value > 21:
+        result, payout = "DEALER_BUST", bet * 2
+    elif player_value > dealer_value:
+        result, payout = "WIN", bet * 2
+    elif player_value == dealer_value:
+        result, payout = "PUSH", bet
+    else:
+        result, payout = "LOSE", 0
+    
+    # Áp dụng blackjack
+    if allow_blackjack and player.is_blackjack() and not dealer.is_blackjack():
+        result, payout = "BLACKJACK", int(bet * 2.5)
+    return result, payout
 
 class BlackjackGame:
-    def __init__(self, bet_amount: int, user_id: int, luck_factor: float = 1.0):
-        self.bet = bet_amount
+    def __init__(self, bet_amount: int, user_id: int, luck_factor: float = 1.0, shoe: Optional[Shoe] = None,
+                 round_id: Optional[str] = None):
         self.user_id = user_id
+        # Nối các dòng lịch sử (cược, double, split, thưởng) của ván
+        self.round_id = round_id or new_round_id()
         self.luck_factor = luck_factor  # 1.0 = bình thường, >1.0 = may mắn hơn
-        self.deck = Deck(6)  # 6 bộ bài
-        self.player_hand: List[Card] = []
-        self.dealer_hand: List[Card] = []
+        # Shoe của bàn (ShoeManager) hoặc shoe riêng 6 bộ bài
+        self.deck = shoe if shoe is not None else Shoe()
+        self.deck.begin_hand(self)
+        # Mỗi tay (sau split) có bài, cược, cờ trạng thái, kết quả và tiền thưởng riêng
+        self.hands: List[Hand] = []
+        self.bets: List[int] = [bet_amount]
+        self.hand_flags = bytearray(1)
+        self.hand_results: List[str] = [""]
+        self.hand_payouts: List[int] = [0]
+        self.active = 0  # Tay đang chơi
+        self.dealer_hand = Hand()
         self.game_over = False
         self.result = ""
         self.payout = 0
+        self.settled = False  # Đã cộng tiền thưởng cho người chơi chưa
         
         self.deal_initial_cards()
     
+    @property
+    def player_hand(self) -> Hand:
+        """Tay đang chơi (tay cuối cùng khi ván đã kết thúc)"""
+        return self.hands[min(self.active, len(self.hands) - 1)]
+    
+    @property
+    def bet(self) -> int:
+        """Tổng tiền cược của mọi tay"""
+        return sum(self.bets)
+    
+    @property
+    def current_bet(self) -> int:
+        """Cược của tay đang chơi, là số tiền cần trừ thêm khi double/split"""
+        return self.bets[min(self.active, len(self.bets) - 1)]
+    
+    @property
+    def is_split(self) -> bool:
+        return len(self.hands) > 1
+    
     def deal_initial_cards(self):
         """Chia bài ban đầu"""
-        self.player_hand = [self.deck.draw(), self.deck.draw()]
-        self.dealer_hand = [self.deck.draw(), self.deck.draw()]
+        self.hands = [Hand((self.deck.draw_index(), self.deck.draw_index()))]
+        self.dealer_hand = Hand((self.deck.draw_index(), self.deck.draw_index()))
         
         # Áp dụng luck factor
-        if random.random() < (self.luck_factor - 1.0) / 10:
+        if self.deck.rng.random() < (self.luck_factor - 1.0) / 10:
             # Cơ hội nhận bài tốt hơn
-            while self.calculate_hand_value(self.player_hand)[0] < 17:
+            while self.player_hand.value < 17:
                 if len(self.player_hand) < 5:
-                    self.player_hand.append(self.deck.draw())
+                    self.player_hand.append(self.deck.draw_index())
                 else:
                     break
     
-    def calculate_hand_value(self, hand: List[Card]) -> Tuple[int, bool]:
-        """Tính giá trị bài và có soft ace không"""
-        value = 0
-        soft_ace = False
-        aces = 0
-        
-        for card in hand:
-            if card.value == CardValue.ACE:
-                aces += 1
-                value += 11
-            else:
-                value += card.get_value()
-        
-        # Xử lý aces
-        while value > 21 and aces > 0:
-            value -= 10
-            aces -= 1
-            soft_ace = True
+    def calculate_hand_value(self, hand) -> Tuple[int, bool]:
+        """Tính giá trị bài và có soft ace không (ace đang được tính 11)"""
+        if not isinstance(hand, Hand):
+            hand = Hand(hand)
+        return hand.total()
+    
+    def _finish_hand(self):
+        """Kết thúc tay hiện tại, chuyển sang tay kế tiếp hoặc để dealer chơi"""
+        self.hand_flags[self.active] |= HAND_DONE
+        self._advance()
+    
+    def _advance(self):
+        """Bỏ qua các tay đã xong (và tay split ace không còn split lại được); hết tay thì dealer chơi"""
+        while self.active < len(self.hands):
+            flags = self.hand_flags[self.active]
+            if flags & HAND_SPLIT_ACE and not flags & HAND_DONE and not self._can_resplit_aces():
+                self.hand_flags[self.active] |= HAND_DONE
+            if not self.hand_flags[self.active] & HAND_DONE:
+                break
+            self.active += 1
         
-        return value, soft_ace
+        if self.active >= len(self.hands):
+            # Dealer chỉ chơi khi còn tay chưa quá 21
+            if any(not hand.is_bust() for hand in self.hands):
+                self.dealer_play()
+            self.determine_winner()
     
     def player_hit(self) -> bool:
-        """Người chơi rút thêm bài"""
+        """Người chơi rút thêm bài cho tay hiện tại, False nếu không được rút"""
         if self.game_over:
             return False
         
-        self.player_hand.append(self.deck.draw())
-        player_value, _ = self.calculate_hand_value(self.player_hand)
-        
-        if player_value > 21:
-            self.game_over = True
-            self.result = "BUST"
-            self.payout = 0
+        if self.hand_flags[self.active] & HAND_SPLIT_ACE:
             return False
         
+        hand = self.player_hand
+        hand.append(self.deck.draw_index())
+        if hand.is_bust():
+            self._finish_hand()
+        
         return True
     
     def player_stand(self):
-        """Người chơi dừng"""
+        """Người chơi dừng tay hiện tại"""
         if self.game_over:
             return
         
-        self.dealer_play()
-        self.determine_winner()
+        self._finish_hand()
+    
+    def can_double(self) -> bool:
+        """Double khi tay hiện tại có 2 lá (sau split chỉ khi luật cho phép)"""
+        if self.game_over or len(self.player_hand) != 2 or self.hand_flags[self.active] & HAND_SPLIT_ACE:
+            return False
+        return not self.is_split or config.BLACKJACK_DOUBLE_AFTER_SPLIT
     
     def player_double(self) -> bool:
-        """Người chơi double"""
-        if self.game_over or len(self.player_hand) != 2:
+        """Người chơi double tay hiện tại: gấp đôi cược và rút đúng một lá"""
+        if not self.can_double():
             return False
         
-        self.bet *= 2
-        self.player_hand.append(self.deck.draw())
-        
-        player_value, _ = self.calculate_hand_value(self.player_hand)
-        if player_value > 21:
-            self.game_over = True
-            self.result = "BUST"
-            self.payout = 0
-        else:
-            self.dealer_play()
-            self.determine_winner()
+        self.bets[self.active] *= 2
+        self.hand_flags[self.active] |= HAND_DOUBLED
+        self.player_hand.append(self.deck.draw_index())
+        self._finish_hand()
         
         return True
     
     def can_split(self) -> bool:
         """Kiểm tra có thể split không"""
-        return (len(self.player_hand) == 2 and 
-                self.player_hand[0].value == self.player_hand[1].value)
+        if self.game_over:
+            return False
+        hand = self.player_hand
+        if not (len(hand) == 2 and hand[0].value == hand[1].value):
+            return False
+        if len(self.hands) >= config.BLACKJACK_MAX_HANDS:
+            return False
+        # Ace đã split thì không split lại trừ khi luật cho phép
+        if hand[0].value is CardValue.ACE and self.is_split and not config.BLACKJACK_RESPLIT_ACES:
+            return False
+        return True
+    
+    def _can_resplit_aces(self) -> bool:
+        """Tay split ace hiện tại lại là cặp ace và luật cho split tiếp"""
+        first, second = self.player_hand.cards
+        return (config.BLACKJACK_RESPLIT_ACES and CARD_IS_ACE[first] and CARD_IS_ACE[second]
+                and len(self.hands) < config.BLACKJACK_MAX_HANDS)
     
     def player_split(self) -> bool:
-        """Người chơi split"""
+        """Người chơi split tay hiện tại thành hai tay cùng mức cược"""
         if not self.can_split():
             return False
         
-        # TODO: Implement split logic (phức tạp hơn, cần xử lý multiple hands)
-        return False
+        hand = self.player_hand
+        first, second = hand.cards
+        split_aces = CARD_IS_ACE[first]
+        position = self.active
+        
+        self.hands[position] = Hand((first, self.deck.draw_index()))
+        self.hands.insert(position + 1, Hand((second, self.deck.draw_index())))
+        self.bets.insert(position + 1, self.bets[position])
+        self.hand_flags.insert(position + 1, 0)
+        self.hand_results.insert(position + 1, "")
+        self.hand_payouts.insert(position + 1, 0)
+        
+        if split_aces:
+            # Split ace: mỗi tay chỉ nhận một lá; tay lại thành cặp ace được
+            # để mở cho đến khi tới lượt, nếu luật cho phép split lại
+            self.hand_flags[position] |= HAND_SPLIT_ACE
+            self.hand_flags[position + 1] |= HAND_SPLIT_ACE
+            self._advance()
+        
+        return True
     
     def dealer_play(self):
         """Dealer chơi tự động"""
-        dealer_value, _ = self.calculate_hand_value(self.dealer_hand)
-        
-        while dealer_value < 17:
-            self.dealer_hand.append(self.deck.draw())
-            dealer_value, _ = self.calculate_hand_value(self.dealer_hand)
+        play_dealer(self.dealer_hand, self.deck)
     
     def determine_winner(self):
-        """Xác định người thắng"""
+        """Xác định người thắng cho từng tay"""
         self.game_over = True
-        player_value, _ = self.calculate_hand_value(self.player_hand)
-        dealer_value, _ = self.calculate_hand_value(self.dealer_hand)
-        
-        if player_value > 21:
-            self.result = "BUST"
-            self.payout = 0
-        elif dealer_value > 21:
-            self.result = "DEALER_BUST"
-            self.payout = self.bet * 2
-        elif player_value > dealer_value:
-            self.result = "WIN"
-            self.payout = self.bet * 2
-        elif player_value == dealer_value:
-            self.result = "PUSH"
-            self.payout = self.bet
-        else:
-            self.result = "LOSE"
-            self.payout = 0
-        
-        # Áp dụng blackjack
-        if (len(self.player_hand) == 2 and player_value == 21 and 
-            not (len(self.dealer_hand) == 2 and dealer_value == 21)):
-            self.result = "BLACKJACK"
-            self.payout = int(self.bet * 2.5)
+        self.deck.end_hand(self)
+        self.active = len(self.hands)
+        for i, hand in enumerate(self.hands):
+            # 21 sau khi split không tính là blackjack
+            self.hand_results[i], self.hand_payouts[i] = hand_result(
+                hand, self.dealer_hand, self.bets[i], allow_blackjack=not self.is_split
+            )
+        self.payout = sum(self.hand_payouts)
+        self.result = self.hand_results[0] if not self.is_split else "SPLIT"
+    
+    def expire(self, policy: str):
+        """Kết thúc ván bị bỏ dở theo policy: stand, refund (trả lại cược) hoặc forfeit (mất cược)"""
+        if self.game_over:
+            return
+        if policy not in EXPIRY_POLICIES:
+            raise ValueError(f"Unknown expiry policy: {policy}")
+        
+        if policy == "stand":
+            while not self.game_over:
+                self.player_stand()
+            return
+        
+        self.game_over = True
+        self.deck.end_hand(self)
+        self.active = len(self.hands)
+        self.result = "EXPIRED"
+        self.payout = self.bet if policy == "refund" else 0
+    
+    def to_state(self) -> bytes:
+        """Snapshot nhị phân gọn của ván (không gồm shoe)"""
+        flags = (_STATE_GAME_OVER if self.game_over else 0) | (_STATE_SETTLED if self.settled else 0)
+        parts = [_STATE_HEADER.pack(
+            _STATE_VERSION, flags, _RESULT_CODES.get(self.result, 0),
+            self.user_id, self.payout, self.luck_factor, self.active,
+            len(self.hands), len(self.dealer_hand), bytes.fromhex(self.round_id)
+        )]
+        for i, hand in enumerate(self.hands):
+            parts.append(_HAND_HEADER.pack(
+                self.bets[i], self.hand_payouts[i], self.hand_flags[i],
+                _RESULT_CODES.get(self.hand_results[i], 0), len(hand)
+            ))
+            parts.append(bytes(hand.cards))
+        parts.append(bytes(self.dealer_hand.cards))
+        return b"".join(parts)
+    
+    @classmethod
+    def from_state(cls, data: bytes, shoe: Optional[Shoe] = None) -> "BlackjackGame":
+        """Dựng lại ván từ to_state(), rút tiếp từ `shoe` của bàn.
+
+        Snapshot hỏng có thể ném ValueError, struct.error hoặc IndexError.
+        """
+        (version, flags, result, user_id, payout, luck_factor, active,
+         hand_count, dealer_count, round_id) = _STATE_HEADER.unpack_from(data)
+        if version != _STATE_VERSION:
+            raise ValueError(f"Unsupported blackjack state version: {version}")
+        offset = _STATE_HEADER.size
+        
+        game = cls._blank(user_id, luck_factor, shoe)
+        game.round_id = round_id.hex()
+        for _ in range(hand_count):
+            bet, hand_payout, hand_flags, hand_result_code, card_count = _HAND_HEADER.unpack_from(data, offset)
+            offset += _HAND_HEADER.size
+            game.hands.append(Hand(data[offset:offset + card_count]))
+            offset += card_count
+            game.bets.append(bet)
+            game.hand_flags.append(hand_flags)
+            game.hand_results.append(RESULTS[hand_result_code])
+            game.hand_payouts.append(hand_payout)
+        if offset + dealer_count != len(data):
+            raise ValueError(f"Blackjack state has {len(data)} bytes, expected {offset + dealer_count}")
+        game.dealer_hand = Hand(data[offset:])
+        game.active = active
+        game.game_over = bool(flags & _STATE_GAME_OVER)
+        game.settled = bool(flags & _STATE_SETTLED)
+        game.result = RESULTS[result]
+        game.payout = payout
+        if game.game_over:
+            game.deck.end_hand(game)
+        return game
+    
+    @classmethod
+    def _blank(cls, user_id: int, luck_factor: float, shoe: Optional[Shoe]) -> "BlackjackGame":
+        game = cls.__new__(cls)
+        game.user_id = user_id
+        game.round_id = new_round_id()
+        game.luck_factor = luck_factor
+        game.deck = shoe if shoe is not None else Shoe()
+        # Ván dựng lại đang chơi dở: giữ shoe đến khi kết thúc
+        game.deck.hold(game)
+        game.hands = []
+        game.bets = []
+        game.hand_flags = bytearray()
+        game.hand_results = []
+        game.hand_payouts = []
+        game.active = 0
+        game.dealer_hand = Hand()
+        game.game_over = False
+        game.result = ""
+        game.payout = 0
+        game.settled = False
+        return game
     
     def get_game_state(self) -> Dict:
         """Lấy trạng thái game"""
-        player_value, player_soft = self.calculate_hand_value(self.player_hand)
-        dealer_value, dealer_soft = self.calculate_hand_value(self.dealer_hand)
+        player_value = self.player_hand.value
+        dealer_value = self.dealer_hand.value
         
         return {
             "player_hand": [str(card) for card in self.player_hand],
@@ -157,6 +349,18 @@ class BlackjackGame:
             "result": self.result,
             "bet": self.bet,
             "payout": self.payout,
-            "can_double": len(self.player_hand) == 2 and not self.game_over,
-            "can_split": self.can_split() and not self.game_over
-        }
\ No newline at end of file
+            "can_double": self.can_double(),
+            "can_split": self.can_split(),
+            "hands": [
+                {
+                    "cards": [str(card) for card in hand],
+                    "value": hand.value,
+                    "bet": self.bets[i],
+                    "result": self.hand_results[i],
+                    "payout": self.hand_payouts[i],
+                    "doubled": bool(self.hand_flags[i] & HAND_DOUBLED),
+                    "active": i == self.active
+                }
+                for i, hand in enumerate(self.hands)
+            ]
+        }
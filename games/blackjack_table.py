@@ -0,0 +1,129 @@
+from typing import Dict, List, Optional
+
+from .blackjack import hand_result, play_dealer
+from .hand import Hand
+from .rng import new_round_id
+from .shoe import Shoe
+from config import config
+
+class Seat:
+    """Một người chơi trong vòng của bàn"""
+    __slots__ = ("user_id", "name", "bet", "hand", "done", "result", "payout")
+
+    def __init__(self, user_id: int, name: str, bet: int):
+        self.user_id = user_id
+        self.name = name
+        self.bet = bet
+        self.hand = Hand()
+        self.done = False
+        self.result = ""
+        self.payout = 0
+
+    def can_double(self) -> bool:
+        return not self.done and len(self.hand) == 2
+
+class BlackjackTable:
+    """Bàn Blackjack nhiều người: các seat cùng chơi với một dealer.
+
+    Vòng chơi: "betting" (nhận seat trong thời gian đặt cược) -> deal() ->
+    "playing" (mỗi seat hit/stand/double độc lập) -> khi mọi seat xong thì
+    dealer chơi một lần và finish() tính kết quả cho cả bàn -> "finished".
+    Bàn chỉ giữ trạng thái ván; trừ/cộng tiền do cog làm (settle_many).
+    """
+
+    BETTING = "betting"
+    PLAYING = "playing"
+    FINISHED = "finished"
+
+    def __init__(self, shoe: Shoe, max_seats: Optional[int] = None):
+        self.shoe = shoe
+        self.round_id = new_round_id()  # Chung cho mọi seat của vòng
+        self.max_seats = max_seats or config.TABLE_MAX_SEATS
+        self.seats: Dict[int, Seat] = {}  # Giữ thứ tự vào bàn
+        self.dealer_hand = Hand()
+        self.phase = self.BETTING
+
+    def join(self, user_id: int, name: str, bet: int) -> Optional[str]:
+        """Thêm seat trong lúc đặt cược, trả về lý do nếu không được"""
+        if self.phase != self.BETTING:
+            return "Vòng này đã bắt đầu, chờ vòng sau!"
+        if user_id in self.seats:
+            return "Bạn đã ngồi vào bàn này rồi!"
+        if len(self.seats) >= self.max_seats:
+            return "Bàn đã đủ người!"
+        self.seats[user_id] = Seat(user_id, name, bet)
+        return None
+
+    def leave(self, user_id: int) -> Optional[Seat]:
+        """Bỏ seat trước khi chia bài (ví dụ không đủ tiền cược)"""
+        if self.phase != self.BETTING:
+            return None
+        return self.seats.pop(user_id, None)
+
+    def deal(self):
+        """Chia 2 lá cho mỗi seat và dealer từ shoe của bàn"""
+        self.shoe.begin_hand(self)
+        for _ in range(2):
+            for seat in self.seats.values():
+                seat.hand.append(self.shoe.draw_index())
+            self.dealer_hand.append(self.shoe.draw_index())
+
+        for seat in self.seats.values():
+            # Blackjack thì không cần chơi tiếp
+            if seat.hand.is_blackjack():
+                seat.done = True
+        self.phase = self.PLAYING
+
+    def _active_seat(self, user_id: int) -> Optional[Seat]:
+        seat = self.seats.get(user_id)
+        if self.phase != self.PLAYING or seat is None or seat.done:
+            return None
+        return seat
+
+    def hit(self, user_id: int) -> bool:
+        seat = self._active_seat(user_id)
+        if seat is None:
+            return False
+        seat.hand.append(self.shoe.draw_index())
+        if seat.hand.value >= 21:
+            seat.done = True
+        return True
+
+    def stand(self, user_id: int) -> bool:
+        seat = self._active_seat(user_id)
+        if seat is None:
+            return False
+        seat.done = True
+        return True
+
+    def double(self, user_id: int) -> bool:
+        """Gấp đôi cược và rút đúng một lá; cog trừ thêm tiền cược trước khi gọi"""
+        seat = self._active_seat(user_id)
+        if seat is None or not seat.can_double():
+            return False
+        seat.bet *= 2
+        seat.hand.append(self.shoe.draw_index())
+        seat.done = True
+        return True
+
+    def stand_all(self):
+        """Các seat chưa xong tự dừng (hết thời gian action)"""
+        for seat in self.seats.values():
+            seat.done = True
+
+    @property
+    def all_done(self) -> bool:
+        return all(seat.done for seat in self.seats.values())
+
+    def finish(self) -> List[Seat]:
+        """Dealer chơi một lần cho cả bàn rồi tính kết quả mọi seat"""
+        self.stand_all()
+        # Dealer chỉ cần rút khi còn seat chưa quá 21
+        if any(not seat.hand.is_bust() for seat in self.seats.values()):
+            play_dealer(self.dealer_hand, self.shoe)
+
+        for seat in self.seats.values():
+            seat.result, seat.payout = hand_result(seat.hand, self.dealer_hand, seat.bet)
+        self.phase = self.FINISHED
+        self.shoe.end_hand(self)
+        return list(self.seats.values())
@@ -1,7 +1,9 @@
-import random
-from typing import List, Tuple, Dict
+from array import array
+from typing import List, Tuple, Dict, Optional
 from enum import Enum
 
+from .rng import RandomPool, RngState, default_pool
+
 class CardSuit(Enum):
     HEARTS = "hearts"
     DIAMONDS = "diamonds"
@@ -23,47 +25,110 @@ class CardValue(Enum):
     QUEEN = ("Q", 10, 10)
     KING = ("K", 10, 10)
 
+SUIT_EMOJIS = {
+    CardSuit.HEARTS: "♥",
+    CardSuit.DIAMONDS: "♦",
+    CardSuit.CLUBS: "♣",
+    CardSuit.SPADES: "♠"
+}
+
+# Mỗi lá bài là một số 0-51: index = suit * 13 + value.
+# Các bảng tra bên dưới được tính một lần lúc import.
+CARDS_PER_DECK = 52
+_SUITS = list(CardSuit)
+_VALUES = list(CardValue)
+_SUIT_INDEX = {suit: i for i, suit in enumerate(_SUITS)}
+_VALUE_INDEX = {value: i for i, value in enumerate(_VALUES)}
+
+CARD_SUIT: Tuple[CardSuit, ...] = tuple(_SUITS[i // 13] for i in range(CARDS_PER_DECK))
+CARD_RANK: Tuple[CardValue, ...] = tuple(_VALUES[i % 13] for i in range(CARDS_PER_DECK))
+CARD_HARD_VALUE: Tuple[int, ...] = tuple(rank.value[1] for rank in CARD_RANK)
+CARD_SOFT_VALUE: Tuple[int, ...] = tuple(rank.value[2] for rank in CARD_RANK)
+CARD_IS_ACE: Tuple[bool, ...] = tuple(rank is CardValue.ACE for rank in CARD_RANK)
+CARD_STR: Tuple[str, ...] = tuple(
+    f"{CARD_RANK[i].value[0]}{SUIT_EMOJIS[CARD_SUIT[i]]}" for i in range(CARDS_PER_DECK)
+)
+
 class Card:
+    """View mỏng trên một index lá bài, giữ API cũ (suit, value, get_value...)"""
+    __slots__ = ("index",)
+
     def __init__(self, suit: CardSuit, value: CardValue):
-        self.suit = suit
-        self.value = value
-    
+        self.index = _SUIT_INDEX[suit] * 13 + _VALUE_INDEX[value]
+
+    @classmethod
+    def from_index(cls, index: int) -> "Card":
+        """Lấy lá bài dùng chung theo index (không cấp phát)"""
+        return CARDS[index]
+
+    @property
+    def suit(self) -> CardSuit:
+        return CARD_SUIT[self.index]
+
+    @property
+    def value(self) -> CardValue:
+        return CARD_RANK[self.index]
+
     def __str__(self) -> str:
-        suit_emojis = {
-            CardSuit.HEARTS: "♥",
-            CardSuit.DIAMONDS: "♦",
-            CardSuit.CLUBS: "♣",
-            CardSuit.SPADES: "♠"
-        }
-        return f"{self.value.value[0]}{suit_emojis[self.suit]}"
-    
+        return CARD_STR[self.index]
+
+    def __repr__(self) -> str:
+        return f"Card({CARD_STR[self.index]})"
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Card) and other.index == self.index
+
+    def __hash__(self) -> int:
+        return self.index
+
     def get_value(self) -> int:
-        return self.value.value[1]
-    
+        return CARD_HARD_VALUE[self.index]
+
     def get_soft_value(self) -> int:
-        return self.value.value[2]
+        return CARD_SOFT_VALUE[self.index]
+
+def _make_card(index: int) -> Card:
+    card = object.__new__(Card)
+    card.index = index
+    return card
+
+# 52 lá bài dùng chung, Deck.draw trả về các object này
+CARDS: Tuple[Card, ...] = tuple(_make_card(i) for i in range(CARDS_PER_DECK))
 
 class Deck:
-    def __init__(self, num_decks: int = 1):
-        self.cards: List[Card] = []
+    def __init__(self, num_decks: int = 1, rng: Optional[RandomPool] = None):
         self.num_decks = num_decks
+        self.rng = rng if rng is not None else default_pool()
+        # Vị trí của rng lúc xáo lần gần nhất: đủ để dựng lại đúng thứ tự bài
+        self.shuffle_state: Optional[RngState] = None
+        # Bộ bài chưa xáo, mỗi phần tử 1 byte
+        self._template = array('B', range(CARDS_PER_DECK)) * num_decks
+        self.cards = array('B')
         self.reset()
-    
+
     def reset(self):
         """Reset bộ bài"""
-        self.cards = []
-        for _ in range(self.num_decks):
-            for suit in CardSuit:
-                for value in CardValue:
-                    self.cards.append(Card(suit, value))
+        self.cards = array('B', self._template)
         self.shuffle()
-    
+
     def shuffle(self):
         """Xáo bài"""
-        random.shuffle(self.cards)
-    
+        self.shuffle_state = self.rng.state
+        self.rng.shuffle(self.cards)
+
+    def _refill(self):
+        """Hết bài giữa ván: mặc định xáo lại cả bộ"""
+        self.reset()
+
+    def draw_index(self) -> int:
+        """Rút bài, trả về index 0-51"""
+        if not self.cards:
+            self._refill()
+        return self.cards.pop()
+
     def draw(self) -> Card:
         """Rút bài"""
-        if not self.cards:
-            self.reset()
-        return self.cards.pop()
\ No newline at end of file
+        return CARDS[self.draw_index()]
+
+    def __len__(self) -> int:
+        return len(self.cards)
@@ -0,0 +1,73 @@
+from typing import Iterable, Iterator, Tuple, Union
+
+from .card_game import Card, CARDS, CARD_HARD_VALUE, CARD_IS_ACE, CARD_STR
+
+# HAND_VALUES[hard][có ace] = (điểm, soft). Một ace được tính 11 nếu không
+# làm quá 21; "soft" nghĩa là đang có ace được tính 11.
+MAX_TABLE_HARD = 64
+
+def _evaluate(hard: int, has_ace: bool) -> Tuple[int, bool]:
+    if has_ace and hard + 10 <= 21:
+        return hard + 10, True
+    return hard, False
+
+HAND_VALUES: Tuple[Tuple[Tuple[int, bool], Tuple[int, bool]], ...] = tuple(
+    (_evaluate(hard, False), _evaluate(hard, True)) for hard in range(MAX_TABLE_HARD)
+)
+
+class Hand:
+    """Tay bài lưu index lá bài trong bytearray, cập nhật tổng điểm khi thêm bài.
+
+    Đọc điểm và soft là O(1) nhờ bảng HAND_VALUES.
+    """
+    __slots__ = ("cards", "hard", "aces")
+
+    def __init__(self, cards: Iterable[Union[Card, int]] = ()):
+        self.cards = bytearray()
+        self.hard = 0
+        self.aces = 0
+        for card in cards:
+            self.append(card)
+
+    def append(self, card: Union[Card, int]):
+        """Thêm một lá (Card hoặc index 0-51)"""
+        index = card if isinstance(card, int) else card.index
+        self.cards.append(index)
+        self.hard += CARD_HARD_VALUE[index]
+        if CARD_IS_ACE[index]:
+            self.aces += 1
+
+    def _lookup(self) -> Tuple[int, bool]:
+        if self.hard < MAX_TABLE_HARD:
+            return HAND_VALUES[self.hard][self.aces > 0]
+        return _evaluate(self.hard, self.aces > 0)
+
+    @property
+    def value(self) -> int:
+        return self._lookup()[0]
+
+    @property
+    def soft(self) -> bool:
+        return self._lookup()[1]
+
+    def total(self) -> Tuple[int, bool]:
+        """(điểm, soft)"""
+        return self._lookup()
+
+    def is_bust(self) -> bool:
+        return self.hard > 21
+
+    def is_blackjack(self) -> bool:
+        return len(self.cards) == 2 and self._lookup()[0] == 21
+
+    def __len__(self) -> int:
+        return len(self.cards)
+
+    def __iter__(self) -> Iterator[Card]:
+        return (CARDS[index] for index in self.cards)
+
+    def __getitem__(self, position: int) -> Card:
+        return CARDS[self.cards[position]]
+
+    def __str__(self) -> str:
+        return " ".join(CARD_STR[index] for index in self.cards)
@@ -0,0 +1,150 @@
+"""Provably fair (commit/reveal) cho Bầu Cua và Xóc Đĩa.
+
+Mỗi người chơi có một cặp seed: server seed bí mật (chỉ công bố hash SHA-256
+trước khi chơi) và client seed do người chơi chọn. Ván thứ `nonce` lấy số
+ngẫu nhiên từ dãy HMAC-SHA256(server_seed, "client_seed:nonce:block"), mỗi
+block 32 byte cho 8 số [0, 1). Khi đổi seed, server seed cũ được công bố và
+ai cũng có thể tính lại kết quả mọi ván đã chơi với nó.
+
+FairPool có cùng API với RandomPool nên game dùng nó thay cho rng thường mà
+không cần sửa luật chơi; kiểm tra lại một ván chính là chạy lại game.
+"""
+import hashlib
+import hmac
+import secrets
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Union
+
+import numpy as np
+
+from .bau_cua import BauCuaGame
+from .rng import RandomPool, RngState
+from .xoc_dia import XocDiaGame
+
+FLOATS_PER_BLOCK = 8  # 32 byte HMAC = 8 số 4 byte
+_SCALE = 1.0 / 2 ** 32
+
+FAIR_GAMES = ("bau_cua", "xoc_dia")
+
+def new_server_seed() -> str:
+    return secrets.token_hex(32)
+
+def new_client_seed() -> str:
+    return secrets.token_hex(8)
+
+def hash_seed(server_seed: str) -> str:
+    """Cam kết công bố trước khi chơi"""
+    return hashlib.sha256(server_seed.encode()).hexdigest()
+
+class FairPool(RandomPool):
+    """Dãy số [0, 1) của một ván, suy ra từ HMAC của (server seed, client seed, nonce)"""
+
+    def __init__(self, server_seed: str, client_seed: str, nonce: int,
+                 mac: Optional["hmac.HMAC"] = None, server_seed_hash: Optional[str] = None):
+        # Không gọi RandomPool.__init__: không cần PCG64
+        self.seed = nonce
+        self.size = FLOATS_PER_BLOCK
+        self.server_seed_hash = server_seed_hash
+        self.client_seed = client_seed
+        self.nonce = nonce
+        # HMAC đã nạp key, copy() cho mỗi block (kiểm tra hàng loạt dùng chung một object)
+        self._mac = mac if mac is not None else hmac.new(server_seed.encode(), digestmod=hashlib.sha256)
+        self._prefix = f"{client_seed}:{nonce}:".encode()
+        self._generated = 0  # Số giá trị đã sinh (kể cả đang nằm trong lô)
+        self._buffer = np.empty(0)
+        self._pos = 0
+        self.consumed = 0
+        self.refills = 0
+
+    @property
+    def state(self) -> RngState:
+        return self.nonce, self.consumed
+
+    def _block(self, index: int) -> bytes:
+        mac = self._mac.copy()
+        mac.update(self._prefix + str(index).encode())
+        return mac.digest()
+
+    def _generate(self, n: int) -> np.ndarray:
+        start = self._generated
+        first = start // FLOATS_PER_BLOCK
+        last = (start + n - 1) // FLOATS_PER_BLOCK
+        raw = b"".join(self._block(i) for i in range(first, last + 1))
+        words = np.frombuffer(raw, dtype=">u4")
+        offset = start - first * FLOATS_PER_BLOCK
+        self._generated += n
+        return words[offset:offset + n] * _SCALE
+
+def round_ref(pool: FairPool) -> str:
+    """Mã ván ngắn để ghi vào lịch sử: <16 ký tự đầu của hash>#<nonce>"""
+    return f"{pool.server_seed_hash[:16]}#{pool.nonce}"
+
+def outcome_text(game) -> str:
+    """Kết quả ván dạng ngắn để lưu và so khi kiểm tra"""
+    if isinstance(game, BauCuaGame):
+        return ",".join(animal.name for animal in game.dice_results)
+    if isinstance(game, XocDiaGame):
+        return "".join("1" if coin else "0" for coin in game.coin_results)
+    raise ValueError(f"Game không hỗ trợ provably fair: {type(game).__name__}")
+
+def replay_game(game_type: str, server_seed: str, client_seed: str, nonce: int,
+                mac: Optional["hmac.HMAC"] = None) -> Union[BauCuaGame, XocDiaGame]:
+    """Chơi lại ván `nonce` (không có cược, luck factor 1.0 như khi chơi thật)"""
+    pool = FairPool(server_seed, client_seed, nonce, mac)
+    if game_type == "bau_cua":
+        return BauCuaGame({}, 0, 1.0, rng=pool)
+    if game_type == "xoc_dia":
+        return XocDiaGame({}, 0, 1.0, rng=pool)
+    raise ValueError(f"Game không hỗ trợ provably fair: {game_type}")
+
+def replay(game_type: str, server_seed: str, client_seed: str, nonce: int,
+           mac: Optional["hmac.HMAC"] = None) -> str:
+    """Kết quả dạng outcome_text của ván `nonce`"""
+    return outcome_text(replay_game(game_type, server_seed, client_seed, nonce, mac))
+
+@dataclass
+class FairRoundRecord:
+    """Một ván đã lưu: đủ để tính lại khi server seed được công bố"""
+    id: int
+    game_type: str
+    server_seed_hash: str
+    client_seed: str
+    nonce: int
+    outcome: str
+
+@dataclass
+class VerifyReport:
+    checked: int = 0
+    unrevealed: int = 0  # Server seed còn đang dùng, chưa kiểm tra được
+    mismatched: List[int] = field(default_factory=list)  # id các ván không khớp
+
+def verify_rounds(rounds: Iterable[FairRoundRecord], server_seeds: Dict[str, str],
+                  report: Optional[VerifyReport] = None) -> VerifyReport:
+    """Kiểm tra hàng loạt ván theo các server seed đã công bố (hash -> seed).
+
+    Mỗi server seed chỉ hash và nạp key HMAC một lần cho mọi ván của nó.
+    """
+    report = report or VerifyReport()
+    macs: Dict[str, Optional[hmac.HMAC]] = {}
+    for record in rounds:
+        mac = macs.get(record.server_seed_hash, False)
+        if mac is False:
+            seed = server_seeds.get(record.server_seed_hash)
+            # Seed công bố phải khớp với cam kết đã đưa ra
+            if seed is not None and hash_seed(seed) == record.server_seed_hash:
+                mac = hmac.new(seed.encode(), digestmod=hashlib.sha256)
+            else:
+                mac = None
+            macs[record.server_seed_hash] = mac
+
+        if mac is None:
+            if record.server_seed_hash in server_seeds:
+                report.mismatched.append(record.id)
+            else:
+                report.unrevealed += 1
+            continue
+
+        report.checked += 1
+        if replay(record.game_type, "", record.client_seed, record.nonce, mac) != record.outcome:
+            report.mismatched.append(record.id)
+    return report
@@ -0,0 +1,131 @@
+"""Nguồn ngẫu nhiên cho các game: PCG64 (NumPy) có seed ghi lại được.
+
+Mỗi RandomPool là một dãy số [0, 1) sinh từ một PCG64, được sinh sẵn theo lô
+(RNG_POOL_SIZE số một lần) thay vì gọi `random` cho từng lá bài / xúc xắc /
+đồng xu. Vị trí trong dãy là cặp (seed, số giá trị đã dùng): ghi cặp này lúc
+bắt đầu một ván là đủ để chơi lại đúng ván đó (PCG64.advance nhảy thẳng tới
+vị trí, không phải sinh lại từ đầu).
+
+Seed mặc định lấy từ `secrets` (128 bit); đặt RNG_SEED để cố định seed khi
+test hoặc khi cần tái hiện cả một phiên chạy.
+"""
+import secrets
+from array import array
+from bisect import bisect_right
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+from config import config
+
+RngState = Tuple[int, int]  # (seed, số giá trị đã dùng)
+
+def new_seed() -> int:
+    """Seed 128 bit từ nguồn ngẫu nhiên của hệ điều hành"""
+    return secrets.randbits(128)
+
+def new_round_id() -> str:
+    """Mã ván 16 ký tự hex, nối các dòng lịch sử giao dịch của cùng một ván"""
+    return secrets.token_hex(8)
+
+def derive_seed(*key: int) -> int:
+    """Seed cho một pool: ngẫu nhiên, hoặc suy ra từ RNG_SEED và `key` nếu đã cố định"""
+    if config.RNG_SEED is None:
+        return new_seed()
+    words = np.random.SeedSequence(config.RNG_SEED, spawn_key=key).generate_state(4, np.uint32)
+    return int.from_bytes(words.tobytes(), "little")
+
+def format_state(state: RngState) -> str:
+    """Dạng ngắn để ghi vào lịch sử giao dịch: <seed hex>@<vị trí>"""
+    seed, offset = state
+    return f"{seed:x}@{offset}"
+
+def parse_state(text: str) -> RngState:
+    seed, offset = text.strip().split("@")
+    return int(seed, 16), int(offset)
+
+class RandomPool:
+    """Dãy số ngẫu nhiên [0, 1) từ một PCG64, sinh sẵn theo lô"""
+
+    def __init__(self, seed: Optional[int] = None, size: Optional[int] = None):
+        self.seed = seed if seed is not None else new_seed()
+        self.size = size or config.RNG_POOL_SIZE
+        self._bit_generator = np.random.PCG64(self.seed)
+        self._generator = np.random.Generator(self._bit_generator)
+        self._buffer = np.empty(0)
+        self._pos = 0
+        self.consumed = 0  # Số giá trị đã dùng kể từ seed
+        self.refills = 0
+
+    @classmethod
+    def from_state(cls, state: RngState, size: Optional[int] = None) -> "RandomPool":
+        """Pool đứng đúng vị trí `state`, dùng để chơi lại một ván"""
+        seed, offset = state
+        pool = cls(seed, size)
+        pool._bit_generator.advance(offset)
+        pool.consumed = offset
+        return pool
+
+    @property
+    def state(self) -> RngState:
+        """Vị trí hiện tại; ghi lại trước khi chơi để có thể replay"""
+        return self.seed, self.consumed
+
+    def _generate(self, n: int) -> np.ndarray:
+        """n giá trị kế tiếp của dãy"""
+        return self._generator.random(n)
+
+    def _refill(self):
+        self._buffer = self._generate(self.size)
+        self._pos = 0
+        self.refills += 1
+
+    def random(self) -> float:
+        """Một số trong [0, 1)"""
+        if self._pos >= len(self._buffer):
+            self._refill()
+        value = float(self._buffer[self._pos])
+        self._pos += 1
+        self.consumed += 1
+        return value
+
+    def take(self, n: int) -> np.ndarray:
+        """n số trong [0, 1), theo đúng thứ tự của dãy"""
+        available = len(self._buffer) - self._pos
+        if n <= available:
+            values = self._buffer[self._pos:self._pos + n]
+            self._pos += n
+        else:
+            # Phần còn lại của lô cũ, rồi phần thiếu (lô lớn thì sinh thẳng)
+            head = self._buffer[self._pos:]
+            rest = n - available
+            if rest > self.size:
+                values = np.concatenate((head, self._generate(rest)))
+                self._buffer = np.empty(0)
+                self._pos = 0
+            else:
+                self._refill()
+                values = np.concatenate((head, self._buffer[:rest]))
+                self._pos = rest
+        self.consumed += n
+        return values
+
+    def choice(self, cum_weights: Sequence[float]) -> int:
+        """Index theo trọng số lũy kế (như random.choices với cum_weights)"""
+        return bisect_right(cum_weights, self.random() * cum_weights[-1])
+
+    def shuffle(self, cards: array):
+        """Xáo tại chỗ một array('B'): sắp theo len(cards) số ngẫu nhiên"""
+        view = np.frombuffer(cards, dtype=np.uint8)
+        view[:] = view[np.argsort(self.take(len(cards)), kind="stable")]
+        # Bỏ view để array có thể pop/resize lại
+        del view
+
+_default: Optional[RandomPool] = None
+
+def default_pool() -> RandomPool:
+    """Pool dùng chung cho các game không có pool riêng (Bầu Cua, Xóc Đĩa...)"""
+    global _default
+    if _default is None:
+        _default = RandomPool(derive_seed())
+    return _default
@@ -0,0 +1,60 @@
+"""Tính chính xác RTP (return-to-player) của Bầu Cua và Xóc Đĩa theo luck_factor.
+
+Liệt kê toàn bộ 6^3 kết quả xúc xắc và 2^4 kết quả đồng xu với xác suất đã
+điều chỉnh theo luck_factor, giống hệt cách BauCuaGame/XocDiaGame tung.
+Kết quả được memo hóa theo luck_factor nên lệnh admin trả lời tức thì.
+"""
+from functools import lru_cache
+from itertools import product
+from typing import Dict, Tuple
+
+from .bau_cua import BauCuaAnimal
+from .xoc_dia import XocDiaBetType, PAYOUT_TABLE
+
+BAU_CUA_FACES = len(BauCuaAnimal)
+BAU_CUA_DICE = 3
+XOC_DIA_COINS = 4
+
+def bau_cua_face_probabilities(bet_animals: int, luck_factor: float) -> Tuple[float, ...]:
+    """Xác suất mỗi mặt khi đặt vào `bet_animals` cửa (các cửa đặt nằm ở đầu)"""
+    weights = [luck_factor if face < bet_animals else 1.0 for face in range(BAU_CUA_FACES)]
+    total = sum(weights)
+    return tuple(w / total for w in weights)
+
+@lru_cache(maxsize=256)
+def bau_cua_rtp(bet_animals: int, luck_factor: float = 1.0) -> float:
+    """RTP khi chia đều tiền cược vào `bet_animals` cửa khác nhau"""
+    if not 1 <= bet_animals <= BAU_CUA_FACES:
+        raise ValueError("bet_animals phải từ 1 đến 6")
+
+    probabilities = bau_cua_face_probabilities(bet_animals, luck_factor)
+    expected_payout = 0.0
+    for dice in product(range(BAU_CUA_FACES), repeat=BAU_CUA_DICE):
+        p = probabilities[dice[0]] * probabilities[dice[1]] * probabilities[dice[2]]
+        # Mỗi cửa trả cược * số lần xuất hiện, mỗi cửa được 1/bet_animals tổng cược
+        hits = sum(1 for face in dice if face < bet_animals)
+        expected_payout += p * hits / bet_animals
+    return expected_payout
+
+@lru_cache(maxsize=256)
+def xoc_dia_red_count_distribution(luck_factor: float = 1.0) -> Tuple[float, ...]:
+    """Xác suất có 0..4 mặt đỏ"""
+    p_red = min(0.9, 0.5 * luck_factor)
+    distribution = [0.0] * (XOC_DIA_COINS + 1)
+    for coins in product((False, True), repeat=XOC_DIA_COINS):
+        red_count = sum(coins)
+        distribution[red_count] += p_red ** red_count * (1.0 - p_red) ** (XOC_DIA_COINS - red_count)
+    return tuple(distribution)
+
+@lru_cache(maxsize=256)
+def xoc_dia_rtp(bet_type: XocDiaBetType, luck_factor: float = 1.0) -> float:
+    """RTP của một loại cược Xóc Đĩa"""
+    distribution = xoc_dia_red_count_distribution(luck_factor)
+    return sum(p * multiplier for p, multiplier in zip(distribution, PAYOUT_TABLE[bet_type]))
+
+def rtp_table(luck_factor: float = 1.0) -> Dict[str, Dict[str, float]]:
+    """RTP của mọi loại cược, dùng cho lệnh admin và so sánh với games.sim"""
+    return {
+        "bau_cua": {f"{k}_cua": bau_cua_rtp(k, luck_factor) for k in range(1, BAU_CUA_FACES + 1)},
+        "xoc_dia": {bet_type.value: xoc_dia_rtp(bet_type, luck_factor) for bet_type in XocDiaBetType}
+    }
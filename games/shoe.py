@@ -0,0 +1,113 @@
+import weakref
+from array import array
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from .card_game import CARDS_PER_DECK, Deck
+from .rng import RandomPool, derive_seed
+from config import config
+
+class Shoe(Deck):
+    """Shoe nhiều bộ bài dùng qua nhiều ván, xáo lại khi chia tới cut card.
+
+    Các ván đang rút bài từ shoe (BlackjackGame, BlackjackTable) được giữ
+    trong một WeakSet từ begin_hand() đến end_hand(): shoe chỉ xáo lại khi
+    không còn ván nào đang chơi dở, nên bài của một ván không bị xáo giữa
+    chừng vì ván khác cùng channel bắt đầu.
+    """
+
+    def __init__(self, num_decks: Optional[int] = None, penetration: Optional[float] = None,
+                 rng: Optional[RandomPool] = None):
+        super().__init__(num_decks or config.SHOE_DECKS, rng)
+        self.penetration = penetration if penetration is not None else config.SHOE_PENETRATION
+        # Còn <= số lá này thì ván sau xáo lại
+        self.cut_card = int(len(self._template) * (1.0 - self.penetration))
+        self.hands_dealt = 0
+        self.shuffles = 1
+        self._holders = weakref.WeakSet()
+        # Đã hết bài và đang rút từ đoạn nối thêm: phải xáo lại trước ván mới
+        self.exhausted = False
+
+    def needs_shuffle(self) -> bool:
+        """Đã chia qua cut card chưa"""
+        return self.exhausted or len(self.cards) <= self.cut_card
+
+    def reset(self):
+        super().reset()
+        self.exhausted = False
+
+    def _refill(self):
+        """Shoe cạn giữa ván (cut card quá sâu hoặc nhiều ván cùng rút).
+
+        Không ván nào giữ shoe thì xáo lại như bình thường. Còn ván đang chơi
+        dở thì không xáo lại shoe mà nối thêm một đoạn bài mới xáo để các ván
+        đó rút tiếp; shoe bị đánh dấu cần xáo nên ván mới sẽ nhận shoe khác
+        (ShoeManager) hoặc shoe được xáo lại khi đã rảnh (begin_hand).
+        """
+        if not self.in_use:
+            self.reset()
+            self.shuffles += 1
+            return
+        segment = array('B', self._template)
+        self.rng.shuffle(segment)
+        self.cards.extend(segment)
+        self.exhausted = True
+
+    @property
+    def in_use(self) -> bool:
+        """Còn ván đang rút bài từ shoe"""
+        return len(self._holders) > 0
+
+    def hold(self, holder):
+        """Đánh dấu `holder` đang rút bài từ shoe (ván được khôi phục từ snapshot)"""
+        self._holders.add(holder)
+
+    def begin_hand(self, holder=None):
+        """Gọi trước mỗi ván: xáo lại nếu đã qua cut card và không ván nào đang chơi dở"""
+        if self.needs_shuffle() and not self.in_use:
+            self.reset()
+            self.shuffles += 1
+        if holder is not None:
+            self._holders.add(holder)
+        self.hands_dealt += 1
+
+    def end_hand(self, holder):
+        """Ván của `holder` đã xong, không còn rút bài"""
+        self._holders.discard(holder)
+
+TableKey = Tuple[int, int]  # (guild_id, channel_id)
+
+class ShoeManager:
+    """Giữ một shoe cho mỗi bàn (guild, channel) và chia bài từ đó qua nhiều ván.
+
+    Shoe đã qua cut card nhưng còn ván đang chơi dở thì không xáo lại được:
+    ván mới nhận một shoe mới (tiếp tục cùng dãy ngẫu nhiên), ván cũ rút tiếp
+    từ shoe cũ cho đến khi xong.
+    """
+
+    def __init__(self, num_decks: Optional[int] = None, penetration: Optional[float] = None,
+                 max_tables: Optional[int] = None):
+        self.num_decks = num_decks or config.SHOE_DECKS
+        self.penetration = penetration if penetration is not None else config.SHOE_PENETRATION
+        self.max_tables = max_tables or config.SHOE_MAX_TABLES
+        self._shoes: "OrderedDict[TableKey, Shoe]" = OrderedDict()
+
+    def get(self, guild_id: int, channel_id: int) -> Shoe:
+        """Lấy shoe của bàn, tạo mới nếu chưa có"""
+        key = (guild_id, channel_id)
+        shoe = self._shoes.get(key)
+        if shoe is None:
+            # Mỗi bàn một dãy ngẫu nhiên riêng, mỗi lô vừa đủ một lần xáo shoe
+            rng = RandomPool(derive_seed(guild_id, channel_id), self.num_decks * CARDS_PER_DECK)
+            shoe = self._shoes[key] = Shoe(self.num_decks, self.penetration, rng)
+            # Bàn lâu không chơi bị bỏ, lần sau sẽ có shoe mới
+            while len(self._shoes) > self.max_tables:
+                self._shoes.popitem(last=False)
+        else:
+            if shoe.needs_shuffle() and shoe.in_use:
+                shoe = self._shoes[key] = Shoe(self.num_decks, self.penetration, shoe.rng)
+            self._shoes.move_to_end(key)
+        return shoe
+
+    def __len__(self) -> int:
+        return len(self._shoes)
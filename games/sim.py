@@ -0,0 +1,277 @@
+"""Mô phỏng Monte Carlo (NumPy) để kiểm tra house edge của Blackjack, Bầu Cua, Xóc Đĩa.
+
+Mỗi lô mô phỏng N ván bằng mảng: xúc xắc/đồng xu sinh một lần cho cả lô,
+Blackjack rút bài từ shoe xáo theo từng hàng và chơi dealer bằng mask.
+Kết quả là lợi nhuận trên mỗi 1 đơn vị cược (EV), phương sai và khoảng tin cậy 95%.
+
+    python -m games.sim --game all --rounds 1000000 --luck 1.0 --workers 4
+"""
+import argparse
+import math
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .card_game import CARDS_PER_DECK, CARD_HARD_VALUE, CARD_IS_ACE
+from .xoc_dia import XocDiaBetType, PAYOUT_TABLE
+
+GAMES = ("blackjack", "bau_cua", "xoc_dia")
+DEFAULT_BATCH_SIZE = 20000
+Z_95 = 1.959963984540054
+
+@dataclass
+class SimResult:
+    """Thống kê lợi nhuận trên mỗi đơn vị cược của một loại cược"""
+    game: str
+    bet_type: str
+    rounds: int = 0
+    total: float = 0.0
+    total_sq: float = 0.0
+
+    def add(self, net: np.ndarray):
+        self.rounds += int(net.size)
+        self.total += float(net.sum())
+        self.total_sq += float(np.square(net).sum())
+
+    def merge(self, other: "SimResult"):
+        self.rounds += other.rounds
+        self.total += other.total
+        self.total_sq += other.total_sq
+
+    @property
+    def ev(self) -> float:
+        return self.total / self.rounds if self.rounds else 0.0
+
+    @property
+    def variance(self) -> float:
+        if self.rounds < 2:
+            return 0.0
+        mean = self.ev
+        return max(0.0, (self.total_sq - self.rounds * mean * mean) / (self.rounds - 1))
+
+    @property
+    def ci95(self) -> float:
+        """Nửa độ rộng khoảng tin cậy 95% của EV"""
+        return Z_95 * math.sqrt(self.variance / self.rounds) if self.rounds else 0.0
+
+    @property
+    def rtp(self) -> float:
+        """Return-to-player = 1 + EV"""
+        return 1.0 + self.ev
+
+# ----------------------------------------------------------------------------
+# Bầu Cua
+# ----------------------------------------------------------------------------
+
+def bau_cua_probabilities(bet_animals: int, luck_factor: float) -> np.ndarray:
+    """Xác suất mỗi mặt xúc xắc khi đặt vào `bet_animals` cửa đầu tiên (như BauCuaGame._adjust_probabilities)"""
+    weights = np.ones(6)
+    weights[:bet_animals] *= luck_factor
+    return weights / weights.sum()
+
+def simulate_bau_cua(rng: np.random.Generator, rounds: int, luck_factor: float) -> Dict[str, np.ndarray]:
+    """Lợi nhuận/đơn vị cược khi chia đều tiền cược vào 1, 2 hoặc 3 cửa"""
+    results = {}
+    for bet_animals in (1, 2, 3):
+        dice = rng.choice(6, size=(rounds, 3), p=bau_cua_probabilities(bet_animals, luck_factor))
+        # Mỗi cửa trả bet * số lần xuất hiện; tổng cược = 1 chia đều cho các cửa
+        hits = (dice < bet_animals).sum(axis=1)
+        results[f"{bet_animals}_cua"] = hits / bet_animals - 1.0
+    return results
+
+# ----------------------------------------------------------------------------
+# Xóc Đĩa
+# ----------------------------------------------------------------------------
+
+def xoc_dia_red_probability(luck_factor: float) -> float:
+    """Xác suất một đồng xu ra đỏ (như XocDiaGame.flip_coins)"""
+    return min(0.9, 0.5 * luck_factor)
+
+_XOC_DIA_MULTIPLIERS = {bet_type: np.array(PAYOUT_TABLE[bet_type], dtype=np.float64) for bet_type in XocDiaBetType}
+
+def simulate_xoc_dia(rng: np.random.Generator, rounds: int, luck_factor: float) -> Dict[str, np.ndarray]:
+    """Lợi nhuận/đơn vị cược cho từng loại cược Xóc Đĩa"""
+    red_count = (rng.random((rounds, 4)) < xoc_dia_red_probability(luck_factor)).sum(axis=1)
+    return {
+        bet_type.value: multipliers[red_count] - 1.0
+        for bet_type, multipliers in _XOC_DIA_MULTIPLIERS.items()
+    }
+
+# ----------------------------------------------------------------------------
+# Blackjack
+# ----------------------------------------------------------------------------
+
+_HARD = np.array(CARD_HARD_VALUE, dtype=np.int16)
+_ACE = np.array(CARD_IS_ACE, dtype=np.int16)
+# Số lá tối đa một ván có thể dùng (người chơi + dealer) với luật hiện tại
+_MAX_CARDS_PER_ROUND = 30
+
+def _hand_value(hard: np.ndarray, aces: np.ndarray) -> np.ndarray:
+    return hard + 10 * ((aces > 0) & (hard + 10 <= 21))
+
+class _VectorShoe:
+    """Mỗi hàng là một shoe đã xáo, con trỏ riêng cho từng ván"""
+
+    def __init__(self, rng: np.random.Generator, rounds: int, num_decks: int):
+        shoe = np.tile(np.arange(CARDS_PER_DECK, dtype=np.uint8), num_decks)
+        # Chỉ cần vài chục lá đầu của mỗi shoe
+        self.cards = rng.permuted(np.tile(shoe, (rounds, 1)), axis=1)[:, :_MAX_CARDS_PER_ROUND]
+        self.pointer = np.zeros(rounds, dtype=np.int64)
+        self.rows = np.arange(rounds)
+
+    def draw(self, mask: np.ndarray):
+        """Rút một lá cho các ván có mask=True, trả về (hard, ace) để cộng vào tay bài"""
+        card = self.cards[self.rows, self.pointer]
+        self.pointer += mask
+        return _HARD[card] * mask, _ACE[card] * mask
+
+def simulate_blackjack(rng: np.random.Generator, rounds: int, luck_factor: float,
+                       stand_on: Sequence[int] = (17,), num_decks: int = 6) -> Dict[str, np.ndarray]:
+    """Lợi nhuận/đơn vị cược với chiến thuật "rút đến khi >= N" (không double/split).
+
+    Luật giống BlackjackGame: dealer rút đến 17 (đứng ở soft 17), thắng trả 1:1,
+    blackjack trả 3:2 trừ khi dealer cũng blackjack, và luck_factor cho cơ hội
+    (luck_factor - 1) / 10 được rút thêm đến 17 (tối đa 5 lá) ngay khi chia.
+    """
+    results = {}
+    for threshold in stand_on:
+        shoe = _VectorShoe(rng, rounds, num_decks)
+        everyone = np.ones(rounds, dtype=bool)
+
+        p_hard = np.zeros(rounds, dtype=np.int16)
+        p_aces = np.zeros(rounds, dtype=np.int16)
+        d_hard = np.zeros(rounds, dtype=np.int16)
+        d_aces = np.zeros(rounds, dtype=np.int16)
+        p_cards = np.full(rounds, 2, dtype=np.int16)
+
+        for _ in range(2):
+            hard, ace = shoe.draw(everyone)
+            p_hard += hard
+            p_aces += ace
+        for _ in range(2):
+            hard, ace = shoe.draw(everyone)
+            d_hard += hard
+            d_aces += ace
+
+        # Luck factor: rút thêm đến 17, tối đa 5 lá
+        lucky = rng.random(rounds) < (luck_factor - 1.0) / 10
+        while True:
+            mask = lucky & (_hand_value(p_hard, p_aces) < 17) & (p_cards < 5)
+            if not mask.any():
+                break
+            hard, ace = shoe.draw(mask)
+            p_hard += hard
+            p_aces += ace
+            p_cards += mask
+
+        natural = (p_cards == 2) & (_hand_value(p_hard, p_aces) == 21)
+
+        # Người chơi rút đến ngưỡng
+        while True:
+            mask = _hand_value(p_hard, p_aces) < threshold
+            if not mask.any():
+                break
+            hard, ace = shoe.draw(mask)
+            p_hard += hard
+            p_aces += ace
+            p_cards += mask
+
+        player = _hand_value(p_hard, p_aces)
+        player_bust = player > 21
+        dealer_natural = _hand_value(d_hard, d_aces) == 21
+
+        # Dealer chỉ chơi khi người chơi chưa quá 21
+        while True:
+            mask = ~player_bust & (_hand_value(d_hard, d_aces) < 17)
+            if not mask.any():
+                break
+            hard, ace = shoe.draw(mask)
+            d_hard += hard
+            d_aces += ace
+
+        dealer = _hand_value(d_hard, d_aces)
+        payout = np.where(
+            player_bust, 0.0,
+            np.where(dealer > 21, 2.0,
+                     np.where(player > dealer, 2.0,
+                              np.where(player == dealer, 1.0, 0.0)))
+        )
+        # Blackjack ghi đè kết quả như determine_winner
+        payout = np.where(natural & ~dealer_natural, 2.5, payout)
+        results[f"stand_{threshold}"] = payout - 1.0
+    return results
+
+SIMULATORS: Dict[str, Callable[..., Dict[str, np.ndarray]]] = {
+    "blackjack": simulate_blackjack,
+    "bau_cua": simulate_bau_cua,
+    "xoc_dia": simulate_xoc_dia
+}
+
+# ----------------------------------------------------------------------------
+# Chạy theo lô / nhiều process
+# ----------------------------------------------------------------------------
+
+def _run_chunk(game: str, rounds: int, luck_factor: float, seed: np.random.SeedSequence,
+               batch_size: int) -> Dict[str, SimResult]:
+    rng = np.random.Generator(np.random.PCG64(seed))
+    simulate = SIMULATORS[game]
+    totals: Dict[str, SimResult] = {}
+    remaining = rounds
+    while remaining > 0:
+        batch = min(batch_size, remaining)
+        for bet_type, net in simulate(rng, batch, luck_factor).items():
+            totals.setdefault(bet_type, SimResult(game, bet_type)).add(net)
+        remaining -= batch
+    return totals
+
+def run(game: str, rounds: int, luck_factor: float = 1.0, workers: int = 1,
+        seed: Optional[int] = None, batch_size: int = DEFAULT_BATCH_SIZE) -> List[SimResult]:
+    """Mô phỏng `rounds` ván, chia đều cho `workers` process (mỗi process một seed con)"""
+    workers = max(1, workers)
+    seeds = np.random.SeedSequence(seed).spawn(workers)
+    chunks = [rounds // workers + (1 if i < rounds % workers else 0) for i in range(workers)]
+
+    if workers == 1:
+        partials = [_run_chunk(game, chunks[0], luck_factor, seeds[0], batch_size)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(_run_chunk, game, chunk, luck_factor, child, batch_size)
+                for chunk, child in zip(chunks, seeds) if chunk > 0
+            ]
+            partials = [future.result() for future in futures]
+
+    merged: Dict[str, SimResult] = {}
+    for partial in partials:
+        for bet_type, result in partial.items():
+            merged.setdefault(bet_type, SimResult(game, bet_type)).merge(result)
+    return list(merged.values())
+
+def format_results(results: List[SimResult]) -> str:
+    lines = ["%-10s %-12s %12s %10s %10s %10s %10s" % (
+        "game", "bet_type", "rounds", "EV", "±CI95", "variance", "RTP")]
+    for r in results:
+        lines.append("%-10s %-12s %12d %+10.5f %10.5f %10.4f %9.3f%%" % (
+            r.game, r.bet_type, r.rounds, r.ev, r.ci95, r.variance, r.rtp * 100))
+    return "\n".join(lines)
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description="Mô phỏng Monte Carlo house edge của các trò chơi")
+    parser.add_argument("--game", choices=GAMES + ("all",), default="all")
+    parser.add_argument("--rounds", type=int, default=1_000_000)
+    parser.add_argument("--luck", type=float, default=1.0, help="luck_factor (1.0 = bình thường)")
+    parser.add_argument("--workers", type=int, default=1, help="số process chạy song song")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    games = GAMES if args.game == "all" else (args.game,)
+    results = []
+    for game in games:
+        results.extend(run(game, args.rounds, args.luck, args.workers, args.seed, args.batch_size))
+    print(format_results(results))
+
+if __name__ == "__main__":
+    main()
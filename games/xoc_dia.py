@@ -1,7 +1,8 @@
-import random
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple
 from enum import Enum
 
+from .rng import RandomPool, default_pool
+
 class XocDiaBetType(Enum):
     EVEN = "even"  # Chẵn: 0, 2, 4 mặt đỏ
     ODD = "odd"    # Lẻ: 1, 3 mặt đỏ
@@ -11,48 +12,46 @@ class XocDiaBetType(Enum):
     THREE_WHITE = "three_white"  # 3 trắng 1 đỏ
     TWO_RED = "two_red"  # 2 đỏ 2 trắng
 
+# Hệ số trả thưởng theo số mặt đỏ (0-4) cho từng loại cược, 0 = thua
+PAYOUT_TABLE: Dict[XocDiaBetType, Tuple[int, ...]] = {
+    XocDiaBetType.EVEN: (1, 0, 1, 0, 1),
+    XocDiaBetType.ODD: (0, 1, 0, 1, 0),
+    XocDiaBetType.FOUR_RED: (0, 0, 0, 0, 8),
+    XocDiaBetType.FOUR_WHITE: (8, 0, 0, 0, 0),
+    XocDiaBetType.THREE_RED: (0, 0, 0, 4, 0),
+    XocDiaBetType.THREE_WHITE: (0, 4, 0, 0, 0),
+    XocDiaBetType.TWO_RED: (0, 0, 2, 0, 0)
+}
+
 class XocDiaGame:
-    def __init__(self, bets: Dict[XocDiaBetType, int], user_id: int, luck_factor: float = 1.0):
+    def __init__(self, bets: Dict[XocDiaBetType, int], user_id: int, luck_factor: float = 1.0,
+                 rng: Optional[RandomPool] = None):
         self.bets = bets
         self.user_id = user_id
         self.luck_factor = luck_factor
         self.coin_results: List[bool] = []  # True = đỏ, False = trắng
         self.payout = 0
         self.total_bet = sum(bets.values())
+        self.rng = rng if rng is not None else default_pool()
+        self.rng_state = self.rng.state  # Ghi lại để chơi lại đúng ván này
         
         self.flip_coins()
         self.calculate_payout()
     
     def flip_coins(self):
         """Lắc đồng xu"""
-        self.coin_results = []
-        
-        for _ in range(4):
-            # Áp dụng luck factor
-            base_prob = 0.5
-            adjusted_prob = min(0.9, base_prob * self.luck_factor)
-            result = random.random() < adjusted_prob
-            self.coin_results.append(result)
+        # Áp dụng luck factor
+        base_prob = 0.5
+        adjusted_prob = min(0.9, base_prob * self.luck_factor)
+        self.coin_results = [bool(value < adjusted_prob) for value in self.rng.take(4)]
     
     def calculate_payout(self):
         """Tính toán payout"""
         self.payout = 0
         red_count = sum(self.coin_results)
         
-        payout_rates = {
-            XocDiaBetType.EVEN: (red_count % 2 == 0, 1),
-            XocDiaBetType.ODD: (red_count % 2 == 1, 1),
-            XocDiaBetType.FOUR_RED: (red_count == 4, 8),
-            XocDiaBetType.FOUR_WHITE: (red_count == 0, 8),
-            XocDiaBetType.THREE_RED: (red_count == 3, 4),
-            XocDiaBetType.THREE_WHITE: (red_count == 1, 4),
-            XocDiaBetType.TWO_RED: (red_count == 2, 2)
-        }
-        
         for bet_type, bet_amount in self.bets.items():
-            condition, multiplier = payout_rates[bet_type]
-            if condition:
-                self.payout += bet_amount * multiplier
+            self.payout += bet_amount * PAYOUT_TABLE[bet_type][red_count]
     
     def get_game_state(self) -> Dict:
         """Lấy trạng thái game"""
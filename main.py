@@ -3,15 +3,20 @@ from discord.ext import commands
 import os
 import logging
 import sys
-from typing import Optional, Dict, Any
+from typing import Optional
 import asyncio
 from dotenv import load_dotenv
 
 # Load biến môi trường từ file .env
 load_dotenv()
 
-from database.database_manager import DatabaseManager
+from database.async_database_manager import AsyncDatabaseManager
+from database.active_game_store import ActiveGameStore
+from database.fair_seed_store import FairSeedStore
+from database.player_stats import RoundResult
+from cogs.edit_scheduler import EditScheduler
 from games.blackjack import BlackjackGame
+from games.shoe import ShoeManager
 from games.bau_cua import BauCuaGame, BauCuaAnimal
 from games.xoc_dia import XocDiaGame, XocDiaBetType
 from config import config
@@ -66,8 +71,11 @@ class CasinoBot(commands.Bot):
         
         super().__init__(command_prefix=self.get_prefix, intents=intents)
         
-        self.db = DatabaseManager()
-        self.active_games: Dict[str, Any] = {}
+        self.db = AsyncDatabaseManager()
+        self.active_games = ActiveGameStore(self.db, on_expire=self.expire_game)  # Ván đang chơi, snapshot xuống database
+        self.shoes = ShoeManager()  # Shoe Blackjack theo bàn (guild, channel)
+        self.edits = EditScheduler()  # Gom các lần sửa message game theo channel
+        self.fair_seeds = FairSeedStore(self.db)  # Seed provably fair của Bầu Cua / Xóc Đĩa
         
     async def get_prefix(self, message) -> str:
         """Lấy prefix theo guild"""
@@ -75,13 +83,38 @@ class CasinoBot(commands.Bot):
             if config.RESTRICTED_MODE and message.guild.id not in config.ALLOWED_GUILD_IDS:
                 return "!"
             
-            guild_config = self.db.get_guild_config(message.guild.id)
-            if guild_config:
-                return guild_config.prefix
+            # Tra cache trong bộ nhớ, không query database cho mỗi message
+            return self.db.get_prefix(message.guild.id)
         return config.DEFAULT_PREFIX
     
+    async def expire_game(self, user_id: int, guild_id: int, game: BlackjackGame):
+        """Kết thúc ván bị bỏ dở theo GAME_EXPIRY_POLICY và trả tiền nếu có"""
+        async with self.db.user_lock(user_id, guild_id):
+            if game.settled:
+                return
+            
+            game.expire(config.GAME_EXPIRY_POLICY)
+            if user_id not in config.ADMIN_IDS:
+                result = RoundResult("blackjack", game.bet, game.payout)
+                if game.payout > 0:
+                    kind = "refund" if game.result == "EXPIRED" else "win"
+                    await self.db.settle(
+                        user_id, guild_id, game.payout, "game",
+                        f"Blackjack {kind}: {game.payout}", result=result,
+                        game_type="blackjack", round_id=game.round_id, bet=0, payout=game.payout
+                    )
+                else:
+                    await self.db.record_results([(user_id, guild_id, result)])
+            game.settled = True
+            logger.info("Het han van blackjack cua %d o guild %d (%s, thuong %d)",
+                        user_id, guild_id, game.result, game.payout)
+    
     async def setup_hook(self):
         """Setup khi bot khởi động"""
+        # Replay journal giao dịch còn sót và chạy các task nền của database
+        await self.db.start()
+        await self.active_games.start()
+        
         # Xóa commands cũ
         await self.clear_old_commands()
         
@@ -89,6 +122,7 @@ class CasinoBot(commands.Bot):
         await self.load_extension('cogs.casino_cog')
         await self.load_extension('cogs.admin_cog')
         await self.load_extension('cogs.slash_commands')
+        await self.load_extension('cogs.table_cog')
         
         # Sync slash commands mới
         try:
@@ -99,6 +133,13 @@ class CasinoBot(commands.Bot):
         
         logger.info("Cogs loaded successfully")
     
+    async def close(self):
+        """Đóng bot và database"""
+        await self.edits.close()
+        await super().close()
+        await self.active_games.close()
+        await self.db.close()
+    
     async def clear_old_commands(self):
         """Xóa tất cả slash commands cũ"""
         try:
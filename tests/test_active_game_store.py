@@ -0,0 +1,168 @@
+"""Snapshot blackjack (to_state/from_state) và ActiveGameStore: nạp lại, hết hạn, giới hạn số ván."""
+import asyncio
+import base64
+import datetime
+import struct
+
+import pytest
+
+from database.active_game_store import ActiveGameStore, game_key
+from database.async_database_manager import AsyncDatabaseManager
+from database.database_manager import DatabaseManager
+from database.models import ActiveGame
+from games.blackjack import BlackjackGame
+from games.card_game import CARDS_PER_DECK
+from games.hand import Hand
+from games.rng import RandomPool
+from games.shoe import Shoe
+
+GUILD = 5
+
+
+def new_game(user_id=1, seed=3):
+    return BlackjackGame(100, user_id, shoe=Shoe(1, 0.75, RandomPool(seed, CARDS_PER_DECK)))
+
+
+def split_game():
+    game = new_game()
+    game.hands[0] = Hand((7, 20))  # 8♥ 8♦
+    assert game.player_split()
+    game.player_hit()
+    return game
+
+
+def same_game(a, b):
+    assert [list(h.cards) for h in a.hands] == [list(h.cards) for h in b.hands]
+    assert list(a.dealer_hand.cards) == list(b.dealer_hand.cards)
+    assert (a.user_id, a.round_id, a.luck_factor, a.active) == (b.user_id, b.round_id, b.luck_factor, b.active)
+    assert (a.bets, bytes(a.hand_flags), a.hand_results, a.hand_payouts) == \
+        (b.bets, bytes(b.hand_flags), b.hand_results, b.hand_payouts)
+    assert (a.game_over, a.settled, a.result, a.payout) == (b.game_over, b.settled, b.result, b.payout)
+
+
+@pytest.mark.parametrize("build", [new_game, split_game])
+def test_state_round_trip(build):
+    game = build()
+    same_game(game, BlackjackGame.from_state(game.to_state()))
+
+    while not game.game_over:
+        game.player_stand()
+    game.determine_winner()
+    game.settled = True
+    restored = BlackjackGame.from_state(game.to_state())
+    same_game(game, restored)
+    assert not restored.deck.in_use
+
+
+def test_restored_game_holds_shoe():
+    shoe = Shoe(1, 0.75, RandomPool(1, CARDS_PER_DECK))
+    restored = BlackjackGame.from_state(new_game().to_state(), shoe=shoe)
+    assert restored.deck is shoe and shoe.in_use
+
+
+@pytest.mark.parametrize("mangle", [
+    lambda data: data[:10],                  # header cụt: struct.error
+    lambda data: data[:-1],                  # thiếu lá dealer
+    lambda data: b"\x09" + data[1:],         # version lạ
+    lambda data: data[:-1] + b"\xff",        # lá bài không tồn tại: IndexError
+    lambda data: b"",
+])
+def test_corrupt_state_raises_decode_error(mangle):
+    data = mangle(new_game().to_state())
+    with pytest.raises((ValueError, IndexError, struct.error)):
+        game = BlackjackGame.from_state(data)
+        game.dealer_hand.value  # lá bài sai chỉ lộ ra khi tính điểm
+
+
+@pytest.fixture
+def db(tmp_path):
+    manager = AsyncDatabaseManager(DatabaseManager("sqlite:///" + str(tmp_path / "games.db")), max_workers=1)
+    yield manager
+    manager.executor.shutdown()
+    manager.sync.engine.dispose()
+
+
+def encode(game):
+    return base64.b64encode(game.to_state()).decode("ascii")
+
+
+def saved_keys(db):
+    return {game_key(user_id, guild_id) for user_id, guild_id, *_ in db.sync.get_all_active_games()}
+
+
+def test_load_all_skips_and_deletes_bad_rows(db):
+    good = new_game(1)
+    settled = new_game(2)
+    settled.settled = True
+    db.sync.sync_active_games([
+        (1, GUILD, "blackjack", encode(good)),
+        (2, GUILD, "blackjack", encode(settled)),
+        (3, GUILD, "blackjack", base64.b64encode(good.to_state()[:12]).decode("ascii")),
+        (4, GUILD, "blackjack", encode(good)[:-8] + "////////"),
+        (5, GUILD, "poker", encode(good)),
+        (6, GUILD, "blackjack", "not base64!"),
+    ], [])
+
+    async def scenario():
+        store = ActiveGameStore(db, timeout=60)
+        loaded = await store.load_all()
+        missing = await store.load(4, GUILD)
+        await store.flush()
+        return store, loaded, missing
+
+    store, loaded, missing = asyncio.run(scenario())
+    assert loaded == 1 and missing is None
+    same_game(good, store[game_key(1, GUILD)])
+    assert saved_keys(db) == {game_key(1, GUILD)}
+
+
+def test_flush_keeps_finished_unpaid_games(db):
+    async def scenario():
+        store = ActiveGameStore(db, timeout=60)
+        playing, finished, paid = new_game(1), new_game(2), new_game(3)
+        for game in (finished, paid):
+            game.determine_winner()
+        paid.settled = True
+        for user_id, game in ((1, playing), (2, finished), (3, paid)):
+            store[game_key(user_id, GUILD)] = game
+        await store.flush()
+        return finished
+
+    finished = asyncio.run(scenario())
+    assert saved_keys(db) == {game_key(1, GUILD), game_key(2, GUILD)}
+    _, data = db.sync.get_active_game(2, GUILD)
+    restored = BlackjackGame.from_state(base64.b64decode(data))
+    assert restored.game_over and not restored.settled
+    assert restored.payout == finished.payout
+
+
+def test_reaper_expires_stale_and_evicts_oldest(db):
+    stale = new_game(1)
+    db.sync.sync_active_games([(1, GUILD, "blackjack", encode(stale))], [])
+    with db.sync.engine.begin() as conn:
+        conn.execute(ActiveGame.__table__.update().values(
+            created_at=datetime.datetime.utcnow() - datetime.timedelta(seconds=600)
+        ))
+
+    async def scenario():
+        expired = []
+
+        async def on_expire(user_id, guild_id, game):
+            expired.append(user_id)
+            game.expire("refund")
+            game.settled = True
+
+        store = ActiveGameStore(db, flush_interval=0.01, timeout=60, max_games=2, on_expire=on_expire)
+        await store.start()
+        for user_id in (2, 3, 4):
+            store[game_key(user_id, GUILD)] = new_game(user_id)
+            await asyncio.sleep(0)
+        await asyncio.sleep(0.1)
+        await store.close()
+        return store, expired
+
+    store, expired = asyncio.run(scenario())
+    assert expired == [1, 2]
+    assert sorted(store) == [game_key(3, GUILD), game_key(4, GUILD)]
+    assert store.stats()["expired"] == 2 and store.stats()["evicted"] == 1
+    assert saved_keys(db) == {game_key(3, GUILD), game_key(4, GUILD)}
@@ -0,0 +1,102 @@
+"""Autoplay Bầu Cua / Xóc Đĩa: khớp với từng ván đơn, stop-loss/take-profit trên tổng lũy kế, một lần settle."""
+import contextlib
+import io
+
+import numpy as np
+import pytest
+from sqlalchemy import func, select
+
+from database.database_manager import DatabaseManager
+from database.models import TransactionHistory
+from games.autoplay import _summarise, autoplay_bau_cua, autoplay_xoc_dia
+from games.bau_cua import BauCuaAnimal, BauCuaGame
+from games.rng import RandomPool
+from games.xoc_dia import XocDiaBetType, XocDiaGame
+
+SEED = 20240601
+GUILD = 4
+
+
+def summarise(payouts, bet=10, stop_loss=None, take_profit=None):
+    return _summarise(np.array(payouts, dtype=np.int64), bet, stop_loss, take_profit)
+
+
+def test_bau_cua_matches_single_rounds():
+    bets = {BauCuaAnimal.CUA: 30, BauCuaAnimal.CA: 20}
+    result = autoplay_bau_cua(bets, 200, rng=RandomPool(SEED))
+
+    rng = RandomPool(SEED)
+    payouts = [BauCuaGame(bets, 1, rng=rng).payout for _ in range(200)]
+    assert result.rounds_played == 200 and result.stopped_by is None
+    assert (result.total_bet, result.total_payout) == (50 * 200, sum(payouts))
+    assert result.rng_state == (SEED, 0)
+    assert sum(result.histogram.values()) == 200
+    assert result.histogram == {p - 50: payouts.count(p) for p in set(payouts)}
+
+
+@pytest.mark.parametrize("bet_type", [XocDiaBetType.EVEN, XocDiaBetType.FOUR_RED])
+@pytest.mark.parametrize("luck_factor", [1.0, 1.5])
+def test_xoc_dia_matches_single_rounds(bet_type, luck_factor):
+    result = autoplay_xoc_dia(bet_type, 10, 300, luck_factor, rng=RandomPool(SEED))
+
+    rng = RandomPool(SEED)
+    games = [XocDiaGame({bet_type: 10}, 1, luck_factor, rng=rng) for _ in range(300)]
+    assert result.total_payout == sum(game.payout for game in games)
+    assert result.wins == sum(game.payout > 10 for game in games)
+    assert result.wins + result.losses + result.pushes == result.rounds_played == 300
+
+
+def test_stop_loss_uses_cumulative_net():
+    # Lợi nhuận từng ván: +10, -10, -10, -10, +30 -> lũy kế 10, 0, -10, -20, 10
+    result = summarise([20, 0, 0, 0, 40], stop_loss=20)
+    assert (result.rounds_played, result.stopped_by) == (4, "stop_loss")
+    assert result.net == -20
+    assert (result.total_bet, result.total_payout) == (40, 20)
+    # Trước ván 4 số dư đã giảm 10: cần 10 + 10 để đặt đủ cược
+    assert result.required_balance == 20
+
+
+def test_take_profit_stops_after_first_hit():
+    result = summarise([0, 40, 40], stop_loss=50, take_profit=20)
+    assert (result.rounds_played, result.stopped_by) == (2, "take_profit")
+    assert result.net == 20
+    assert result.histogram == {-10: 1, 30: 1}
+
+
+def test_no_stop_plays_every_round():
+    result = summarise([0, 0, 10, 30])
+    assert result.rounds_played == result.rounds_requested == 4
+    assert result.stopped_by is None
+    assert (result.wins, result.losses, result.pushes) == (1, 2, 1)
+    assert result.required_balance == 30
+
+
+@pytest.fixture
+def db(tmp_path):
+    manager = DatabaseManager("sqlite:///" + str(tmp_path / "autoplay.db"))
+    with contextlib.redirect_stdout(io.StringIO()):
+        manager.get_or_create_user_balance(1, GUILD)
+    yield manager
+    manager.engine.dispose()
+
+
+def settle(db, result):
+    return db.settle(1, GUILD, result.net, "game", f"Xoc Dia autoplay: {result.rounds_played} rounds",
+                     min_balance=result.required_balance + result.net,
+                     game_type="xoc_dia", bet=result.total_bet, payout=result.total_payout)
+
+
+def test_autoplay_settles_one_net_delta(db):
+    result = autoplay_xoc_dia(XocDiaBetType.ODD, 10, 50, rng=RandomPool(SEED))
+    assert settle(db, result) == 1000 + result.net
+    with db.engine.connect() as conn:
+        # Dòng opening + một dòng cho cả lượt autoplay
+        assert conn.execute(select(func.count()).select_from(TransactionHistory)).scalar() == 2
+
+
+def test_autoplay_rejected_without_required_balance(db):
+    # Thua liên tiếp 101 ván cược 10: cần 1010 > 1000
+    result = summarise([0] * 101)
+    assert result.required_balance == 1010
+    assert settle(db, result) is None
+    assert db.get_user_balance(1, GUILD).balance == 1000
@@ -0,0 +1,126 @@
+"""BalanceCache: LRU số dư và lock theo key (lồng nhau được, không rò rỉ)."""
+import asyncio
+
+from database.balance_cache import BalanceCache
+
+A, B, C = (1, 1), (2, 1), (3, 1)
+
+
+def test_lru_eviction_and_stats():
+    cache = BalanceCache(max_size=2)
+    cache.set(A, 100)
+    cache.set(B, 200)
+    assert cache.get(A) == 100  # A mới dùng, B bị đẩy ra trước
+    cache.set(C, 300)
+
+    assert cache.get(B) is None
+    assert cache.get(A) == 100 and cache.get(C) == 300
+    stats = cache.stats()
+    assert stats["size"] == 2 and stats["evictions"] == 1
+    assert stats["hits"] == 3 and stats["misses"] == 1
+
+
+def test_invalidate_drops_entry_and_idle_lock():
+    async def scenario():
+        cache = BalanceCache(max_size=4)
+        cache.set(A, 100)
+        async with cache.lock(A):
+            pass
+        kept = A in cache._locks
+        cache.invalidate(A)
+        return cache, kept
+
+    cache, kept = asyncio.run(scenario())
+    assert kept  # key còn trong cache thì lock được giữ lại để dùng tiếp
+    assert cache.get(A) is None
+    assert A not in cache._locks
+
+
+def test_uncached_lock_dropped_on_release():
+    async def scenario():
+        cache = BalanceCache(max_size=4)
+        for user_id in range(100):
+            async with cache.lock((user_id, 1)):
+                pass
+        return cache
+
+    assert asyncio.run(scenario())._locks == {}
+
+
+def test_lock_is_reentrant_and_serialises_tasks():
+    async def scenario():
+        cache = BalanceCache(max_size=4)
+        order = []
+
+        async def worker(name):
+            async with cache.lock(A):
+                async with cache.lock(A):  # settle lồng trong user_lock
+                    order.append(f"{name}-in")
+                    await asyncio.sleep(0)
+                    order.append(f"{name}-out")
+
+        await asyncio.gather(worker("x"), worker("y"))
+        return cache, order
+
+    cache, order = asyncio.run(scenario())
+    assert order == ["x-in", "x-out", "y-in", "y-out"]
+    assert A not in cache._locks
+
+
+def test_lock_with_waiter_survives_invalidate_and_eviction():
+    async def scenario():
+        cache = BalanceCache(max_size=1)
+        cache.set(A, 100)
+        holder = cache.lock(A)
+        released = asyncio.Event()
+
+        async def first():
+            async with cache.lock(A):
+                await released.wait()
+
+        async def second():
+            async with cache.lock(A) as lock:
+                return lock
+
+        task_first = asyncio.create_task(first())
+        await asyncio.sleep(0)
+        task_second = asyncio.create_task(second())
+        await asyncio.sleep(0)
+        cache.invalidate(A)
+        cache.set(B, 200)  # đẩy key khác cũng không được bỏ lock đang có người chờ
+        still_there = cache._locks.get(A) is holder
+        released.set()
+        await task_first
+        waited_on = await task_second
+        return cache, holder, still_there, waited_on
+
+    cache, holder, still_there, waited_on = asyncio.run(scenario())
+    assert still_there
+    assert waited_on is holder
+    assert A not in cache._locks
+
+
+def test_cancelled_waiter_does_not_pin_lock():
+    async def scenario():
+        cache = BalanceCache(max_size=4)
+        release = asyncio.Event()
+
+        async def first():
+            async with cache.lock(A):
+                await release.wait()
+
+        async def second():
+            async with cache.lock(A):
+                pass
+
+        task_first = asyncio.create_task(first())
+        await asyncio.sleep(0)
+        task_second = asyncio.create_task(second())
+        await asyncio.sleep(0)
+        task_second.cancel()
+        await asyncio.gather(task_second, return_exceptions=True)
+        release.set()
+        await task_first
+        return cache
+
+    assert asyncio.run(scenario())._locks == {}
@@ -0,0 +1,76 @@
+"""Split trong BlackjackGame: split ace, split lại ace theo config."""
+from array import array
+
+import pytest
+
+from config import config
+from games.blackjack import BlackjackGame, HAND_DONE, HAND_SPLIT_ACE
+from games.card_game import CARDS_PER_DECK
+from games.rng import RandomPool
+from games.shoe import Shoe
+
+ACES = (0, 13, 26, 39)
+TEN, TEN_2, FIVE, SEVEN, EIGHT = 9, 22, 4, 6, 7
+
+
+def rigged_game(*cards):
+    """Ván với các lá được chia theo đúng thứ tự `cards` (người chơi 2 lá, dealer 2 lá, rồi các lá rút sau)"""
+    shoe = Shoe(1, 1.0, RandomPool(1, CARDS_PER_DECK))
+    shoe.cards = array('B', reversed(cards))
+    return BlackjackGame(10, 1, shoe=shoe)
+
+
+@pytest.fixture
+def rules(monkeypatch):
+    def apply(resplit_aces, max_hands=4):
+        monkeypatch.setattr(config, "BLACKJACK_RESPLIT_ACES", resplit_aces)
+        monkeypatch.setattr(config, "BLACKJACK_MAX_HANDS", max_hands)
+    return apply
+
+
+def test_split_aces_get_one_card_each(rules):
+    rules(resplit_aces=True)
+    game = rigged_game(ACES[0], ACES[1], TEN, TEN_2, FIVE, SEVEN)
+    assert game.player_split()
+    assert game.game_over
+    assert [len(hand) for hand in game.hands] == [2, 2]
+
+
+def test_new_ace_pair_finishes_without_resplit(rules):
+    rules(resplit_aces=False)
+    game = rigged_game(ACES[0], ACES[1], TEN, TEN_2, ACES[2], FIVE)
+    assert game.player_split()
+    assert game.game_over
+    assert all(flags & HAND_DONE for flags in game.hand_flags)
+
+
+def test_new_ace_pair_can_be_resplit(rules):
+    rules(resplit_aces=True)
+    game = rigged_game(ACES[0], ACES[1], TEN, TEN_2, ACES[2], FIVE, SEVEN, EIGHT)
+    assert game.player_split()
+
+    assert not game.game_over and game.active == 0
+    assert game.hand_flags[0] & HAND_SPLIT_ACE
+    assert game.can_split()
+    assert not game.can_double()
+    assert not game.player_hit()
+
+    assert game.player_split()
+    assert game.game_over
+    assert [list(hand.cards) for hand in game.hands] == [[ACES[0], SEVEN], [ACES[2], EIGHT], [ACES[1], FIVE]]
+    assert game.bets == [10, 10, 10]
+
+
+def test_resplit_stops_at_max_hands(rules):
+    rules(resplit_aces=True, max_hands=2)
+    game = rigged_game(ACES[0], ACES[1], TEN, TEN_2, ACES[2], FIVE)
+    assert game.player_split()
+    assert game.game_over
+
+
+def test_open_split_ace_hand_survives_snapshot(rules):
+    rules(resplit_aces=True)
+    game = rigged_game(ACES[0], ACES[1], TEN, TEN_2, ACES[2], FIVE, SEVEN, EIGHT)
+    game.player_split()
+    restored = BlackjackGame.from_state(game.to_state(), shoe=game.deck)
+    assert restored.can_split() and not restored.player_hit()
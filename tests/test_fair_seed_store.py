@@ -0,0 +1,107 @@
+"""FairSeedStore: nonce giữ chỗ trong database và kiểm tra lại các ván đã công bố seed."""
+import asyncio
+
+import pytest
+
+from database.async_database_manager import AsyncDatabaseManager
+from database.database_manager import DatabaseManager
+from database.fair_seed_store import FairSeedStore
+from games.bau_cua import BauCuaGame
+from games.provably_fair import outcome_text, replay
+from games.xoc_dia import XocDiaGame
+
+USER, GUILD = 11, 22
+
+
+@pytest.fixture
+def db(tmp_path):
+    manager = AsyncDatabaseManager(DatabaseManager("sqlite:///" + str(tmp_path / "fair.db")), max_workers=1)
+    yield manager
+    manager.executor.shutdown()
+    manager.sync.engine.dispose()
+
+
+async def play(store, game_type="bau_cua"):
+    pool = await store.next_pool(USER, GUILD)
+    game_cls = BauCuaGame if game_type == "bau_cua" else XocDiaGame
+    game = game_cls({}, USER, 1.0, rng=pool)
+    await store.record(USER, GUILD, game_type, pool, game)
+    return pool, game
+
+
+def test_nonce_reservation_survives_eviction_and_restart(db):
+    async def scenario():
+        store = FairSeedStore(db, max_entries=1)
+        first = [(await store.next_pool(USER, GUILD)).nonce for _ in range(3)]
+        # Đẩy cặp seed khỏi cache rồi dùng lại: nonce đọc từ database
+        await store.next_pool(USER + 1, GUILD)
+        evicted = (await store.next_pool(USER, GUILD)).nonce
+        restarted = (await FairSeedStore(db).next_pool(USER, GUILD)).nonce
+        return first, evicted, restarted
+
+    first, evicted, restarted = asyncio.run(scenario())
+    assert first == [0, 1, 2]
+    assert evicted == 3
+    assert restarted == 4
+
+
+def test_reservation_failure_fails_the_round(db):
+    async def scenario():
+        store = FairSeedStore(db)
+        await store.next_pool(USER, GUILD)
+        # Seed bị đổi ở nơi khác: cặp trong cache không còn active
+        db.sync.rotate_fair_seed(USER, GUILD, "f" * 64, "e" * 64, "client")
+        with pytest.raises(LookupError):
+            await store.next_pool(USER, GUILD)
+        return await store.next_pool(USER, GUILD)
+
+    pool = asyncio.run(scenario())
+    assert pool.server_seed_hash == "e" * 64
+    assert pool.nonce == 0
+
+
+def test_record_error_is_not_swallowed(db):
+    async def scenario():
+        store = FairSeedStore(db)
+        pool = await store.next_pool(USER, GUILD)
+
+        async def broken(*args):
+            raise RuntimeError("disk full")
+
+        db.record_fair_round = broken
+        with pytest.raises(RuntimeError):
+            await store.record(USER, GUILD, "bau_cua", pool, BauCuaGame({}, USER, 1.0, rng=pool))
+
+    asyncio.run(scenario())
+
+
+def test_verify_history_after_reveal(db):
+    async def scenario():
+        store = FairSeedStore(db)
+        played = [await play(store, "bau_cua"), await play(store, "xoc_dia")]
+        before = await store.verify_history()
+        server_seed, _, client_seed, rounds = await store.rotate(USER, GUILD)
+        after = await store.verify_history(batch_size=1)
+        return played, before, (server_seed, client_seed, rounds), after
+
+    played, before, (server_seed, client_seed, rounds), after = asyncio.run(scenario())
+    assert before.checked == 0 and before.unrevealed == 2
+    assert rounds == 2
+    assert after.checked == 2 and not after.mismatched
+    for game_type, (pool, game) in zip(("bau_cua", "xoc_dia"), played):
+        assert replay(game_type, server_seed, client_seed, pool.nonce) == outcome_text(game)
+
+
+def test_verify_history_flags_tampered_round(db):
+    async def scenario():
+        store = FairSeedStore(db)
+        await play(store)
+        await play(store)
+        with db.sync.engine.begin() as conn:
+            conn.exec_driver_sql("UPDATE fair_rounds SET outcome = 'BAU,BAU,BAU,BAU' WHERE id = 2")
+        await store.rotate(USER, GUILD)
+        return await store.verify_history()
+
+    report = asyncio.run(scenario())
+    assert report.checked == 2
+    assert report.mismatched == [2]
@@ -0,0 +1,94 @@
+"""So sánh games.hand.Hand với cách tính điểm cũ (vòng lặp trừ ace) cho mọi tay 2-6 lá."""
+from itertools import combinations_with_replacement
+
+import pytest
+
+from games.blackjack import BlackjackGame
+from games.card_game import Card, CardSuit, CardValue
+from games.hand import Hand, HAND_VALUES, MAX_TABLE_HARD
+
+
+def legacy_hand_value(hand):
+    """BlackjackGame.calculate_hand_value trước khi có Hand, trả thêm số ace còn tính 11.
+
+    Cờ soft_ace cũ bật khi có ace bị hạ xuống 1 (ngược nghĩa "soft"), nên độ
+    soft được so bằng số ace còn tính 11 sau vòng lặp.
+    """
+    value = 0
+    soft_ace = False
+    aces = 0
+
+    for card in hand:
+        if card.value == CardValue.ACE:
+            aces += 1
+            value += 11
+        else:
+            value += card.get_value()
+
+    while value > 21 and aces > 0:
+        value -= 10
+        aces -= 1
+        soft_ace = True
+
+    return value, soft_ace, aces
+
+
+SUITS = list(CardSuit)
+RANK_HANDS = [
+    ranks
+    for size in range(2, 7)
+    for ranks in combinations_with_replacement(list(CardValue), size)
+]
+
+
+def make_cards(ranks):
+    # Chất không ảnh hưởng điểm; xoay vòng để không quá 4 lá trùng nhau
+    return [Card(SUITS[i % 4], rank) for i, rank in enumerate(ranks)]
+
+
+def test_enumerates_every_rank_multiset():
+    # C(13+k-1, k) với k = 2..6
+    assert len(RANK_HANDS) == 91 + 455 + 1820 + 6188 + 18564
+
+
+def test_matches_legacy_for_all_2_to_6_card_hands():
+    mismatches = []
+    for ranks in RANK_HANDS:
+        cards = make_cards(ranks)
+        hand = Hand(cards)
+        value, _, aces_at_11 = legacy_hand_value(cards)
+        expected = (value, aces_at_11 > 0, len(cards) == 2 and value == 21)
+        actual = (hand.value, hand.soft, hand.is_blackjack())
+        if actual != expected or hand.is_bust() != (value > 21):
+            mismatches.append((ranks, actual, expected))
+    assert not mismatches, mismatches[:5]
+
+
+def test_incremental_append_matches_legacy_after_each_card():
+    for ranks in RANK_HANDS:
+        if len(ranks) != 6:
+            continue
+        cards = make_cards(ranks)
+        hand = Hand(cards[:2])
+        for count in range(3, 7):
+            hand.append(cards[count - 1])
+            value, _, aces_at_11 = legacy_hand_value(cards[:count])
+            assert hand.total() == (value, aces_at_11 > 0)
+
+
+def test_blackjack_game_calculate_hand_value_delegates():
+    game = BlackjackGame.__new__(BlackjackGame)
+    for ranks in RANK_HANDS[:2000]:
+        cards = make_cards(ranks)
+        value, _, aces_at_11 = legacy_hand_value(cards)
+        assert game.calculate_hand_value(cards) == (value, aces_at_11 > 0)
+
+
+@pytest.mark.parametrize("hard", [0, 11, 12, 21, MAX_TABLE_HARD - 1, MAX_TABLE_HARD, 200])
+def test_lookup_beyond_table(hard):
+    hand = Hand()
+    hand.hard, hand.aces = hard, 1
+    expected = (hard + 10, True) if hard + 10 <= 21 else (hard, False)
+    assert hand.total() == expected
+    if hard < MAX_TABLE_HARD:
+        assert HAND_VALUES[hard][True] == expected
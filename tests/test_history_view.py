@@ -0,0 +1,94 @@
+"""Lịch sử giao dịch phân trang keyset theo (created_at, id): không trùng, không sót, lật trang qua HistoryView."""
+import asyncio
+import contextlib
+import datetime
+import io
+
+import pytest
+from sqlalchemy import insert
+
+from cogs.history_view import HistoryView
+from database.async_database_manager import AsyncDatabaseManager
+from database.database_manager import DatabaseManager
+from database.ledger import ledger_row
+from database.models import TransactionHistory
+
+GUILD = 11
+T0 = datetime.datetime(2026, 1, 1)
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr("config.config.JOURNAL_ENABLED", False)
+    monkeypatch.setattr("config.config.HISTORY_PAGE_SIZE", 4)
+    manager = AsyncDatabaseManager(DatabaseManager("sqlite:///" + str(tmp_path / "history.db")), max_workers=1)
+    # 10 dòng của user 1, từng cặp trùng created_at; xen kẽ dòng của user khác
+    rows = []
+    for i in range(10):
+        created_at = T0 + datetime.timedelta(minutes=i // 2)
+        rows.append(dict(ledger_row(1, GUILD, i, "game", f"row {i}"), created_at=created_at))
+        rows.append(dict(ledger_row(2, GUILD, i, "game", f"other {i}"), created_at=created_at))
+    with manager.sync.engine.begin() as conn:
+        conn.execute(insert(TransactionHistory), rows)
+    yield manager
+    manager.executor.shutdown()
+    manager.sync.engine.dispose()
+
+
+def pages(db, limit):
+    before, result = None, []
+    while True:
+        page = db.sync.get_transactions(1, GUILD, before, limit)
+        if not page:
+            return result
+        result.append([row[4] for row in page])
+        before = (page[-1][1], page[-1][0])
+
+
+def test_keyset_pages_cover_every_row_once(db):
+    assert pages(db, 3) == [
+        ["row 9", "row 8", "row 7"], ["row 6", "row 5", "row 4"], ["row 3", "row 2", "row 1"], ["row 0"]
+    ]
+
+
+def test_new_rows_do_not_shift_older_pages(db):
+    first = db.sync.get_transactions(1, GUILD, None, 4)
+    newer = T0 + datetime.timedelta(days=1)
+    db.sync.add_transactions([dict(ledger_row(1, GUILD, 99, "game", "new"), created_at=newer)])
+    second = db.sync.get_transactions(1, GUILD, (first[-1][1], first[-1][0]), 4)
+    assert [row[4] for row in second] == ["row 5", "row 4", "row 3", "row 2"]
+
+
+class Response:
+    def __init__(self):
+        self.embeds = []
+
+    async def edit_message(self, embed=None, view=None):
+        self.embeds.append(embed)
+
+
+class Interaction:
+    def __init__(self):
+        self.response = Response()
+
+
+def test_history_view_pages_forward_and_back(db):
+    async def scenario():
+        view = HistoryView(db, viewer_id=1, user_id=1, guild_id=GUILD, name="user1")
+        seen = []
+        await view.load()
+        seen.append((view.page, [row[4] for row in view.rows], view.prev_button.disabled, view.next_button.disabled))
+        for button in (view.next_button, view.next_button, view.prev_button):
+            await button.callback(Interaction())
+            seen.append((view.page, [row[4] for row in view.rows], view.prev_button.disabled,
+                         view.next_button.disabled))
+        return seen
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        seen = asyncio.run(scenario())
+    assert seen == [
+        (0, ["row 9", "row 8", "row 7", "row 6"], True, False),
+        (1, ["row 5", "row 4", "row 3", "row 2"], False, False),
+        (2, ["row 1", "row 0"], False, True),
+        (1, ["row 5", "row 4", "row 3", "row 2"], False, False),
+    ]
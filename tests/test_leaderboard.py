@@ -0,0 +1,104 @@
+"""Bảng xếp hạng trong bộ nhớ: đẩy user thấp nhất ra, cận outside_max, nạp lại khi top không còn chắc chắn."""
+import asyncio
+import contextlib
+import io
+
+import pytest
+
+from database.async_database_manager import AsyncDatabaseManager
+from database.database_manager import DatabaseManager
+from database.leaderboard import GuildBoard, Leaderboard
+
+GUILD = 8
+
+
+def loaded_board(rows, capacity=3):
+    board = GuildBoard(capacity)
+    board.begin_load()
+    board.finish_load(rows)
+    return board
+
+
+def test_new_leader_pushes_out_lowest():
+    board = loaded_board([(1, 500), (2, 400), (3, 300)])
+    assert board.outside_max == 300
+
+    board.update(4, 450)
+    assert sorted(board.balances) == [1, 2, 4]
+    assert board.top(2) == [(1, 500), (4, 450)]
+
+    board.update(5, 100)  # Không vào được top: chỉ nâng cận nếu cần
+    assert 5 not in board.balances and board.outside_max == 300
+
+
+def test_top_is_unknown_when_leader_drops_below_outside():
+    board = loaded_board([(1, 500), (2, 400), (3, 300)])
+    board.update(1, 350)
+    assert board.top(2) == [(2, 400), (1, 350)]
+    board.update(2, 200)
+    board.update(3, 100)
+    # Người thứ hai (200) thấp hơn cận của những user nằm ngoài (300): cần nạp lại
+    assert board.top(2) is None
+    assert board.top(1) == [(1, 350)]
+
+
+def test_small_guild_has_no_outside_bound():
+    board = loaded_board([(1, 500), (2, 400)])
+    assert board.outside_max is None
+    board.update(2, 10)
+    board.update(3, 20)
+    assert board.top(5) == [(1, 500), (3, 20), (2, 10)]
+
+
+def test_updates_during_load_are_applied_after():
+    board = GuildBoard(3)
+    board.update(1, 999)  # Chưa nạp: bỏ qua
+    board.begin_load()
+    board.update(2, 700)
+    board.finish_load([(1, 500), (2, 400), (3, 300)])
+    assert board.top(2) == [(2, 700), (1, 500)]
+
+
+def test_forget_drops_guild_board():
+    leaderboard = Leaderboard(capacity=3)
+    board = leaderboard.board(GUILD)
+    board.begin_load()
+    board.finish_load([(1, 500)])
+    leaderboard.update(1, GUILD, 600)
+    assert leaderboard.board(GUILD).top(1) == [(1, 600)]
+    leaderboard.forget(GUILD)
+    assert leaderboard.board(GUILD) is not board and leaderboard.board(GUILD).top(1) is None
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr("config.config.JOURNAL_ENABLED", False)
+    monkeypatch.setattr("config.config.LEADERBOARD_CAPACITY", 3)
+    manager = AsyncDatabaseManager(DatabaseManager("sqlite:///" + str(tmp_path / "board.db")), max_workers=1)
+    yield manager
+    manager.executor.shutdown()
+    manager.sync.engine.dispose()
+
+
+def test_leaderboard_follows_settles(db):
+    async def scenario():
+        for user_id, delta in ((1, 500), (2, 400), (3, 300), (4, 200), (5, 100)):
+            await db.settle(user_id, GUILD, delta, "admin", "Admin add")
+        first = await db.get_leaderboard(GUILD, 2)
+
+        await db.settle(5, GUILD, 500, "admin", "Admin add")
+        await db.settle(1, GUILD, -300, "admin", "Admin remove")
+        second = await db.get_leaderboard(GUILD, 2)
+        reloads = db.leaderboard.board(GUILD).reloads
+
+        await db.settle(2, GUILD, -300, "admin", "Admin remove")
+        third = await db.get_leaderboard(GUILD, 2)
+        return first, second, reloads, third
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        first, second, reloads, third = asyncio.run(scenario())
+    assert first == [(1, 1500), (2, 1400)]
+    assert second == [(5, 1600), (2, 1400)]
+    assert reloads == 1
+    assert third == [(5, 1600), (3, 1300)] == db.sync.get_top_balances(GUILD, 2)
+    assert db.leaderboard.board(GUILD).reloads == 2
@@ -0,0 +1,107 @@
+"""Gộp ledger: dòng tổng hợp, file lưu trữ, dòng opening giữ nguyên, đối soát vẫn khớp."""
+import contextlib
+import datetime
+import glob
+import io
+
+import pytest
+from sqlalchemy import func, insert, select, update
+
+from database import reconciliation
+from database.database_manager import DatabaseManager
+from database.ledger import OPENING_TYPE, ledger_row
+from database.ledger_compaction import SUMMARY_TYPE, compact, read_archive
+from database.models import TransactionHistory, UserBalance
+
+GUILD = 9
+DAY = datetime.timedelta(days=1)
+# 0h UTC của một ngày đã quá hạn gộp
+START = datetime.datetime.combine(datetime.datetime.utcnow().date() - 200 * DAY, datetime.time())
+
+
+@pytest.fixture
+def db(tmp_path):
+    manager = DatabaseManager("sqlite:///" + str(tmp_path / "ledger.db"))
+    yield manager
+    manager.engine.dispose()
+
+
+def open_account(db, user_id, created_at):
+    with contextlib.redirect_stdout(io.StringIO()):
+        db.get_or_create_user_balance(user_id, GUILD)
+    with db.engine.begin() as conn:
+        conn.execute(update(TransactionHistory).where(TransactionHistory.user_id == user_id)
+                     .values(created_at=created_at))
+
+
+def play(db, user_id, created_at, bet, payout):
+    """Một ván đã settle, ghi lùi ngày"""
+    with db.engine.begin() as conn:
+        row = ledger_row(user_id, GUILD, payout - bet, "game", f"Bau Cua bet: {bet}, win: {payout}",
+                         game_type="bau_cua", bet=bet, payout=payout)
+        conn.execute(insert(TransactionHistory), [dict(row, created_at=created_at)])
+        conn.execute(update(UserBalance).where(UserBalance.user_id == user_id)
+                     .values(balance=UserBalance.balance + payout - bet))
+
+
+def rows(db, user_id):
+    with db.engine.connect() as conn:
+        return conn.execute(
+            select(TransactionHistory.transaction_type, TransactionHistory.amount,
+                   TransactionHistory.merged_rows, TransactionHistory.bet, TransactionHistory.payout)
+            .where(TransactionHistory.user_id == user_id)
+            .order_by(TransactionHistory.created_at, TransactionHistory.id)
+        ).all()
+
+
+def test_compaction_keeps_openings_and_totals(db, tmp_path):
+    old = START
+    open_account(db, 1, old)
+    play(db, 1, old + datetime.timedelta(hours=1), 100, 0)
+    play(db, 1, old + datetime.timedelta(hours=2), 100, 300)
+    play(db, 1, old + DAY, 50, 0)
+    play(db, 1, datetime.datetime.utcnow(), 10, 20)  # Còn mới: không gộp
+
+    archived, groups = compact(db.engine, days=90, archive_dir=str(tmp_path / "archive"), batch_size=1, verbose=False)
+
+    # Mỗi lô một dòng: dòng thứ hai của ngày đầu được cộng dồn vào dòng tổng hợp đã có
+    assert (archived, groups) == (3, 3)
+    kept = rows(db, 1)
+    assert kept[0] == (OPENING_TYPE, 1000, None, None, None)
+    assert [row.transaction_type for row in kept[1:]] == [SUMMARY_TYPE, SUMMARY_TYPE, "game"]
+    assert (kept[1].amount, kept[1].merged_rows, kept[1].bet, kept[1].payout) == (100, 2, 200, 300)
+    assert (kept[2].amount, kept[2].merged_rows) == (-50, 1)
+    assert sum(row.amount for row in kept) == 1060
+
+    archive_rows = [row for path in glob.glob(str(tmp_path / "archive" / "*.jsonl.gz")) for row in read_archive(path)]
+    assert sorted(row["amount"] for row in archive_rows) == [-100, -50, 200]
+
+    report = reconciliation.reconcile(db.engine)
+    assert report.checked == 1 and not report.drifts
+
+
+def test_compaction_is_idempotent(db, tmp_path):
+    old = START
+    open_account(db, 1, old)
+    play(db, 1, old, 100, 250)
+    compact(db.engine, days=90, archive_dir=str(tmp_path), verbose=False)
+    play(db, 1, old + datetime.timedelta(minutes=5), 100, 0)
+
+    assert compact(db.engine, days=90, archive_dir=str(tmp_path), verbose=False) == (1, 1)
+    assert compact(db.engine, days=90, archive_dir=str(tmp_path), verbose=False) == (0, 0)
+    summary = [row for row in rows(db, 1) if row.transaction_type == SUMMARY_TYPE]
+    assert len(summary) == 1
+    assert (summary[0].amount, summary[0].merged_rows) == (50, 2)
+
+
+def test_dry_run_writes_nothing(db, tmp_path):
+    old = START
+    open_account(db, 1, old)
+    play(db, 1, old, 100, 0)
+    with db.engine.connect() as conn:
+        before = conn.execute(select(func.count()).select_from(TransactionHistory)).scalar()
+
+    assert compact(db.engine, days=90, archive_dir=str(tmp_path / "none"), dry_run=True, verbose=False) == (1, 1)
+    with db.engine.connect() as conn:
+        assert conn.execute(select(func.count()).select_from(TransactionHistory)).scalar() == before
+    assert not (tmp_path / "none").exists()
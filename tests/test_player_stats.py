@@ -0,0 +1,83 @@
+"""Thống kê người chơi: RoundResult, cộng dồn trong settle/settle_many, không đổi khi settle bị từ chối."""
+import contextlib
+import io
+
+import pytest
+
+from database.database_manager import DatabaseManager
+from database.player_stats import RoundResult
+from games.autoplay import AutoplayResult
+
+GUILD = 6
+
+
+def test_round_result_counts_single_round():
+    won = RoundResult("blackjack", 100, 250)
+    assert (won.net, won.win_count, won.loss_count, won.best) == (150, 1, 0, 150)
+    lost = RoundResult("bau_cua", 100, 0)
+    assert (lost.net, lost.win_count, lost.loss_count, lost.best) == (-100, 0, 1, 0)
+    push = RoundResult("xoc_dia", 100, 100)
+    assert (push.win_count, push.loss_count) == (0, 0)
+
+
+def test_round_result_rejects_unknown_game():
+    with pytest.raises(ValueError):
+        RoundResult("poker", 10, 0)
+
+
+def test_round_result_from_autoplay():
+    autoplay = AutoplayResult(rounds_requested=10, rounds_played=6, bet_per_round=10, total_bet=60,
+                              total_payout=70, required_balance=20, wins=2, losses=3, pushes=1,
+                              histogram={-10: 3, 0: 1, 10: 1, 30: 1})
+    result = RoundResult.from_autoplay("xoc_dia", autoplay)
+    assert (result.rounds, result.wagered, result.net) == (6, 60, 10)
+    assert (result.win_count, result.loss_count, result.best) == (2, 3, 30)
+
+
+@pytest.fixture
+def db(tmp_path):
+    manager = DatabaseManager("sqlite:///" + str(tmp_path / "stats.db"))
+    with contextlib.redirect_stdout(io.StringIO()):
+        for user_id in (1, 2):
+            manager.get_or_create_user_balance(user_id, GUILD)
+    yield manager
+    manager.engine.dispose()
+
+
+def stats(db, user_id):
+    return {row.game_type: (row.rounds, row.wins, row.losses, row.wagered, row.net, row.biggest_win)
+            for row in db.get_player_stats(user_id, GUILD)}
+
+
+def play(db, user_id, game_type, bet, payout, **kwargs):
+    return db.settle(user_id, GUILD, payout - bet, "game", f"{game_type} bet: {bet}, win: {payout}",
+                     result=RoundResult(game_type, bet, payout, **kwargs),
+                     game_type=game_type, bet=bet, payout=payout)
+
+
+def test_settle_accumulates_stats(db):
+    play(db, 1, "blackjack", 100, 200)
+    play(db, 1, "blackjack", 50, 0)
+    play(db, 1, "blackjack", 100, 400)
+    play(db, 1, "bau_cua", 30, 10)
+    assert stats(db, 1) == {
+        "bau_cua": (1, 0, 1, 30, -20, 0),
+        "blackjack": (3, 2, 1, 250, 350, 300),
+    }
+    assert stats(db, 2) == {}
+
+
+def test_rejected_settle_leaves_stats_unchanged(db):
+    assert play(db, 1, "xoc_dia", 5000, 0) is None
+    assert stats(db, 1) == {}
+
+
+def test_settle_many_and_record_results(db):
+    db.settle_many(
+        [(1, GUILD, 100, "game", "Blackjack table win: 100", 0, {"game_type": "blackjack_table"})],
+        results=[(1, GUILD, RoundResult("blackjack_table", 100, 200)),
+                 (2, GUILD, RoundResult("blackjack_table", 100, 0))]
+    )
+    db.record_results([(2, GUILD, RoundResult("blackjack_table", 50, 0))])
+    assert stats(db, 1) == {"blackjack_table": (1, 1, 0, 100, 100, 100)}
+    assert stats(db, 2) == {"blackjack_table": (2, 0, 2, 150, -150, 0)}
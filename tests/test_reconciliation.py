@@ -0,0 +1,144 @@
+"""Đối soát số dư: merge-join, phân loại lệch, sửa lệch (kể cả ledger đã gộp), chế độ incremental."""
+import contextlib
+import io
+
+import pytest
+from sqlalchemy import delete, func, insert, select, update
+
+from database import reconciliation
+from database.database_manager import DatabaseManager
+from database.ledger import OPENING_TYPE, ledger_row
+from database.ledger_compaction import SUMMARY_TYPE
+from database.models import TransactionHistory, UserBalance
+from database.reconciliation import ADJUSTMENT_TYPE, Drift, merge_join
+
+GUILD = 3
+
+
+def test_merge_join_interleaves_sorted_streams():
+    ledger = [(1, 1, 100, 1, 0), (1, 3, 50, 0, 2), (2, 1, 7, 1, 0)]
+    balances = [(1, 1, 100), (1, 2, 40), (2, 1, 8), (3, 1, 0)]
+    assert list(merge_join(ledger, balances)) == [
+        ((1, 1), 100, 100, 1, 0),
+        ((1, 2), 40, 0, 0, 0),
+        ((1, 3), None, 50, 0, 2),
+        ((2, 1), 8, 7, 1, 0),
+        ((3, 1), 0, 0, 0, 0),
+    ]
+    assert list(merge_join([], [])) == []
+
+
+@pytest.mark.parametrize("drift, kind", [
+    (Drift(1, 1, None, 10, 0), "orphan"),
+    (Drift(1, 1, 10, 0, 0), "missing_opening"),
+    (Drift(1, 1, 10, 5, 1), "drift"),
+    (Drift(1, 1, 10, 5, 0, summaries=3), "drift"),
+])
+def test_drift_kind(drift, kind):
+    assert drift.kind == kind
+
+
+@pytest.fixture
+def db(tmp_path):
+    manager = DatabaseManager("sqlite:///" + str(tmp_path / "reconcile.db"))
+    with contextlib.redirect_stdout(io.StringIO()):
+        for user_id in range(1, 6):
+            manager.get_or_create_user_balance(user_id, GUILD)
+    yield manager
+    manager.engine.dispose()
+
+
+def set_balance(db, user_id, balance):
+    with db.engine.begin() as conn:
+        conn.execute(update(UserBalance).where(UserBalance.user_id == user_id).values(balance=balance))
+
+
+def drifted_db(db):
+    """User 1 khớp; 2 thiếu opening; 3 lệch; 4 ledger đã gộp (opening nằm trong dòng tổng hợp); 5 orphan"""
+    db.settle(1, GUILD, -100, "game", "Bau Cua bet: 100, win: 0", min_balance=None,
+              game_type="bau_cua", bet=100, payout=0)
+    with db.engine.begin() as conn:
+        conn.execute(delete(TransactionHistory).where(TransactionHistory.user_id == 2))
+        conn.execute(delete(TransactionHistory).where(TransactionHistory.user_id == 4))
+        conn.execute(insert(TransactionHistory), [dict(
+            ledger_row(4, GUILD, 1000, SUMMARY_TYPE, "Tổng hợp: 2 giao dịch"), merged_rows=2
+        )])
+        conn.execute(delete(UserBalance).where(UserBalance.user_id == 5))
+    set_balance(db, 3, 1250)
+    set_balance(db, 4, 900)
+
+
+def ledger_types(db, user_id):
+    with db.engine.connect() as conn:
+        return [row[0] for row in conn.execute(
+            select(TransactionHistory.transaction_type)
+            .where(TransactionHistory.user_id == user_id)
+            .order_by(TransactionHistory.id)
+        )]
+
+
+def test_full_reconcile_classifies_drift(db):
+    drifted_db(db)
+    report = reconciliation.reconcile(db.engine, batch_size=2)
+
+    assert report.checked == 5
+    assert {drift.user_id: drift.kind for drift in report.drifts} == {
+        2: "missing_opening", 3: "drift", 4: "drift", 5: "orphan"
+    }
+    assert {drift.user_id: drift.difference for drift in report.drifts} == {2: 1000, 3: 250, 4: -100, 5: -1000}
+    assert report.counts() == {"missing_opening": 1, "drift": 2, "orphan": 1}
+
+
+def test_ledger_repair_never_adds_opening_to_compacted_user(db):
+    drifted_db(db)
+    report = reconciliation.reconcile(db.engine)
+
+    assert reconciliation.repair(db.engine, report.drifts, "ledger") == 3
+    assert ledger_types(db, 2) == [OPENING_TYPE]
+    assert ledger_types(db, 3) == [OPENING_TYPE, ADJUSTMENT_TYPE]
+    assert ledger_types(db, 4) == [SUMMARY_TYPE, ADJUSTMENT_TYPE]
+    assert [drift.kind for drift in reconciliation.reconcile(db.engine).drifts] == ["orphan"]
+
+
+def test_balance_repair(db):
+    drifted_db(db)
+    report = reconciliation.reconcile(db.engine)
+    assert reconciliation.repair(db.engine, report.drifts, "balance") == 3
+    assert db.get_user_balance(3, GUILD).balance == 1000
+    assert db.get_user_balance(4, GUILD).balance == 1000
+
+
+def test_repair_skips_users_whose_ledger_changed(db):
+    drifted_db(db)
+    drifts = reconciliation.reconcile(db.engine).drifts
+    # Sau lần đối soát: user 3 có giao dịch mới, ledger user 4 bị gộp thêm
+    db.add_transactions([ledger_row(3, GUILD, 5, "game", "Blackjack win: 5", game_type="blackjack", bet=0, payout=5)])
+    with db.engine.begin() as conn:
+        conn.execute(insert(TransactionHistory), [ledger_row(4, GUILD, 0, SUMMARY_TYPE, "Tổng hợp")])
+
+    assert reconciliation.repair(db.engine, drifts, "ledger") == 1  # chỉ user 2
+    assert ADJUSTMENT_TYPE not in ledger_types(db, 3) + ledger_types(db, 4)
+
+
+def test_incremental_checks_only_new_transactions(db):
+    report = reconciliation.reconcile(db.engine)
+    assert not report.drifts
+    reconciliation.save_checkpoint(db.engine, report.checkpoint)
+
+    set_balance(db, 1, 5)  # Sửa số dư không ghi lịch sử: incremental không thấy
+    db.settle(2, GUILD, 10, "game", "Blackjack win: 10", game_type="blackjack", bet=0, payout=10)
+    set_balance(db, 2, 999)
+
+    incremental = reconciliation.reconcile(db.engine, incremental=True)
+    assert incremental.checked == 1
+    assert [drift.user_id for drift in incremental.drifts] == [2]
+    assert {drift.user_id for drift in reconciliation.reconcile(db.engine).drifts} == {1, 2}
+
+
+def test_recheck_drops_resolved_drifts(db):
+    set_balance(db, 1, 10)
+    drifts = reconciliation.reconcile(db.engine).drifts
+    set_balance(db, 1, 1000)
+    assert reconciliation.recheck(db.engine, drifts) == []
+    with db.engine.connect() as conn:
+        assert conn.execute(select(func.count()).select_from(TransactionHistory)).scalar() == 5
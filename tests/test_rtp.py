@@ -0,0 +1,51 @@
+"""RTP chính xác (games.rtp) so với mô phỏng Monte Carlo (games.sim)."""
+import pytest
+
+from games import rtp
+
+sim = pytest.importorskip("games.sim", reason="games.sim cần numpy")
+
+SIM_ROUNDS = 400_000
+SIM_SEED = 20240601
+# Sai lệch cho phép: 5 sai số chuẩn của ước lượng Monte Carlo. Seed cố định nên
+# kết quả tất định; 5 sigma để đổi seed/số ván vẫn không fail ngẫu nhiên.
+TOLERANCE_SIGMAS = 5.0
+
+
+@pytest.mark.parametrize("luck_factor", [1.0, 1.5, 0.8])
+@pytest.mark.parametrize("game", ["bau_cua", "xoc_dia"])
+def test_exact_rtp_agrees_with_monte_carlo(game, luck_factor):
+    exact = rtp.rtp_table(luck_factor)[game]
+    results = sim.run(game, SIM_ROUNDS, luck_factor, seed=SIM_SEED)
+    assert results
+    for result in results:
+        standard_error = result.ci95 / sim.Z_95
+        tolerance = TOLERANCE_SIGMAS * standard_error + 1e-9
+        assert abs(result.rtp - exact[result.bet_type]) <= tolerance, (
+            f"{game} {result.bet_type} luck={luck_factor}: "
+            f"exact {exact[result.bet_type]:.5f}, sim {result.rtp:.5f} ± {tolerance:.5f}"
+        )
+
+
+def test_default_rules_house_edge():
+    # luck_factor = 1: mỗi mặt xúc xắc 1/6, mỗi đồng xu 1/2
+    table = rtp.rtp_table(1.0)
+    # Bầu Cua trả cược * số lần xuất hiện (không hoàn cược): RTP = 3 * 1/6 cho mọi cách chia
+    for bet_type, value in table["bau_cua"].items():
+        assert value == pytest.approx(0.5), bet_type
+    assert table["xoc_dia"] == pytest.approx({
+        "even": 0.5,         # 8/16 * 1
+        "odd": 0.5,          # 8/16 * 1
+        "four_red": 0.5,     # 1/16 * 8
+        "four_white": 0.5,   # 1/16 * 8
+        "three_red": 1.0,    # 4/16 * 4
+        "three_white": 1.0,  # 4/16 * 4
+        "two_red": 0.75      # 6/16 * 2
+    })
+
+
+def test_rtp_is_memoised():
+    rtp.bau_cua_rtp.cache_clear()
+    rtp.rtp_table(1.25)
+    rtp.rtp_table(1.25)
+    assert rtp.bau_cua_rtp.cache_info().hits >= rtp.BAU_CUA_FACES
@@ -0,0 +1,72 @@
+"""Shoe dùng chung: không xáo lại khi còn ván đang rút bài, kể cả lúc shoe cạn."""
+from games.blackjack import BlackjackGame
+from games.card_game import CARDS_PER_DECK
+from games.rng import RandomPool
+from games.shoe import Shoe, ShoeManager
+
+
+class Holder:
+    pass
+
+
+def make_shoe(num_decks=1, penetration=0.75):
+    return Shoe(num_decks, penetration, RandomPool(7, CARDS_PER_DECK))
+
+
+def test_begin_hand_reshuffles_only_when_free():
+    shoe = make_shoe()
+    holder = Holder()
+    shoe.begin_hand(holder)
+    while not shoe.needs_shuffle():
+        shoe.draw_index()
+    remaining = len(shoe)
+
+    shoe.begin_hand(Holder())
+    assert shoe.shuffles == 1
+    assert len(shoe) == remaining
+
+    shoe._holders.clear()
+    shoe.begin_hand()
+    assert shoe.shuffles == 2
+    assert len(shoe) == CARDS_PER_DECK
+
+
+def test_exhausted_held_shoe_appends_segment():
+    shoe = make_shoe()
+    holder = Holder()
+    shoe.begin_hand(holder)
+    state = shoe.shuffle_state
+    drawn = [shoe.draw_index() for _ in range(CARDS_PER_DECK + 1)]
+
+    assert sorted(drawn[:CARDS_PER_DECK]) == list(range(CARDS_PER_DECK))
+    assert shoe.shuffles == 1
+    assert shoe.shuffle_state == state
+    assert shoe.exhausted and shoe.needs_shuffle()
+    assert len(shoe) == CARDS_PER_DECK - 1
+
+    shoe.end_hand(holder)
+    shoe.begin_hand()
+    assert not shoe.exhausted
+    assert shoe.shuffles == 2
+    assert len(shoe) == CARDS_PER_DECK
+
+
+def test_exhausted_free_shoe_reshuffles():
+    shoe = make_shoe()
+    for _ in range(CARDS_PER_DECK + 1):
+        shoe.draw_index()
+    assert shoe.shuffles == 2
+    assert not shoe.exhausted
+
+
+def test_manager_replaces_exhausted_shoe_in_use():
+    manager = ShoeManager(num_decks=1, penetration=0.75, max_tables=4)
+    shoe = manager.get(1, 2)
+    game = BlackjackGame(10, 3, shoe=shoe)
+    for _ in range(len(shoe) + 1):
+        shoe.draw_index()
+
+    fresh = manager.get(1, 2)
+    assert fresh is not shoe
+    assert fresh.rng is shoe.rng
+    assert game.deck is shoe
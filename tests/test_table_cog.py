@@ -0,0 +1,169 @@
+"""TableCog: mở bàn, gỡ bàn khi gửi message lỗi, hoàn cược khi vòng bị lỗi."""
+import asyncio
+import contextlib
+import io
+
+import pytest
+
+from cogs.table_cog import TableCog
+from database.async_database_manager import AsyncDatabaseManager
+from database.database_manager import DatabaseManager
+from games.blackjack_table import BlackjackTable
+from games.shoe import ShoeManager
+
+GUILD, CHANNEL = 7, 70
+
+
+class Member:
+    def __init__(self, user_id):
+        self.id = user_id
+        self.display_name = f"user{user_id}"
+
+
+class Channel:
+    id = CHANNEL
+
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, content=None, **kwargs):
+        self.sent.append(content)
+        return Message()
+
+
+class Message:
+    pass
+
+
+class Edits:
+    def submit(self, message, final=False, **kwargs):
+        pass
+
+
+class Bot:
+    def __init__(self, db):
+        self.db = db
+        self.shoes = ShoeManager(num_decks=1, max_tables=4)
+        self.edits = Edits()
+        self.channel = Channel()
+
+    def get_channel(self, channel_id):
+        return self.channel if channel_id == CHANNEL else None
+
+
+@pytest.fixture
+def bot(tmp_path, monkeypatch):
+    monkeypatch.setattr("config.config.JOURNAL_ENABLED", False)
+    db = AsyncDatabaseManager(DatabaseManager("sqlite:///" + str(tmp_path / "table.db")), max_workers=1)
+    yield Bot(db)
+    db.executor.shutdown()
+    db.sync.engine.dispose()
+
+
+def balance(bot, user_id):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return bot.db.sync.get_or_create_user_balance(user_id, GUILD).balance
+
+
+def test_failed_send_tears_down_new_table(bot):
+    async def scenario():
+        cog = TableCog(bot)
+        error, session, created = await cog.join_table(GUILD, bot.channel, Member(1), 100)
+        assert error is None and created
+
+        async def broken_send():
+            raise RuntimeError("Missing Permissions")
+
+        with pytest.raises(RuntimeError):
+            await cog.open_round(session, broken_send)
+        assert (GUILD, CHANNEL) not in cog.sessions and session.task is None
+
+        _, retry, created = await cog.join_table(GUILD, bot.channel, Member(1), 100)
+        return cog, retry, created
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        cog, retry, created = asyncio.run(scenario())
+    assert created
+    assert cog.sessions[(GUILD, CHANNEL)] is retry
+    assert balance(bot, 1) == 1000
+
+
+async def dealt_round(bot, cog, bets):
+    for user_id, bet in bets.items():
+        error, session, _ = await cog.join_table(GUILD, bot.channel, Member(user_id), bet)
+        assert error is None
+    session.message = Message()
+    assert await cog.deal_round(session)
+    return session
+
+
+def failing_settle_many(db, fail_on):
+    """settle_many ném lỗi ở các lần gọi trong `fail_on` (đếm từ 1)"""
+    real = db.settle_many
+    calls = []
+
+    async def settle_many(*args, **kwargs):
+        calls.append(args)
+        if len(calls) in fail_on:
+            raise RuntimeError("database is locked")
+        return await real(*args, **kwargs)
+
+    db.settle_many = settle_many
+    return calls
+
+
+def test_failed_payout_refunds_table(bot):
+    async def scenario():
+        cog = TableCog(bot)
+        session = await dealt_round(bot, cog, {1: 100, 2: 250})
+        charged = dict(session.charged)
+        failing_settle_many(bot.db, fail_on={1})
+        await cog.finish_round(session)
+        return session, charged
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        session, charged = asyncio.run(scenario())
+    assert charged == {1: 100, 2: 250}
+    assert session.charged == {}
+    assert session.table.phase == BlackjackTable.FINISHED
+    assert balance(bot, 1) == 1000 and balance(bot, 2) == 1000
+    assert bot.channel.sent == ["⚠️ Vòng Blackjack bị lỗi, tiền cược đã được hoàn lại."]
+
+
+def test_round_error_after_deal_refunds_and_closes_table(bot, monkeypatch):
+    monkeypatch.setattr("config.config.TABLE_BETTING_WINDOW", 0)
+    monkeypatch.setattr("config.config.TABLE_ACTION_TIMEOUT", 0.01)
+
+    async def scenario():
+        cog = TableCog(bot)
+
+        async def broken_finish(session):
+            raise RuntimeError("dealer crashed")
+
+        cog.finish_round = broken_finish
+        _, session, _ = await cog.join_table(GUILD, bot.channel, Member(1), 300)
+        await cog.open_round(session, bot.channel.send)
+        await session.task
+        return cog, session
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        cog, session = asyncio.run(scenario())
+    assert session.charged == {}
+    assert balance(bot, 1) == 1000
+    assert cog.sessions == {}
+    assert bot.channel.sent[-1].startswith("⚠️")
+
+
+def test_failed_refund_keeps_charges_and_reports_round(bot):
+    async def scenario():
+        cog = TableCog(bot)
+        session = await dealt_round(bot, cog, {1: 100})
+        failing_settle_many(bot.db, fail_on={1, 2})
+        await cog.finish_round(session)
+        return session
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        session = asyncio.run(scenario())
+    assert session.charged == {1: 100}
+    assert balance(bot, 1) == 900
+    assert session.table.round_id in bot.channel.sent[-1]
@@ -0,0 +1,189 @@
+"""TransactionJournal: file spill, ack và xóa segment, replay sau crash, dead-letter, drain."""
+import asyncio
+import contextlib
+import glob
+import io
+import json
+
+import pytest
+
+from database.transaction_journal import TransactionJournal
+
+
+class Writer:
+    """Writer giả: ghi nhận các lô, ném lỗi cho lô chứa dòng "poison" hoặc `failures` lần đầu"""
+
+    def __init__(self, failures=0):
+        self.batches = []
+        self.failures = failures
+        self.calls = 0
+
+    async def __call__(self, rows):
+        self.calls += 1
+        if self.calls <= self.failures or any(row["description"] == "poison" for row in rows):
+            raise RuntimeError("database is locked")
+        self.batches.append([row["description"] for row in rows])
+
+    @property
+    def rows(self):
+        return [description for batch in self.batches for description in batch]
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return str(tmp_path / "journal.spill"), str(tmp_path / "journal.dead")
+
+
+def journal(writer, paths, **kwargs):
+    spill, dead = paths
+    kwargs.setdefault("flush_interval", 0.01)
+    kwargs.setdefault("max_retries", 0)
+    return TransactionJournal(writer, spill_path=spill, dead_letter_path=dead, fsync=False, **kwargs)
+
+
+def spill_files(paths):
+    return sorted(glob.glob(paths[0] + "*"))
+
+
+def run(scenario):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return asyncio.run(scenario())
+
+
+async def append(j, *descriptions):
+    for description in descriptions:
+        await j.append(1, 2, -10, "game", description)
+
+
+def test_rows_are_committed_and_segments_removed(paths):
+    writer = Writer()
+
+    async def scenario():
+        j = journal(writer, paths, batch_size=2)
+        await j.start()
+        await append(j, "a", "b", "c")
+        await j.drain()
+        depth, files = j.depth, spill_files(paths)
+        await j.close()
+        return depth, files
+
+    depth, files = run(scenario)
+    assert writer.rows == ["a", "b", "c"]
+    assert depth == 0
+    # Segment đã commit hết bị xóa, chỉ còn segment đang mở
+    assert len(files) == 1
+    assert spill_files(paths) == []
+
+
+def test_replay_skips_acked_rows(paths):
+    spill = paths[0]
+    row = {"user_id": 1, "guild_id": 2, "amount": -10, "transaction_type": "game",
+           "created_at": "2026-01-01T00:00:00", "game_type": "bau_cua", "round_id": None, "bet": 10, "payout": 0}
+    with open(spill + ".3", "w", encoding="utf-8") as f:
+        f.write(json.dumps(dict(row, description="committed", seq=1)) + "\n")
+        f.write(json.dumps(dict(row, description="lost", seq=2)) + "\n")
+        f.write(json.dumps({"ack": [1]}) + "\n")
+    with open(spill + ".4", "w", encoding="utf-8") as f:
+        f.write(json.dumps(dict(row, description="also lost", seq=3)) + "\n")
+        f.write('{"user_id": 1, "guild')  # Dòng ghi dở lúc crash
+
+    writer = Writer()
+
+    async def scenario():
+        j = journal(writer, paths)
+        await j.start()
+        segment = j._segment
+        await j.close()
+        return segment
+
+    assert run(scenario) == 5
+    assert writer.rows == ["lost", "also lost"]
+    assert spill_files(paths) == []
+
+
+def test_failed_batch_retries_then_dead_letters_poison_row(paths):
+    writer = Writer(failures=1)
+
+    async def scenario():
+        j = journal(writer, paths, batch_size=3, max_retries=1)
+        await j.start()
+        await asyncio.gather(j.append(1, 2, -10, "game", "a"), j.append(1, 2, -10, "game", "poison"),
+                             j.append(1, 2, -10, "game", "b"))
+        await j.drain()
+        dead = j.dead_rows
+        await j.close()
+        return dead
+
+    assert run(scenario) == 1
+    # Lần 1 lỗi tạm thời, lần thử lại vẫn lỗi vì dòng poison: ghi từng dòng
+    assert writer.batches == [["a"], ["b"]]
+    with open(paths[1], encoding="utf-8") as f:
+        assert [json.loads(line)["description"] for line in f] == ["poison"]
+    assert spill_files(paths) == []
+
+
+def test_unwritable_dead_letter_keeps_segment_for_replay(paths, tmp_path):
+    spill, _ = paths
+    broken = (spill, str(tmp_path / "missing" / "journal.dead"))
+
+    async def first_run():
+        j = journal(Writer(), broken, batch_size=2)
+        await j.start()
+        await asyncio.gather(append(j, "ok"), append(j, "poison"))
+        await j.drain()
+        await j.close()
+
+    run(first_run)
+    assert spill_files(paths)
+
+    writer = Writer()
+
+    async def second_run():
+        j = journal(writer, paths)
+        await j.start()
+        await j.close()
+
+    run(second_run)
+    assert writer.rows == []  # Dòng "ok" đã ack, dòng poison vẫn lỗi
+    with open(paths[1], encoding="utf-8") as f:
+        assert [json.loads(line)["description"] for line in f] == ["poison"]
+    assert spill_files(paths) == []
+
+
+def test_drain_waits_only_for_earlier_rows(paths):
+    written = []
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def writer(rows):
+            await release.wait()
+            written.extend(row["description"] for row in rows)
+
+        j = journal(writer, paths, batch_size=1)
+        await j.start()
+        await append(j, "a")
+        drained = asyncio.create_task(j.drain())
+        await asyncio.sleep(0.05)
+        blocked = not drained.done()
+        await append(j, "b")
+        release.set()
+        await drained
+        await j.close()
+        return blocked
+
+    assert run(scenario)
+    assert written == ["a", "b"]
+
+
+def test_append_before_start_writes_directly(paths):
+    writer = Writer()
+
+    async def scenario():
+        j = journal(writer, paths)
+        await append(j, "a")
+        await j.close()
+
+    run(scenario)
+    assert writer.batches == [["a"]]
+    assert spill_files(paths) == []